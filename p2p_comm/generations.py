@@ -0,0 +1,47 @@
+# p2p_comm/generations.py
+"""
+Generation counters for cache invalidation.
+
+Every namespace has a raw Redis counter gen:<namespace>. Cached data
+records the generations it was built under, and a read drops anything
+whose namespaces have moved on. Invalidating a namespace is a single INCR
+however many keys depend on it; outdated entries are never deleted, they
+just age out with their TTL. Namespaces in use:
+
+    posts, post:<id>, author:<id>, feed   posts/cache.py
+    search:posts                          posts/cache.py
+    profile:<user_id>, search:people      users/cache.py
+    chats:<user_id>                       p2p_messages/redis_helpers.py
+"""
+from django_redis import get_redis_connection
+
+
+def key_generation(namespace: str) -> str:
+    return f"gen:{namespace}"
+
+
+def get_generations(namespaces) -> dict:
+    """
+    {namespace: generation} with one MGET; counters never bumped are 0.
+    """
+    namespaces = list(dict.fromkeys(namespaces))
+    if not namespaces:
+        return {}
+    values = get_redis_connection("default").mget([key_generation(ns) for ns in namespaces])
+    return {ns: int(value or 0) for ns, value in zip(namespaces, values)}
+
+
+def generations_current(gens: dict) -> bool:
+    current = get_generations(gens)
+    return all(current[ns] == gen for ns, gen in gens.items())
+
+
+def bump_generation(*namespaces: str):
+    redis_conn = get_redis_connection("default")
+    if len(namespaces) == 1:
+        redis_conn.incr(key_generation(namespaces[0]))
+        return
+    with redis_conn.pipeline(transaction=False) as pipe:
+        for ns in namespaces:
+            pipe.incr(key_generation(ns))
+        pipe.execute()
@@ -0,0 +1,175 @@
+# p2p_comm/http_cache.py
+"""
+Pre-rendered JSON responses for hot read endpoints.
+
+The final UTF-8 JSON body is cached as raw bytes in a Redis hash (no
+pickling), together with a gzip copy for bodies of GZIP_MIN_BYTES or more
+and an ETag:
+
+    rendered:v1:<name>   body, gzip, etag, gens, modified
+
+A hit is written straight into an HttpResponse, with no unpickling and no
+JSONRenderer pass. ``gens`` holds the generation stamps the body was built
+under (p2p_comm/generations.py); a body whose namespaces have moved on is a
+miss. The ETag is derived from those generations and the body, so it
+changes exactly when the response does.
+
+Conditional GETs: every response carries a weak ETag and a Last-Modified
+(when the body was built, which is never earlier than the change it
+reflects). A request with If-None-Match / If-Modified-Since is answered
+from the etag/gens/modified fields alone; the body is only read from
+Redis when the client's copy is out of date. not_modified() does the same
+for views that can compute a validator cheaply themselves.
+"""
+import gzip
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.middleware.gzip import re_accepts_gzip
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django_redis import get_redis_connection
+from rest_framework.renderers import JSONRenderer
+
+from .generations import generations_current
+
+RENDERED_GZIP = getattr(settings, "RENDERED_JSON_GZIP", True)
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+
+def key_rendered(name: str) -> str:
+    return f"rendered:v1:{name}"
+
+
+def set_validators(response, etag, last_modified=None):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    A 304 response when the client's copy matches ``etag`` (or, without
+    If-None-Match, is not older than ``last_modified``, an epoch), else None.
+    """
+    meta = request.META
+    if not (meta.get("HTTP_IF_NONE_MATCH") or meta.get("HTTP_IF_MODIFIED_SINCE")):
+        return None
+    validators = set_validators(HttpResponse(), etag, last_modified)
+    validators["Vary"] = "Accept-Encoding"
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified, response=validators
+    )
+    return response if response.status_code == 304 else None
+
+
+class RenderedJSON:
+    def __init__(self, body, etag, gzipped=None, modified=None):
+        self.body = body
+        self.etag = etag
+        self.gzipped = gzipped
+        self.modified = modified
+
+    def response(self, request, status=200):
+        unchanged = not_modified(request, self.etag, self.modified)
+        if unchanged is not None:
+            return unchanged
+        accepts_gzip = re_accepts_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if self.gzipped is not None and accepts_gzip:
+            response = HttpResponse(self.gzipped, status=status, content_type="application/json")
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(self.body, status=status, content_type="application/json")
+        set_validators(response, self.etag, self.modified)
+        response["Vary"] = "Accept-Encoding"
+        return response
+
+
+def make_etag(body: bytes, gens=None) -> str:
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(json.dumps(gens or {}, sort_keys=True).encode())
+    digest.update(body)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def render(data, gens=None) -> RenderedJSON:
+    body = JSONRenderer().render(data)
+    gzipped = None
+    if RENDERED_GZIP and len(body) >= GZIP_MIN_BYTES:
+        gzipped = gzip.compress(body, GZIP_LEVEL)
+    return RenderedJSON(body, make_etag(body, gens), gzipped, int(time.time()))
+
+
+def get_rendered(name: str):
+    """
+    The cached RenderedJSON for ``name``, or None when it is missing or
+    was built under an older generation.
+    """
+    fields = get_redis_connection("default").hgetall(key_rendered(name))
+    if not fields or b"body" not in fields:
+        return None
+    gens = json.loads(fields.get(b"gens") or b"{}")
+    if gens and not generations_current(gens):
+        return None
+    modified = int(fields[b"modified"]) if b"modified" in fields else None
+    return RenderedJSON(fields[b"body"], fields[b"etag"].decode(), fields.get(b"gzip"), modified)
+
+
+def rendered_not_modified(request, name: str):
+    """
+    A 304 for ``name`` when the client's copy is current, reading only the
+    validators (not the body) from Redis. None otherwise.
+    """
+    meta = request.META
+    if not (meta.get("HTTP_IF_NONE_MATCH") or meta.get("HTTP_IF_MODIFIED_SINCE")):
+        return None
+    etag, gens, modified = get_redis_connection("default").hmget(
+        key_rendered(name), "etag", "gens", "modified"
+    )
+    if etag is None:
+        return None
+    gens = json.loads(gens or b"{}")
+    if gens and not generations_current(gens):
+        return None
+    return not_modified(request, etag.decode(), int(modified) if modified else None)
+
+
+def set_rendered(name: str, data, timeout, gens=None) -> RenderedJSON:
+    """
+    Renders ``data`` once and caches the bytes. ``gens`` should be read
+    before ``data`` is built, so a change made meanwhile invalidates it.
+    """
+    rendered = render(data, gens)
+    mapping = {
+        "body": rendered.body, "etag": rendered.etag,
+        "gens": json.dumps(gens or {}), "modified": rendered.modified,
+    }
+    if rendered.gzipped is not None:
+        mapping["gzip"] = rendered.gzipped
+    key = key_rendered(name)
+    with get_redis_connection("default").pipeline() as pipe:
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, timeout)
+        pipe.execute()
+    return rendered
+
+
+def cached_json_response(request, name, build, timeout):
+    """
+    Serves ``name`` from the rendered cache, or calls build() -> (data,
+    gens), caches its rendering and serves that.
+    """
+    unchanged = rendered_not_modified(request, name)
+    if unchanged is not None:
+        return unchanged
+    rendered = get_rendered(name)
+    if rendered is None:
+        data, gens = build()
+        rendered = set_rendered(name, data, timeout, gens)
+    return rendered.response(request)
@@ -0,0 +1,98 @@
+# p2p_comm/search_cache.py
+"""
+Query-result cache for the search endpoints.
+
+A search is cached as the list of matching ids only, under the search
+kind and the normalized query (case and whitespace folded), for
+SEARCH_TTL seconds:
+
+    search:v1:ids:<kind>:<query hash>     {"ids": [...], "gens": {...}}
+
+Pages are sliced out of that list and hydrated from per-object fragments,
+shared by every query that returns the object:
+
+    search:v1:frag:<kind>:<id>            {"value": {...}, "gens": {...}}
+
+Both carry generation stamps (p2p_comm/generations.py). An id list is
+stamped with its kind's search namespace, bumped whenever a change could
+add or drop results (search:posts in posts/signals.py, search:people in
+users/signals.py). A fragment is stamped with the namespaces of the object
+it shows, so an edited post or profile is re-rendered on the next hit.
+Every stamp on a page is checked with one MGET.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .generations import get_generations
+
+SEARCH_TTL = getattr(settings, "SEARCH_CACHE_TTL", 60)
+SEARCH_FRAGMENT_TTL = getattr(settings, "SEARCH_FRAGMENT_CACHE_TTL", 600)
+
+
+def normalize_query(query) -> str:
+    return " ".join((query or "").casefold().split())
+
+
+def key_search_ids(kind: str, query: str) -> str:
+    digest = hashlib.blake2b(normalize_query(query).encode(), digest_size=16).hexdigest()
+    return f"search:v1:ids:{kind}:{digest}"
+
+
+def key_search_fragment(kind: str, object_id) -> str:
+    return f"search:v1:frag:{kind}:{object_id}"
+
+
+def _current(entries: dict) -> dict:
+    # Drops entries stamped with an older generation, one MGET for all.
+    current = get_generations(ns for entry in entries.values() for ns in entry["gens"])
+    return {
+        key: entry for key, entry in entries.items()
+        if all(current.get(ns, 0) == gen for ns, gen in entry["gens"].items())
+    }
+
+
+def cached_ids(kind, query, compute, namespaces):
+    """
+    The ids compute() returns for ``query``, cached by normalized query.
+    """
+    key = key_search_ids(kind, query)
+    entry = cache.get(key)
+    if entry is not None and _current({key: entry}):
+        return entry["ids"]
+
+    # Read before computing, so a change made meanwhile invalidates it.
+    gens = get_generations(namespaces)
+    ids = list(compute())
+    cache.set(key, {"ids": ids, "gens": gens}, SEARCH_TTL)
+    return ids
+
+
+def hydrate(kind, ids, render, namespaces):
+    """
+    Serialized objects for ``ids``, in order, from their fragments.
+    render(missing ids) -> {id: (data, namespaces)} fills in the rest;
+    ids it does not return (deleted meanwhile) are left out.
+    namespaces(missing ids) -> {id: namespaces} names them cheaply
+    beforehand, so their stamps are read before rendering, as in
+    cached_ids(). A fragment that renders with other namespaces (its
+    object changed owner meanwhile) is returned but not stored.
+    """
+    keys = {object_id: key_search_fragment(kind, object_id) for object_id in ids}
+    found = _current(cache.get_many(list(keys.values())))
+    data = {object_id: found[key]["value"] for object_id, key in keys.items() if key in found}
+
+    missing = [object_id for object_id in ids if object_id not in data]
+    if missing:
+        known = namespaces(missing)
+        gens = get_generations(ns for names in known.values() for ns in names)
+        rendered = render(missing)
+        cache.set_many({
+            keys[object_id]: {"value": value, "gens": {ns: gens[ns] for ns in names}}
+            for object_id, (value, names) in rendered.items()
+            if set(names) == set(known.get(object_id, ()))
+        }, SEARCH_FRAGMENT_TTL)
+        data.update({object_id: value for object_id, (value, _) in rendered.items()})
+
+    return [data[object_id] for object_id in ids if object_id in data]
@@ -82,6 +82,7 @@ INSTALLED_APPS = [
     "django.contrib.contenttypes",
     "django.contrib.sessions",
     "django.contrib.messages",
+    "django.contrib.postgres",  # search lookups (trigram_similar, SearchVectorField)
     # Third-party
     "rest_framework",
     "rest_framework_simplejwt",
@@ -293,6 +294,20 @@ CELERY_ACCEPT_CONTENT = ["application/json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "Asia/Kolkata"
+CELERY_BEAT_SCHEDULE = {
+    "sweep-expired-messages": {
+        "task": "p2p_messages.tasks.sweep_expired_messages",
+        "schedule": 60.0,  # every minute
+    },
+    "flush-pending-likes": {
+        "task": "posts.tasks.flush_pending_likes",
+        "schedule": 10.0,  # likes reach the DB within ~10s
+    },
+    "maintain-message-partitions": {
+        "task": "p2p_messages.tasks.maintain_message_partitions",
+        "schedule": 60.0 * 60 * 24,  # daily
+    },
+}
 
 CACHES = {
     "default": {
@@ -333,6 +348,23 @@ CACHE_TTL_SHORT = 60       # 1 minute
 CACHE_TTL_MED = 300        # 5 minutes
 CACHE_TTL_LONG = 3600   # 1 hour
 
+# Per-process LRU in front of the Redis post caches (see posts/local_cache.py)
+POSTS_LOCAL_CACHE_ENABLED = get_env("POSTS_LOCAL_CACHE_ENABLED", default=False, cast=bool)
+POSTS_LOCAL_CACHE_MAX_ITEMS = get_env("POSTS_LOCAL_CACHE_MAX_ITEMS", default=512, cast=int)
+POSTS_LOCAL_CACHE_MAX_BYTES = get_env("POSTS_LOCAL_CACHE_MAX_BYTES", default=32 * 1024 * 1024, cast=int)
+POSTS_LOCAL_CACHE_TTL = 30
+
+# Keep a gzip copy of cached JSON responses (see p2p_comm/http_cache.py)
+RENDERED_JSON_GZIP = get_env("RENDERED_JSON_GZIP", default=True, cast=bool)
+
+# Messages at or above this many bytes are compressed before encryption (0 disables)
+MESSAGE_COMPRESS_THRESHOLD = get_env("MESSAGE_COMPRESS_THRESHOLD", default=512, cast=int)
+
+# Message partitions (see p2p_messages/partitions.py)
+MESSAGE_PARTITION_MONTHS_AHEAD = 3
+MESSAGE_ARCHIVE_AFTER_MONTHS = get_env("MESSAGE_ARCHIVE_AFTER_MONTHS", default=0, cast=int) or None
+MESSAGE_ARCHIVE_TABLESPACE = get_env("MESSAGE_ARCHIVE_TABLESPACE", default="") or None
+
 # -----------------------
 # Logging
 # -----------------------
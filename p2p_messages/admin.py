@@ -1,5 +1,8 @@
 from django.contrib import admin
 
-from .models import Message
+from .models import Message, GroupConversation, GroupMembership, DirectConversationSettings
 
 admin.site.register(Message)
+admin.site.register(GroupConversation)
+admin.site.register(GroupMembership)
+admin.site.register(DirectConversationSettings)
@@ -0,0 +1,75 @@
+# p2p_messages/cipher.py
+"""
+Message encryption used by every send and read path.
+
+Messages at or above MESSAGE_COMPRESS_THRESHOLD bytes are zlib-compressed
+before they are encrypted (compressing after encryption gains nothing).
+Compressed messages are stored as an envelope:
+
+    b"z1\\x00" + raw Fernet token bytes
+
+Fernet tokens are urlsafe base64 and always start with "gAAAAA", so the
+magic prefix can never collide with a plain token, and messages written
+before this existed still decrypt unchanged. The compressed envelope keeps
+the token's binary form, which saves the base64 overhead as well.
+Compression is skipped when it would not make the message smaller.
+"""
+import base64
+import zlib
+
+from cryptography.fernet import Fernet, InvalidToken
+from django.conf import settings
+
+COMPRESS_MAGIC = b"z1\x00"
+COMPRESS_THRESHOLD = getattr(settings, "MESSAGE_COMPRESS_THRESHOLD", 512)  # bytes of UTF-8; 0 disables
+COMPRESS_LEVEL = 6
+# Guards against decompression bombs; far above any real chat message.
+MAX_PLAINTEXT_BYTES = 1024 * 1024
+
+_fernet = None
+
+
+def get_fernet():
+    global _fernet
+    if _fernet is None:
+        _fernet = Fernet(settings.FERNET_KEY)
+    return _fernet
+
+
+def encrypt_message(text, threshold=None):
+    """
+    Encrypts a plain text message and returns the bytes to store.
+    """
+    threshold = COMPRESS_THRESHOLD if threshold is None else threshold
+    raw = text.encode("utf-8")
+    fernet = get_fernet()
+
+    if threshold and len(raw) >= threshold:
+        packed = zlib.compress(raw, COMPRESS_LEVEL)
+        if len(packed) < len(raw):
+            token = fernet.encrypt(packed)
+            return COMPRESS_MAGIC + base64.urlsafe_b64decode(token)
+    return fernet.encrypt(raw)
+
+
+def decrypt_message(data):
+    """
+    Decrypts stored message bytes (plain Fernet token or compressed
+    envelope) back to text. Raises InvalidToken for anything unreadable.
+    """
+    data = bytes(data)
+    fernet = get_fernet()
+
+    if not data.startswith(COMPRESS_MAGIC):
+        return fernet.decrypt(data).decode("utf-8")
+
+    token = base64.urlsafe_b64encode(data[len(COMPRESS_MAGIC):])
+    packed = fernet.decrypt(token)
+    try:
+        inflater = zlib.decompressobj()
+        raw = inflater.decompress(packed, MAX_PLAINTEXT_BYTES)
+        if inflater.unconsumed_tail:
+            raise InvalidToken
+    except zlib.error:
+        raise InvalidToken
+    return raw.decode("utf-8")
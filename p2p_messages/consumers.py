@@ -217,7 +217,6 @@ import base64
 from datetime import datetime, timezone
 
 # Third-party imports
-from cryptography.fernet import Fernet
 from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
@@ -227,6 +226,8 @@ import redis.asyncio as redis
 from users.models import CustomUser as User
 from .models import Message
 from . import redis_helpers
+from .groups import ais_group_member
+from .cipher import encrypt_message
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -240,7 +241,6 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fernet = Fernet(settings.FERNET_KEY)
         self.room_group_name = None
         self.redis_conn = None
         self.sender = None
@@ -291,7 +291,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         # Mark any unread messages from the receiver as read.
         unread_key = redis_helpers.unread_key(self.sender.id)
-        await self.redis_conn.hdel(unread_key, str(self.receiver.id))
+        if await self.redis_conn.hdel(unread_key, str(self.receiver.id)):
+            await self.redis_conn.incr(redis_helpers.recent_chats_gen_key(self.sender.id))
 
 
     async def disconnect(self, close_code):
@@ -320,7 +321,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 return
 
             # --- Step 1: Encrypt and Save to Database FIRST ---
-            encrypted_bytes = self.fernet.encrypt(plain_text_message.encode("utf-8"))
+            encrypted_bytes = encrypt_message(plain_text_message)
             message_obj = await self.save_message(self.sender, self.receiver, encrypted_bytes)
 
             # --- Step 2: Update Redis Cache ---
@@ -341,6 +342,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.redis_conn.zadd(redis_helpers.recent_chats_key(self.receiver.id), {str(self.sender.id): timestamp_epoch})
 
             await self.redis_conn.hincrby(redis_helpers.unread_key(self.receiver.id), str(self.sender.id), 1)
+            await self.redis_conn.incr(redis_helpers.recent_chats_gen_key(self.sender.id))
+            await self.redis_conn.incr(redis_helpers.recent_chats_gen_key(self.receiver.id))
 
             # --- Step 3: Broadcast to the Channel Layer ---
             await self.channel_layer.group_send(
@@ -406,6 +409,120 @@ class ChatConsumer(AsyncWebsocketConsumer):
         )
 
 
+class GroupChatConsumer(AsyncWebsocketConsumer):
+    """
+    Handles WebSocket connections for group chats. Membership is checked
+    against the cached Redis member set on connect and on every frame.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.room_group_name = None
+        self.redis_conn = None
+        self.sender = None
+        self.group_id = None
+
+    async def connect(self):
+        self.sender = self.scope["user"]
+        if not self.sender or not self.sender.is_authenticated:
+            await self.close(code=4001)  # Unauthorized
+            return
+
+        try:
+            self.redis_conn = redis.from_url(settings.REDIS_URL, decode_responses=True)
+            if not await self.redis_conn.ping():
+                raise ConnectionError("Redis ping failed")
+        except Exception as e:
+            logger.exception(f"!!! FAILED to connect to Redis: {e} !!!")
+            await self.close(code=5000)  # Internal Server Error
+            return
+
+        self.group_id = int(self.scope["url_route"]["kwargs"]["group_id"])
+        if not await ais_group_member(self.redis_conn, self.group_id, self.sender.id):
+            await self.close(code=4003)  # Forbidden
+            return
+
+        self.room_group_name = f"group_chat_{self.group_id}"
+        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if self.room_group_name:
+            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if self.redis_conn:
+            try:
+                await self.redis_conn.close()
+            except Exception as e:
+                logger.error(f"Error during Redis cleanup for group {self.group_id}: {e}")
+
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+            plain_text_message = data.get("message")
+
+            if not plain_text_message:
+                await self.send_error("Invalid payload: 'message' field is required.")
+                return
+
+            # Members can be removed while connected, so check every frame.
+            if not await ais_group_member(self.redis_conn, self.group_id, self.sender.id):
+                await self.send_error("You are no longer a member of this group.")
+                await self.close(code=4003)
+                return
+
+            encrypted_bytes = encrypt_message(plain_text_message)
+            message_obj = await self.save_message(self.sender, self.group_id, encrypted_bytes)
+
+            ciphertext_b64 = base64.b64encode(encrypted_bytes).decode("utf-8")
+            message_payload_for_cache = {
+                "id": message_obj.id,
+                "sender_id": self.sender.id,
+                "ciphertext": ciphertext_b64,
+                "timestamp": message_obj.timestamp.isoformat(),
+            }
+            group_history_key = redis_helpers.group_chat_key(self.group_id)
+            await self.redis_conn.lpush(group_history_key, json.dumps(message_payload_for_cache))
+            await self.redis_conn.ltrim(group_history_key, 0, 99)  # Keep last 100 messages
+
+            await self.channel_layer.group_send(
+                self.room_group_name,
+                {
+                    "type": "chat_message",
+                    "message_id": message_obj.id,
+                    "ciphertext": ciphertext_b64,
+                    "sender": self.sender.username,
+                    "timestamp": message_obj.timestamp.isoformat(),
+                },
+            )
+
+        except json.JSONDecodeError:
+            await self.send_error("Invalid JSON format.")
+        except Exception as e:
+            logger.exception("!!! An error occurred in group receive() !!!")
+            await self.send_error(f"An internal error occurred: {str(e)}")
+
+    async def chat_message(self, event):
+        await self.send(text_data=json.dumps({
+            "type": "chat_message",
+            "group_id": self.group_id,
+            "message_id": event["message_id"],
+            "ciphertext": event["ciphertext"],
+            "sender": event["sender"],
+            "timestamp": event["timestamp"],
+        }))
+
+    async def send_error(self, message):
+        await self.send(text_data=json.dumps({"type": "error", "message": message}))
+
+    @database_sync_to_async
+    def save_message(self, sender_obj, group_id, encrypted_bytes):
+        return Message.objects.create(
+            sender=sender_obj,
+            group_id=group_id,
+            ciphertext=encrypted_bytes,
+        )
+
+
 
 
 
@@ -0,0 +1,150 @@
+# p2p_messages/expiry.py
+"""
+Disappearing messages.
+
+Each conversation (direct pair or group) may carry a message TTL. New
+messages get ``expires_at = now + ttl`` in Message.save(), and the periodic
+``sweep_expired_messages`` task deletes expired rows in small primary-key
+batches and then drops them from the Redis history lists.
+"""
+import json
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .redis_helpers import r, chat_key, group_chat_key, recent_chats_key, touch_recent_chats
+
+# TTL lookups happen on every send, so they are cached. 0 means "no TTL"
+# (cache.get() returns None for a miss).
+TTL_CACHE_TIMEOUT = 60 * 5
+MIN_MESSAGE_TTL = timedelta(minutes=1)
+MAX_MESSAGE_TTL = timedelta(days=90)
+
+
+def direct_ttl_key(user_id_a, user_id_b):
+    a, b = sorted([user_id_a, user_id_b])
+    return f"msg_ttl:dm:{a}:{b}"
+
+
+def group_ttl_key(group_id):
+    return f"msg_ttl:group:{group_id}"
+
+
+def _cached_ttl(key, loader):
+    seconds = cache.get(key)
+    if seconds is None:
+        ttl = loader()
+        seconds = int(ttl.total_seconds()) if ttl else 0
+        cache.set(key, seconds, TTL_CACHE_TIMEOUT)
+    return timedelta(seconds=seconds) if seconds else None
+
+
+def get_direct_ttl(user_id_a, user_id_b):
+    from .models import DirectConversationSettings
+
+    a, b = sorted([user_id_a, user_id_b])
+    return _cached_ttl(
+        direct_ttl_key(a, b),
+        lambda: DirectConversationSettings.objects.filter(
+            user_low_id=a, user_high_id=b
+        ).values_list("message_ttl", flat=True).first(),
+    )
+
+
+def get_group_ttl(group_id):
+    from .models import GroupConversation
+
+    return _cached_ttl(
+        group_ttl_key(group_id),
+        lambda: GroupConversation.objects.filter(id=group_id).values_list("message_ttl", flat=True).first(),
+    )
+
+
+def set_direct_ttl(user_id_a, user_id_b, ttl):
+    from .models import DirectConversationSettings
+
+    a, b = sorted([user_id_a, user_id_b])
+    DirectConversationSettings.objects.update_or_create(
+        user_low_id=a, user_high_id=b, defaults={"message_ttl": ttl}
+    )
+    cache.delete(direct_ttl_key(a, b))
+
+
+def set_group_ttl(group_id, ttl):
+    from .models import GroupConversation
+
+    GroupConversation.objects.filter(id=group_id).update(message_ttl=ttl)
+    cache.delete(group_ttl_key(group_id))
+
+
+def expires_at_for(message):
+    """
+    Expiry for a message that is about to be created, or None.
+    """
+    if message.group_id is not None:
+        ttl = get_group_ttl(message.group_id)
+    else:
+        ttl = get_direct_ttl(message.sender_id, message.receiver_id)
+    if ttl is None:
+        return None
+    return (message.timestamp or timezone.now()) + ttl
+
+
+def purge_expired_from_cache(rows):
+    """
+    Removes swept messages from the Redis history lists.
+
+    ``rows`` are (id, sender_id, receiver_id, group_id) tuples. Entries are
+    removed with LREM on their exact cached value, so messages pushed
+    concurrently are never lost. A direct chat whose cached list ends up
+    empty and has no rows left is dropped from both users' recent chats,
+    which also removes its inbox preview.
+    """
+    expired_by_key = defaultdict(set)
+    pairs_by_key = {}
+    for message_id, sender_id, receiver_id, group_id in rows:
+        if group_id is not None:
+            key = group_chat_key(group_id)
+        else:
+            key = chat_key(sender_id, receiver_id)
+            pairs_by_key[key] = (sender_id, receiver_id)
+        expired_by_key[key].add(message_id)
+
+    redis_conn = r()
+    emptied_pairs = []
+    for key, expired_ids in expired_by_key.items():
+        stale = []
+        for raw in redis_conn.lrange(key, 0, -1):
+            try:
+                if json.loads(raw).get("id") in expired_ids:
+                    stale.append(raw)
+            except (ValueError, AttributeError):
+                continue
+        if not stale:
+            continue
+        with redis_conn.pipeline() as pipe:
+            for raw in stale:
+                pipe.lrem(key, 1, raw)
+            if key in pairs_by_key:
+                # The inbox preview may have been one of them.
+                touch_recent_chats(pipe, *pairs_by_key[key])
+            pipe.llen(key)
+            remaining = pipe.execute()[-1]
+        if remaining == 0 and key in pairs_by_key:
+            emptied_pairs.append(pairs_by_key[key])
+
+    if emptied_pairs:
+        from django.db.models import Q
+        from .models import Message
+
+        for user_a, user_b in emptied_pairs:
+            still_has_messages = Message.objects.filter(
+                Q(sender_id=user_a, receiver_id=user_b) | Q(sender_id=user_b, receiver_id=user_a)
+            ).exists()
+            if not still_has_messages:
+                with redis_conn.pipeline() as pipe:
+                    pipe.zrem(recent_chats_key(user_a), str(user_b))
+                    pipe.zrem(recent_chats_key(user_b), str(user_a))
+                    pipe.execute()
@@ -0,0 +1,74 @@
+# p2p_messages/groups.py
+"""
+Group membership checks backed by a Redis set per group.
+
+Every send (HTTP or WebSocket frame) has to verify that the sender still
+belongs to the group. The member ids are loaded from the database once and
+kept in ``group_members:<id>`` so large groups answer with a single
+SISMEMBER instead of a DB lookup per frame.
+"""
+from channels.db import database_sync_to_async
+
+from .models import GroupMembership
+from .redis_helpers import r, group_members_key
+
+GROUP_MEMBERS_TTL = 60 * 60  # 1 hour; membership changes also drop the key
+
+
+def load_member_ids(group_id):
+    return list(
+        GroupMembership.objects.filter(group_id=group_id).values_list("user_id", flat=True)
+    )
+
+
+def is_group_member(group_id, user_id):
+    redis_conn = r()
+    key = group_members_key(group_id)
+
+    with redis_conn.pipeline() as pipe:
+        pipe.exists(key)
+        pipe.sismember(key, user_id)
+        exists, is_member = pipe.execute()
+    if exists:
+        return bool(is_member)
+
+    member_ids = load_member_ids(group_id)
+    cache_member_ids(redis_conn, group_id, member_ids)
+    return user_id in member_ids
+
+
+def cache_member_ids(redis_conn, group_id, member_ids):
+    if not member_ids:
+        return
+    key = group_members_key(group_id)
+    with redis_conn.pipeline() as pipe:
+        pipe.delete(key)
+        pipe.sadd(key, *member_ids)
+        pipe.expire(key, GROUP_MEMBERS_TTL)
+        pipe.execute()
+
+
+def invalidate_group_members(group_id):
+    r().delete(group_members_key(group_id))
+
+
+async def ais_group_member(redis_conn, group_id, user_id):
+    """
+    Async variant for consumers that hold a ``redis.asyncio`` connection.
+    """
+    key = group_members_key(group_id)
+    async with redis_conn.pipeline() as pipe:
+        pipe.exists(key)
+        pipe.sismember(key, str(user_id))
+        exists, is_member = await pipe.execute()
+    if exists:
+        return bool(is_member)
+
+    member_ids = await database_sync_to_async(load_member_ids)(group_id)
+    if member_ids:
+        async with redis_conn.pipeline() as pipe:
+            pipe.delete(key)
+            pipe.sadd(key, *member_ids)
+            pipe.expire(key, GROUP_MEMBERS_TTL)
+            await pipe.execute()
+    return user_id in member_ids
@@ -2,7 +2,7 @@
 from django.core.management.base import BaseCommand
 from django.db.models import Q, Max, F
 from p2p_messages.models import Message
-from p2p_messages.redis_helpers import r, recent_chats_key
+from p2p_messages.redis_helpers import r, recent_chats_key, touch_recent_chats
 
 class Command(BaseCommand):
     help = 'Backfills Redis recent_chats sorted sets from the existing database.'
@@ -12,7 +12,7 @@ class Command(BaseCommand):
         redis_conn = r()
 
         # Find the last message for each unique conversation pair
-        latest_messages = Message.objects.order_by(
+        latest_messages = Message.objects.filter(group__isnull=True).order_by(
             F('sender_id'), F('receiver_id'), '-timestamp'
         ).distinct('sender_id', 'receiver_id')
 
@@ -26,6 +26,7 @@ class Command(BaseCommand):
                 # Add each user to the other's recent chats list
                 pipe.zadd(recent_chats_key(user_a), {user_b: timestamp})
                 pipe.zadd(recent_chats_key(user_b), {user_a: timestamp})
+                touch_recent_chats(pipe, user_a, user_b)
                 count += 1
 
             pipe.execute()
@@ -0,0 +1,102 @@
+# p2p_messages/management/commands/benchmark_message_compression.py
+import base64
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from p2p_messages.cipher import encrypt_message, decrypt_message
+
+WORDS = (
+    "hey ok sure lol thanks see you tomorrow class lab assignment deadline exam notes "
+    "project meeting at pm am can you send the link please done yes no maybe later "
+    "i think we should check the slides before submitting did you get my message "
+    "the server is down again try restarting it after lunch"
+).split()
+
+CODE_LINES = [
+    "def handle(self, *args, **options):",
+    "    queryset = Message.objects.filter(sender=request.user).order_by('-timestamp')",
+    "    for msg in queryset[:50]:",
+    "        payload = {'id': msg.id, 'timestamp': msg.timestamp.isoformat()}",
+    "Traceback (most recent call last):",
+    '  File "/app/p2p_messages/views.py", line 412, in get',
+    "django.db.utils.OperationalError: could not connect to server: Connection refused",
+    "2025-09-15 10:30:00,123 INFO celery.worker: Task p2p_messages.tasks.sweep succeeded",
+    "SELECT id, sender_id, receiver_id FROM p2p_messages_message WHERE timestamp < now();",
+]
+
+
+def chat_text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def pasted_snippet(rng, lines):
+    return "\n".join(rng.choice(CODE_LINES) for _ in range(lines))
+
+
+def sample_messages(count, seed):
+    """
+    Roughly what a chat app sees: mostly short lines, some paragraphs and
+    a tail of pasted code or logs.
+    """
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.80:
+            messages.append(chat_text(rng, max(1, int(rng.lognormvariate(2.0, 0.7)))))
+        elif roll < 0.95:
+            messages.append(chat_text(rng, rng.randint(60, 250)))
+        else:
+            messages.append(pasted_snippet(rng, rng.randint(20, 200)))
+    return messages
+
+
+class Command(BaseCommand):
+    help = 'Compares stored size, Redis cache size and CPU cost of message encryption with and without compression.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--thresholds', default='0,256,512,1024',
+                            help='Comma separated compression thresholds in bytes (0 = off).')
+
+    def handle(self, *args, **options):
+        messages = sample_messages(options['count'], options['seed'])
+        plain_bytes = sum(len(m.encode('utf-8')) for m in messages)
+        self.stdout.write(f"{len(messages)} messages, {plain_bytes / 1024:.1f} KiB of plain text\n")
+        self.stdout.write(f"{'threshold':>10} {'db KiB':>10} {'redis KiB':>10} {'saved':>7} {'enc ms':>9} {'dec ms':>9}")
+
+        baseline = None
+        for threshold in [int(t) for t in options['thresholds'].split(',')]:
+            started = time.perf_counter()
+            stored = [encrypt_message(m, threshold=threshold) for m in messages]
+            encrypt_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            for blob in stored:
+                decrypt_message(blob)
+            decrypt_ms = (time.perf_counter() - started) * 1000
+
+            db_bytes = sum(len(blob) for blob in stored)
+            # Same shape as the chat:* list entries.
+            redis_bytes = sum(
+                len(json.dumps({
+                    "id": 1, "sender_id": 1,
+                    "ciphertext": base64.b64encode(blob).decode('utf-8'),
+                    "timestamp": "2025-09-15T10:30:00+00:00",
+                }))
+                for blob in stored
+            )
+            if baseline is None:
+                baseline = db_bytes
+            saved = 100 * (1 - db_bytes / baseline)
+            self.stdout.write(
+                f"{threshold:>10} {db_bytes / 1024:>10.1f} {redis_bytes / 1024:>10.1f} {saved:>6.1f}% "
+                f"{encrypt_ms:>9.1f} {decrypt_ms:>9.1f}"
+            )
+
+
+# run python manage.py benchmark_message_compression --count 20000 to compare thresholds.
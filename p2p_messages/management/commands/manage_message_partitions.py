@@ -0,0 +1,39 @@
+# p2p_messages/management/commands/manage_message_partitions.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from p2p_messages.partitions import (
+    MONTHS_AHEAD, archive_partitions, attached_partitions, ensure_partitions, is_partitioned, partition_name,
+)
+
+class Command(BaseCommand):
+    help = 'Pre-creates monthly Message partitions and optionally archives (detaches) old ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=MONTHS_AHEAD,
+                            help='How many future months to keep partitions for.')
+        parser.add_argument('--archive-older-than', type=int, default=0, metavar='MONTHS',
+                            help='Detach partitions older than this many months into the archive schema.')
+        parser.add_argument('--tablespace', default=getattr(settings, 'MESSAGE_ARCHIVE_TABLESPACE', None),
+                            help='Move archived partitions to this tablespace.')
+        parser.add_argument('--list', action='store_true', help='Only list attached partitions.')
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            self.stdout.write(self.style.WARNING("p2p_messages_message is not partitioned; nothing to do."))
+            return
+
+        if options['list']:
+            for start in attached_partitions():
+                self.stdout.write(f"{partition_name(start)}  {start:%Y-%m}")
+            return
+
+        created = ensure_partitions(options['months_ahead'])
+        self.stdout.write(self.style.SUCCESS(f"Created {len(created)} partition(s): {', '.join(created) or '-'}"))
+
+        if options['archive_older_than']:
+            archived = archive_partitions(options['archive_older_than'], tablespace=options['tablespace'])
+            self.stdout.write(self.style.SUCCESS(f"Archived {len(archived)} partition(s): {', '.join(archived) or '-'}"))
+
+
+# run python manage.py manage_message_partitions --archive-older-than 24 to keep two years of history online.
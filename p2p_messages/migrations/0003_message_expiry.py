@@ -0,0 +1,72 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class AddIndexConcurrentlyOnPostgres(AddIndexConcurrently):
+    # CREATE INDEX CONCURRENTLY is Postgres only; elsewhere a plain index.
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+        return super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+        return super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    # The expiry index is built CONCURRENTLY so writes to messages are not blocked.
+    atomic = False
+
+    dependencies = [
+        ('p2p_messages', '0002_group_conversations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirectConversationSettings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_ttl', models.DurationField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='groupconversation',
+            name='message_ttl',
+            field=models.DurationField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='message',
+            index=models.Index(condition=models.Q(('expires_at__isnull', False)), fields=['expires_at'], name='message_expires_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='directconversationsettings',
+            name='user_high',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='directconversationsettings',
+            name='user_low',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='directconversationsettings',
+            constraint=models.UniqueConstraint(fields=('user_low', 'user_high'), name='unique_direct_conversation'),
+        ),
+        migrations.AddConstraint(
+            model_name='directconversationsettings',
+            constraint=models.CheckConstraint(condition=models.Q(('user_low__lt', models.F('user_high'))), name='direct_conversation_ordered'),
+        ),
+    ]
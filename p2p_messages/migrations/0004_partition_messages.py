@@ -0,0 +1,119 @@
+# Converts p2p_messages_message into a table range-partitioned by month.
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations
+
+# Inlined from p2p_messages/partitions.py as they were when this was
+# written, so later changes there cannot change this migration.
+PARENT_TABLE = "p2p_messages_message"
+MONTHS_AHEAD = 3
+NEW_TABLE = f"{PARENT_TABLE}_new"
+SEQUENCE = f"{PARENT_TABLE}_id_seq"
+
+
+def month_start(dt):
+    dt = dt.astimezone(dt_timezone.utc)
+    return datetime(dt.year, dt.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(dt, months):
+    index = dt.year * 12 + (dt.month - 1) + months
+    return dt.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def create_partition(cursor, start, parent):
+    end = add_months(start, 1)
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS "{PARENT_TABLE}_p{start.year:04d}{start.month:02d}" '
+        f'PARTITION OF "{parent}" FOR VALUES FROM (%s) TO (%s)',
+        [start.isoformat(), end.isoformat()],
+    )
+
+
+def partition_messages(apps, schema_editor):
+    """
+    Postgres only. The table is rebuilt once: the existing rows are copied
+    into monthly partitions under an exclusive lock, so run it in a quiet
+    window. Index and constraint definitions are read from the catalog and
+    re-created with their original names, so later migrations still find
+    them. The primary key becomes (id, timestamp) because a partitioned
+    table's unique keys must include the partition column; ids still come
+    from a single sequence, so they stay unique.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [PARENT_TABLE])
+        if cursor.fetchone()[0] == "p":
+            return
+
+        # Held until the migration commits: nothing can be written between
+        # the copy below and the DROP, and the id sequence stands still.
+        cursor.execute(f'LOCK TABLE "{PARENT_TABLE}" IN ACCESS EXCLUSIVE MODE')
+
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'",
+            [PARENT_TABLE],
+        )
+        pkey_name = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s",
+            [PARENT_TABLE],
+        )
+        index_defs = [indexdef for name, indexdef in cursor.fetchall() if name != pkey_name]
+        cursor.execute(
+            """
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE conrelid = to_regclass(%s) AND contype IN ('c', 'f')
+            """,
+            [PARENT_TABLE],
+        )
+        constraint_defs = cursor.fetchall()
+
+        cursor.execute(f'SELECT min("timestamp"), max(id) FROM "{PARENT_TABLE}"')
+        oldest, max_id = cursor.fetchone()
+        # The sequence can be ahead of max(id) (rolled back inserts).
+        cursor.execute(f'SELECT last_value FROM "{SEQUENCE}"')
+        last_value = cursor.fetchone()[0]
+
+        cursor.execute(f'CREATE SEQUENCE "{NEW_TABLE}_id_seq"')
+        cursor.execute(
+            f'CREATE TABLE "{NEW_TABLE}" (LIKE "{PARENT_TABLE}" INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(f'ALTER TABLE "{NEW_TABLE}" ALTER COLUMN id SET DEFAULT nextval(\'"{NEW_TABLE}_id_seq"\')')
+        cursor.execute(f'ALTER TABLE "{NEW_TABLE}" ADD CONSTRAINT "{NEW_TABLE}_pkey" PRIMARY KEY (id, "timestamp")')
+
+        current = month_start(datetime.now(dt_timezone.utc))
+        start = month_start(oldest) if oldest else current
+        last = add_months(current, MONTHS_AHEAD)
+        while start <= last:
+            create_partition(cursor, start, parent=NEW_TABLE)
+            start = add_months(start, 1)
+
+        cursor.execute(f'INSERT INTO "{NEW_TABLE}" SELECT * FROM "{PARENT_TABLE}"')
+        cursor.execute(f'SELECT setval(\'"{NEW_TABLE}_id_seq"\', %s, false)', [max(max_id or 0, last_value) + 1])
+
+        cursor.execute(f'DROP TABLE "{PARENT_TABLE}"')
+        cursor.execute(f'ALTER TABLE "{NEW_TABLE}" RENAME TO "{PARENT_TABLE}"')
+        cursor.execute(f'ALTER TABLE "{PARENT_TABLE}" RENAME CONSTRAINT "{NEW_TABLE}_pkey" TO "{pkey_name}"')
+        cursor.execute(f'ALTER SEQUENCE "{NEW_TABLE}_id_seq" RENAME TO "{SEQUENCE}"')
+        cursor.execute(f'ALTER SEQUENCE "{SEQUENCE}" OWNED BY "{PARENT_TABLE}".id')
+
+        for indexdef in index_defs:
+            cursor.execute(indexdef)
+        for name, definition in constraint_defs:
+            cursor.execute(f'ALTER TABLE "{PARENT_TABLE}" ADD CONSTRAINT "{name}" {definition}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p2p_messages', '0003_message_expiry'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_messages, migrations.RunPython.noop),
+    ]
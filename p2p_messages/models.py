@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
 
 class Message(models.Model):
@@ -7,15 +8,126 @@ class Message(models.Model):
         on_delete=models.CASCADE,
         related_name="sent_messages"
     )
+    # Exactly one of receiver (direct chat) or group (group chat) is set.
     receiver = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
-        related_name="received_messages"
+        related_name="received_messages",
+        null=True,
+        blank=True,
+    )
+    group = models.ForeignKey(
+        "GroupConversation",
+        on_delete=models.CASCADE,
+        related_name="messages",
+        null=True,
+        blank=True,
     )
     ciphertext = models.BinaryField()  # encrypted message bytes
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Set from the conversation's message TTL when the message is created;
+    # rows past this time are removed by tasks.sweep_expired_messages.
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Group history is read newest-first with a timestamp cursor.
+            models.Index(fields=["group", "-timestamp"]),
+            # Only disappearing messages are indexed, so the sweeper's range
+            # scan stays small no matter how many permanent messages exist.
+            models.Index(
+                fields=["expires_at"],
+                name="message_expires_at_idx",
+                condition=Q(expires_at__isnull=False),
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    Q(receiver__isnull=False, group__isnull=True)
+                    | Q(receiver__isnull=True, group__isnull=False)
+                ),
+                name="message_single_target",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.expires_at is None:
+            from .expiry import expires_at_for
+            self.expires_at = expires_at_for(self)
+        super().save(*args, **kwargs)
 
     def __str__(self):
-        return f'Message id {self.id} from {self.sender} to {self.receiver} at {self.timestamp}'
+        target = self.receiver if self.group_id is None else f"group {self.group_id}"
+        return f'Message id {self.id} from {self.sender} to {target} at {self.timestamp}'
+
 
+class GroupConversation(models.Model):
+    """
+    A chat shared by many members. Messages are stored once per group
+    (Message.group) and every member reads the same rows.
+    """
+    name = models.CharField(max_length=120)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="created_groups",
+    )
+    members = models.ManyToManyField(
+        settings.AUTH_USER_MODEL,
+        through="GroupMembership",
+        related_name="group_conversations",
+    )
+    # Disappearing messages: None keeps messages forever.
+    message_ttl = models.DurationField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Group {self.id}: {self.name}"
 
+
+class GroupMembership(models.Model):
+    ROLE_ADMIN = "admin"
+    ROLE_MEMBER = "member"
+    ROLE_CHOICES = [
+        (ROLE_ADMIN, "Admin"),
+        (ROLE_MEMBER, "Member"),
+    ]
+
+    group = models.ForeignKey(GroupConversation, on_delete=models.CASCADE, related_name="memberships")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="group_memberships")
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES, default=ROLE_MEMBER)
+    joined_at = models.DateTimeField(auto_now_add=True)
+    # Per-member read watermark: everything in the group at or before this
+    # time counts as read, so no per-member message copies are needed.
+    last_read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["group", "user"], name="unique_group_membership"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} in group {self.group_id} ({self.role})"
+
+
+class DirectConversationSettings(models.Model):
+    """
+    Per-conversation settings for a direct chat. The pair is stored ordered
+    (user_low < user_high), the same way chat_key() orders it.
+    """
+    user_low = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    user_high = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    # Disappearing messages: None keeps messages forever.
+    message_ttl = models.DurationField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user_low", "user_high"], name="unique_direct_conversation"),
+            models.CheckConstraint(condition=Q(user_low__lt=models.F("user_high")), name="direct_conversation_ordered"),
+        ]
+
+    def __str__(self):
+        return f"Chat {self.user_low_id}:{self.user_high_id} (ttl={self.message_ttl})"
@@ -0,0 +1,182 @@
+# p2p_messages/partitions.py
+"""
+Monthly range partitions for p2p_messages_message (Postgres only).
+
+The table is partitioned on ``timestamp`` with one partition per calendar
+month (UTC), named ``p2p_messages_message_pYYYYMM``. Partitions are created
+ahead of time by ``ensure_partitions`` (run from the
+``manage_message_partitions`` command and a daily beat task); inserts for a
+month without a partition fail, so keep a few months of headroom.
+
+Old partitions can be detached into the ``message_archive`` schema (and,
+optionally, a cheaper tablespace). Detached months are no longer visible to
+the app; they stay queryable by hand and can be dumped and dropped.
+
+Note for future migrations: CREATE INDEX CONCURRENTLY does not work on a
+partitioned table, so use plain AddIndex on Message.
+"""
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+PARENT_TABLE = "p2p_messages_message"
+ARCHIVE_SCHEMA = "message_archive"
+PARTITION_RE = re.compile(rf"^{PARENT_TABLE}_p(\d{{4}})(\d{{2}})$")
+OLDEST_PARTITION_CACHE_KEY = "message_partitions:oldest"
+MONTHS_AHEAD = getattr(settings, "MESSAGE_PARTITION_MONTHS_AHEAD", 3)
+
+
+def month_start(dt):
+    dt = dt.astimezone(dt_timezone.utc)
+    return datetime(dt.year, dt.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(dt, months):
+    index = dt.year * 12 + (dt.month - 1) + months
+    return dt.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def partition_name(start):
+    return f"{PARENT_TABLE}_p{start.year:04d}{start.month:02d}"
+
+
+def is_partitioned():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [PARENT_TABLE])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def attached_partitions():
+    """
+    Month starts of the partitions currently attached, oldest first.
+    """
+    if not is_partitioned():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            """,
+            [PARENT_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    months = []
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match:
+            months.append(datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc))
+    return sorted(months)
+
+
+def create_partition(cursor, start, parent=PARENT_TABLE):
+    end = add_months(start, 1)
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(start)}" PARTITION OF "{parent}" '
+        f"FOR VALUES FROM (%s) TO (%s)",
+        [start.isoformat(), end.isoformat()],
+    )
+
+
+def ensure_partitions(months_ahead=MONTHS_AHEAD, now=None):
+    """
+    Creates partitions from the current month up to ``months_ahead`` months
+    ahead. Returns the names of partitions that were missing.
+    """
+    if not is_partitioned():
+        return []
+    existing = set(attached_partitions())
+    current = month_start(now or datetime.now(dt_timezone.utc))
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            start = add_months(current, offset)
+            if start not in existing:
+                create_partition(cursor, start)
+                created.append(partition_name(start))
+    if created:
+        cache.delete(OLDEST_PARTITION_CACHE_KEY)
+    return created
+
+
+def archive_partitions(older_than_months, now=None, tablespace=None):
+    """
+    Detaches partitions whose whole month is older than ``older_than_months``
+    and moves them to the archive schema. Returns the archived names.
+    """
+    if not is_partitioned() or older_than_months < 1:
+        return []
+    cutoff = add_months(month_start(now or datetime.now(dt_timezone.utc)), -older_than_months)
+    archived = []
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{ARCHIVE_SCHEMA}"')
+        for start in attached_partitions():
+            if start >= cutoff:
+                break
+            name = partition_name(start)
+            # One short transaction per partition keeps the parent's lock brief.
+            with transaction.atomic():
+                cursor.execute(f'ALTER TABLE "{PARENT_TABLE}" DETACH PARTITION "{name}"')
+                cursor.execute(f'ALTER TABLE "{name}" SET SCHEMA "{ARCHIVE_SCHEMA}"')
+            if tablespace:
+                cursor.execute(f'ALTER TABLE "{ARCHIVE_SCHEMA}"."{name}" SET TABLESPACE "{tablespace}"')
+            archived.append(name)
+    if archived:
+        cache.delete(OLDEST_PARTITION_CACHE_KEY)
+    return archived
+
+
+def oldest_partition_start():
+    """
+    Lower bound of the oldest attached partition, or None when the table is
+    not partitioned (e.g. SQLite in development). Cached; partition changes
+    made through this module drop the cache.
+    """
+    cached = cache.get(OLDEST_PARTITION_CACHE_KEY)
+    if cached is None:
+        months = attached_partitions()
+        cached = months[0].isoformat() if months else ""
+        cache.set(OLDEST_PARTITION_CACHE_KEY, cached, settings.CACHE_TTL_LONG)
+    return datetime.fromisoformat(cached) if cached else None
+
+
+def page_before(queryset, before, limit):
+    """
+    Newest-first page of ``queryset`` rows older than ``before``.
+
+    On a partitioned table the query is run one month window at a time, so
+    each step touches a single partition instead of every partition older
+    than the cursor. When a window is empty, one probe finds the next older
+    row and the scan jumps straight to its month, so sparse conversations do
+    not cost a query per empty month.
+    """
+    if before.tzinfo is None:
+        before = before.replace(tzinfo=dt_timezone.utc)
+    lower_bound = oldest_partition_start()
+    if lower_bound is None:
+        return list(queryset.filter(timestamp__lt=before).order_by("-timestamp")[:limit])
+
+    rows = []
+    upper = before
+    while len(rows) < limit and upper > lower_bound:
+        window_start = max(month_start(upper - timedelta(microseconds=1)), lower_bound)
+        window = list(
+            queryset.filter(timestamp__gte=window_start, timestamp__lt=upper)
+            .order_by("-timestamp")[: limit - len(rows)]
+        )
+        rows.extend(window)
+        upper = window_start
+        if not window and upper > lower_bound:
+            older = queryset.filter(timestamp__lt=upper).order_by("-timestamp").values_list("timestamp", flat=True).first()
+            if older is None:
+                break
+            upper = add_months(month_start(older), 1)
+    return rows
@@ -1,6 +1,8 @@
 # chatapp/redis_helpers.py
 from django_redis import get_redis_connection
 
+from p2p_comm.generations import key_generation
+
 def r():
     return get_redis_connection("default")
 
@@ -11,5 +13,26 @@ def chat_key(user_id_a, user_id_b):
 def recent_chats_key(user_id):
     return f"recent_chats:{user_id}"
 
+def recent_chats_ns(user_id):
+    # Generation of the user's rendered recent chats (p2p_comm/generations.py).
+    return f"chats:{user_id}"
+
+def recent_chats_gen_key(user_id):
+    return key_generation(recent_chats_ns(user_id))
+
+def touch_recent_chats(conn, *user_ids):
+    """
+    Bumps the recent chats generation of each user. ``conn`` may be a
+    pipeline; call after the recent chats / unread / history writes.
+    """
+    for user_id in user_ids:
+        conn.incr(recent_chats_gen_key(user_id))
+
 def unread_key(user_id):
     return f"unread:{user_id}"  # hash: {other_user_id: count}
+
+def group_chat_key(group_id):
+    return f"group_chat:{group_id}"  # list: latest group messages, newest first
+
+def group_members_key(group_id):
+    return f"group_members:{group_id}"  # set: member user ids
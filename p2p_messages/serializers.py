@@ -1,9 +1,10 @@
 from rest_framework import serializers
-from .models import Message
+from .models import Message, GroupConversation, GroupMembership
+from .expiry import MIN_MESSAGE_TTL, MAX_MESSAGE_TTL
+from .cipher import encrypt_message, decrypt_message
+from datetime import timedelta
 from users.models import CustomUser as User
-from django.conf import settings
-from cryptography.fernet import Fernet,InvalidToken
-from cryptography.fernet import Fernet
+from cryptography.fernet import InvalidToken
 # from .fields import Base64BinaryField 
 # In your serializers.py or a new fields.py
 import base64
@@ -27,9 +28,8 @@ class Base64BinaryField(serializers.Field):
 
 # The custom field from before
 
-# Initialize Fernet. Your key MUST be stored securely in your settings/environment.
+# Encryption lives in cipher.py. Your key MUST be stored securely in your settings/environment.
 # Ensure you have a key named 'FERNET_KEY' in your settings.py
-fernet = Fernet(settings.FERNET_KEY)
 
 class MessageSerializer(serializers.ModelSerializer):
     # This field is for the client to SEND plain text. It won't be in the response.
@@ -58,7 +58,7 @@ class MessageSerializer(serializers.ModelSerializer):
         plain_message = validated_data.pop('message')
 
         # 2. Encrypt the message.
-        encrypted_message = fernet.encrypt(plain_message.encode('utf-8'))
+        encrypted_message = encrypt_message(plain_message)
         
         # 3. Add the encrypted message to our data under the 'ciphertext' key.
         validated_data['ciphertext'] = encrypted_message
@@ -77,6 +77,19 @@ class MessageDecryptSerializer(serializers.Serializer):
     message_id = serializers.IntegerField()
 
 
+MAX_BATCH_DECRYPT = 100
+
+class MessageBatchDecryptSerializer(serializers.Serializer):
+    """
+    Serializer to validate a batch of message IDs to decrypt in one request.
+    """
+    message_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        min_length=1,
+        max_length=MAX_BATCH_DECRYPT,
+    )
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -110,8 +123,75 @@ class RecentChatSerializer(serializers.ModelSerializer):
         Decrypts the ciphertext to show a message preview.
         """
         try:
-            fernet = Fernet(settings.FERNET_KEY) 
-            decrypted_text = fernet.decrypt(bytes(obj.ciphertext)).decode('utf-8')
+            decrypted_text = decrypt_message(obj.ciphertext)
             return decrypted_text[:50] + '...' if len(decrypted_text) > 50 else decrypted_text
         except InvalidToken:
-            return "[Decryption Failed]"
\ No newline at end of file
+            return "[Decryption Failed]"
+
+
+class GroupConversationSerializer(serializers.ModelSerializer):
+    """
+    Creates a group from a name and a list of member usernames.
+    The creator is always added as an admin.
+    """
+    members = serializers.ListField(
+        child=serializers.CharField(), write_only=True, required=False
+    )
+    member_count = serializers.IntegerField(read_only=True)
+    unread_count = serializers.IntegerField(read_only=True)
+    last_message_at = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        model = GroupConversation
+        fields = ['id', 'name', 'members', 'member_count', 'unread_count', 'last_message_at', 'created_at']
+        read_only_fields = ['created_at']
+
+    def create(self, validated_data):
+        creator = self.context['request'].user
+        usernames = set(validated_data.pop('members', []))
+        group = GroupConversation.objects.create(created_by=creator, **validated_data)
+
+        users = User.objects.filter(username__in=usernames).exclude(id=creator.id)
+        GroupMembership.objects.bulk_create(
+            [GroupMembership(group=group, user=creator, role=GroupMembership.ROLE_ADMIN)]
+            + [GroupMembership(group=group, user=u) for u in users]
+        )
+        group.member_count = 1 + len(users)
+        group.unread_count = 0
+        group.last_message_at = None
+        return group
+
+
+class GroupMemberSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+    full_name = serializers.CharField(source='user.full_name', read_only=True)
+
+    class Meta:
+        model = GroupMembership
+        fields = ['username', 'full_name', 'role', 'joined_at', 'last_read_at']
+
+
+class GroupMessageSerializer(serializers.Serializer):
+    """
+    Plain text in, one encrypted Message row per group out.
+    """
+    message = serializers.CharField(write_only=True)
+
+
+class MessageTTLSerializer(serializers.Serializer):
+    """
+    Disappearing-message setting for a conversation, in seconds.
+    null turns disappearing messages off.
+    """
+    message_ttl = serializers.IntegerField(
+        allow_null=True,
+        min_value=int(MIN_MESSAGE_TTL.total_seconds()),
+        max_value=int(MAX_MESSAGE_TTL.total_seconds()),
+    )
+
+    def validate_message_ttl(self, value):
+        return timedelta(seconds=value) if value else None
+
+    def to_representation(self, instance):
+        ttl = instance['message_ttl']
+        return {'message_ttl': int(ttl.total_seconds()) if ttl else None}
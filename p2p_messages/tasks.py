@@ -52,7 +52,7 @@ def clean_old_unread_counters():
 # chatapp/tasks.py
 from celery import shared_task
 from django.core.cache import cache
-from .redis_helpers import r, recent_chats_key, unread_key
+from .redis_helpers import r, recent_chats_key, unread_key, touch_recent_chats
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
@@ -63,11 +63,14 @@ def invalidate_recent_chats_cache(user_id, receiver_id):
         recent_chats_key(user_id),
         recent_chats_key(receiver_id),
     ])
+    touch_recent_chats(r(), user_id, receiver_id)
 
 
 @shared_task
 def increment_unread_counter(receiver_id, sender_id):
-    r().hincrby(unread_key(receiver_id), str(sender_id), 1)
+    redis_conn = r()
+    redis_conn.hincrby(unread_key(receiver_id), str(sender_id), 1)
+    touch_recent_chats(redis_conn, receiver_id)
 
 
 @shared_task
@@ -78,3 +81,71 @@ def send_realtime_notification(receiver_id, payload):
         {"type": "chat_message", "payload": {"event": "NEW_MESSAGE", "data": payload}},
     )
 
+
+
+@shared_task
+def send_group_notification(group_id, payload):
+    """
+    One broadcast to the group's channel; every connected member's
+    GroupChatConsumer receives it, so nothing is fanned out per member.
+    """
+    channel_layer = get_channel_layer()
+    async_to_sync(channel_layer.group_send)(
+        f"group_chat_{group_id}",
+        {"type": "chat_message", **payload},
+    )
+
+
+SWEEP_BATCH_SIZE = 500
+SWEEP_MAX_BATCHES = 100
+
+@shared_task
+def sweep_expired_messages(batch_size=SWEEP_BATCH_SIZE, max_batches=SWEEP_MAX_BATCHES):
+    """
+    Deletes expired disappearing messages.
+
+    Each batch is its own short transaction: the ids are picked through the
+    partial expires_at index with FOR UPDATE SKIP LOCKED (rows another
+    worker holds are left for the next run) and deleted by primary key, so
+    no long table locks are taken and WAL is written in small chunks.
+    """
+    from django.db import transaction
+    from django.utils import timezone
+    from .expiry import purge_expired_from_cache
+
+    now = timezone.now()
+    deleted = 0
+    for _ in range(max_batches):
+        with transaction.atomic():
+            rows = list(
+                Message.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=now)
+                .order_by("expires_at")
+                .values_list("id", "sender_id", "receiver_id", "group_id")[:batch_size]
+            )
+            if not rows:
+                break
+            Message.objects.filter(id__in=[row[0] for row in rows]).delete()
+        purge_expired_from_cache(rows)
+        deleted += len(rows)
+        if len(rows) < batch_size:
+            break
+    return deleted
+
+
+@shared_task
+def maintain_message_partitions():
+    """
+    Keeps future Message partitions created and, when
+    MESSAGE_ARCHIVE_AFTER_MONTHS is set, archives the oldest ones.
+    """
+    from .partitions import ensure_partitions, archive_partitions
+
+    created = ensure_partitions()
+    archived = []
+    archive_after = getattr(settings, "MESSAGE_ARCHIVE_AFTER_MONTHS", None)
+    if archive_after:
+        archived = archive_partitions(
+            archive_after, tablespace=getattr(settings, "MESSAGE_ARCHIVE_TABLESPACE", None)
+        )
+    return {"created": created, "archived": archived}
@@ -1,14 +1,26 @@
 # chatapp/urls.py
 from django.urls import path
-from .views import MessageListCreateAPIView, DecryptMessageView, ChatHistoryView,RecentChatsAPIView, unread_counts, mark_read, OldChatHistoryView
+from .views import (
+    MessageListCreateAPIView, DecryptMessageView, BatchDecryptMessageView, ChatHistoryView, RecentChatsAPIView, unread_counts, mark_read, OldChatHistoryView,
+    GroupListCreateAPIView, GroupMembersAPIView, GroupMessagesAPIView, GroupMarkReadAPIView,
+    GroupMessageTTLAPIView, DirectMessageTTLAPIView,
+)
 
 urlpatterns = [
     path('messages/', MessageListCreateAPIView.as_view(), name='message-list-create'),
     path('decrypt/', DecryptMessageView.as_view(), name='decrypt_message'),
+    path('decrypt/batch/', BatchDecryptMessageView.as_view(), name='decrypt_message_batch'),
     path('history/<str:username>/', ChatHistoryView.as_view(), name='chat_history'),
     path('chats/recent/', RecentChatsAPIView.as_view(), name='recent-chats'),
     path("api/unread/", unread_counts),
     path("api/unread/mark-read/", mark_read),
     path('chat/<str:username>/old-history/', OldChatHistoryView.as_view(), name='chat-history'),
+    path('chat/<str:username>/ttl/', DirectMessageTTLAPIView.as_view(), name='chat-message-ttl'),
 
+    # Group conversations
+    path('groups/', GroupListCreateAPIView.as_view(), name='group-list-create'),
+    path('groups/<int:group_id>/members/', GroupMembersAPIView.as_view(), name='group-members'),
+    path('groups/<int:group_id>/messages/', GroupMessagesAPIView.as_view(), name='group-messages'),
+    path('groups/<int:group_id>/mark-read/', GroupMarkReadAPIView.as_view(), name='group-mark-read'),
+    path('groups/<int:group_id>/ttl/', GroupMessageTTLAPIView.as_view(), name='group-message-ttl'),
 ]
@@ -2,7 +2,7 @@
 import json
 
 # Third-Party
-from cryptography.fernet import Fernet, InvalidToken
+from cryptography.fernet import InvalidToken
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from rest_framework import status
@@ -22,13 +22,20 @@ from django.shortcuts import get_object_or_404
 
 # Local Apps
 from users.models import CustomUser as User
-from .models import Message
+from .models import Message, GroupMembership
 from .serializers import (
     MessageSerializer,
     MessageDecryptSerializer,
+    MessageBatchDecryptSerializer,
     RecentChatSerializer,
 )
-from .redis_helpers import r, chat_key, recent_chats_key, unread_key
+from .redis_helpers import (
+    r, chat_key, recent_chats_key, unread_key, group_chat_key, recent_chats_ns, touch_recent_chats,
+)
+from p2p_comm.generations import get_generations
+from p2p_comm.http_cache import cached_json_response
+from .partitions import page_before
+from .cipher import encrypt_message, decrypt_message
 from .tasks import (
     invalidate_recent_chats_cache,
     increment_unread_counter,
@@ -117,6 +124,7 @@ class MessageListCreateAPIView(APIView):
         redis_conn.zadd(recent_chats_key(msg.sender_id), {msg.receiver_id: timestamp})
         redis_conn.zadd(recent_chats_key(msg.receiver_id), {msg.sender_id: timestamp})
         redis_conn.hincrby(unread_key(msg.receiver_id), msg.sender_id, 1)
+        touch_recent_chats(redis_conn, msg.sender_id, msg.receiver_id)
 
         # 4. Trigger real-time notification via async task
         notification_payload = {
@@ -131,8 +139,74 @@ class MessageListCreateAPIView(APIView):
 
 
 # --------------------------
-# Decrypt a single message
+# Decrypt messages (batch + single)
 # --------------------------
+DECRYPTED, UNREADABLE, CORRUPT = "decrypted", "unreadable", "corrupt"
+
+
+def decrypt_messages_for_user(user, message_ids):
+    """
+    Authorizes and decrypts many messages in one query.
+
+    Only rows the user can read are fetched: direct messages are matched on
+    the sender_id/receiver_id columns (no user rows are loaded) and group
+    messages through the user's memberships. Returns {message_id: (status,
+    result)}: DECRYPTED with {"decrypted_message": ...}, UNREADABLE (missing
+    or not the user's) or CORRUPT with {"error": ...}.
+    """
+    message_ids = list(dict.fromkeys(message_ids))
+    my_groups = GroupMembership.objects.filter(user_id=user.id).values('group_id')
+    rows = Message.objects.filter(id__in=message_ids).filter(
+        Q(sender_id=user.id) | Q(receiver_id=user.id) | Q(group_id__in=my_groups)
+    ).values_list('id', 'ciphertext')
+
+    results = {
+        message_id: (UNREADABLE, {"error": "Message not found or you are not authorized to decrypt it."})
+        for message_id in message_ids
+    }
+    for message_id, ciphertext in rows:
+        try:
+            results[message_id] = (DECRYPTED, {"decrypted_message": decrypt_message(ciphertext)})
+        except InvalidToken:
+            results[message_id] = (CORRUPT, {"error": "Invalid or corrupt data."})
+    return results
+
+
+class BatchDecryptMessageView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        methods=['POST'],
+        request=MessageBatchDecryptSerializer,
+        responses={
+            200: OpenApiTypes.OBJECT,
+            400: {'error': 'Invalid request data'},
+        },
+        examples=[
+            OpenApiExample(
+                "Batch response",
+                value={"results": {
+                    "101": {"decrypted_message": "Hello there!"},
+                    "102": {"error": "Message not found or you are not authorized to decrypt it."},
+                }},
+                response_only=True,
+            )
+        ],
+        description='Decrypt up to 100 messages in one request. Returns a result per message id.',
+        summary='Decrypt messages (batch)'
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = MessageBatchDecryptSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        results = decrypt_messages_for_user(request.user, serializer.validated_data['message_ids'])
+        return Response(
+            {"results": {message_id: result for message_id, (_, result) in results.items()}},
+            status=status.HTTP_200_OK,
+        )
+
+
 class DecryptMessageView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -143,9 +217,9 @@ class DecryptMessageView(APIView):
             200: {'decrypted_message': 'str'},
             400: {'error': 'Invalid request data'},
             403: {'error': 'Forbidden'},
-            500: {'error': 'Internal server error'}
+            404: {'error': 'Not found'},
         },
-        description='Decrypt a message.',
+        description='Decrypt a message. Prefer the batch endpoint when decrypting several messages.',
         summary='Decrypt message'
     )
     def post(self, request, *args, **kwargs):
@@ -154,25 +228,19 @@ class DecryptMessageView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         message_id = serializer.validated_data['message_id']
-
-        try:
-            message_obj = get_object_or_404(Message, id=message_id)
-
-            if request.user not in [message_obj.sender, message_obj.receiver]:
-                return Response(
-                    {"error": "You are not authorized to decrypt this message."},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-
-            fernet = Fernet(settings.FERNET_KEY)
-            decrypted_text = fernet.decrypt(bytes(message_obj.ciphertext)).decode('utf-8')
-
-            return Response({'decrypted_message': decrypted_text}, status=status.HTTP_200_OK)
-
-        except InvalidToken:
-            return Response({'error': 'Invalid or corrupt data.'}, status=status.HTTP_400_BAD_REQUEST)
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        outcome, result = decrypt_messages_for_user(request.user, [message_id])[message_id]
+
+        if outcome == DECRYPTED:
+            return Response(result, status=status.HTTP_200_OK)
+        if outcome == CORRUPT:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        # Failure path only: tell "missing" apart from "not yours".
+        if Message.objects.filter(id=message_id).exists():
+            return Response(
+                {"error": "You are not authorized to decrypt this message."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return Response({"error": "Message not found."}, status=status.HTTP_404_NOT_FOUND)
 
 
 # --------------------------
@@ -320,13 +388,13 @@ class ChatHistoryView(APIView):
         other_user = get_object_or_404(User, username=username)
         redis_conn = r()
         key = chat_key(request.user.id, other_user.id)
-        fernet = Fernet(settings.FERNET_KEY)
         response_data = []
 
         # --- Path A: Initial Load (No Cursor) ---
         if not before_timestamp:
             # When fetching the latest history, mark messages from this user as read.
-            redis_conn.hdel(unread_key(request.user.id), other_user.id)
+            if redis_conn.hdel(unread_key(request.user.id), other_user.id):
+                touch_recent_chats(redis_conn, request.user.id)
 
             # 1. Try to fetch the latest 100 messages from Redis cache
             cached_messages_json = redis_conn.lrange(key, 0, 99)
@@ -344,7 +412,7 @@ class ChatHistoryView(APIView):
                     if not sender_id: continue
                     try:
                         encrypted_bytes = base64.b64decode(msg['ciphertext'])
-                        decrypted_message = fernet.decrypt(encrypted_bytes).decode('utf-8')
+                        decrypted_message = decrypt_message(encrypted_bytes)
                     except (InvalidToken, base64.binascii.Error):
                         decrypted_message = "[Decryption Failed]"
                     
@@ -374,7 +442,7 @@ class ChatHistoryView(APIView):
             for msg in messages:
                 # The response data is built in reverse chronological order
                 try:
-                    decrypted_message = fernet.decrypt(bytes(msg.ciphertext)).decode('utf-8')
+                    decrypted_message = decrypt_message(msg.ciphertext)
                 except InvalidToken:
                     decrypted_message = "[Decryption Failed]"
                 
@@ -406,15 +474,19 @@ class ChatHistoryView(APIView):
         else:
             # We are fetching older messages, so we go STRAIGHT to the database.
             # No need to check or update the Redis cache for these historical queries.
-            messages = Message.objects.filter(
-                (Q(sender=request.user, receiver=other_user)) |
-                (Q(sender=other_user, receiver=request.user)),
-                timestamp__lt=before_timestamp  # <-- The key pagination filter
-            ).order_by('-timestamp')[:50]  # <-- Get the next 50 messages in a "page"
+            # page_before() walks back one monthly partition at a time.
+            messages = page_before(
+                Message.objects.select_related('sender', 'receiver').filter(
+                    (Q(sender=request.user, receiver=other_user)) |
+                    (Q(sender=other_user, receiver=request.user))
+                ),
+                before_timestamp,  # <-- The key pagination filter
+                50,  # <-- Get the next 50 messages in a "page"
+            )
 
             for msg in messages:
                 try:
-                    decrypted_message = fernet.decrypt(bytes(msg.ciphertext)).decode('utf-8')
+                    decrypted_message = decrypt_message(msg.ciphertext)
                 except InvalidToken:
                     decrypted_message = "[Decryption Failed]"
                 
@@ -761,14 +833,30 @@ import base64
 # from .redis_keys import recent_chats_key, unread_key, chat_key
 
 
+# Names and avatars of chat partners are not tracked by the generation,
+# they show up after at most this long.
+RECENT_CHATS_RENDERED_TTL = 30
+
+
 class RecentChatsAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
         user_id = request.user.id
+
+        # Served as cached JSON bytes until the user's recent chats
+        # generation moves on (every send, read and delete bumps it).
+        def build():
+            gens = get_generations([recent_chats_ns(user_id)])
+            return self.build_recent_chats(user_id), gens
+
+        return cached_json_response(
+            request, f"recent_chats:{user_id}", build, RECENT_CHATS_RENDERED_TTL
+        )
+
+    def build_recent_chats(self, user_id):
         redis_conn = r()
         response_data = []
-        fernet = Fernet(settings.FERNET_KEY)
 
         # 1. Fetch the list of recent chat partners from Redis
         other_user_ids = [int(uid) for uid in redis_conn.zrevrange(recent_chats_key(user_id), 0, -1)]
@@ -802,7 +890,7 @@ class RecentChatsAPIView(APIView):
                     try:
                         ciphertext_b64 = last_msg['ciphertext']
                         ciphertext_bytes = base64.b64decode(ciphertext_b64)
-                        decrypted_text = fernet.decrypt(ciphertext_bytes).decode('utf-8')
+                        decrypted_text = decrypt_message(ciphertext_bytes)
 
                         if last_msg.get('sender_id') == user_id:
                             last_message_preview = f"You: {decrypted_text}"
@@ -825,14 +913,15 @@ class RecentChatsAPIView(APIView):
                     "last_message_preview": last_message_preview, "timestamp": last_message_time,
                     "unread_count": unread_counts.get(other_id, 0)
                 })
-            return Response(response_data)
+            return response_data
 
         # --- CACHE MISS / DATABASE FALLBACK PATH ---
         # ✅ CHANGE 3: Fetch related sender/receiver profiles in the initial query
         latest_messages = Message.objects.select_related(
             'sender__profile', 'receiver__profile'
         ).filter(
-            Q(sender_id=user_id) | Q(receiver_id=user_id)
+            Q(sender_id=user_id) | Q(receiver_id=user_id),
+            group__isnull=True,  # group messages have no chat partner
         ).annotate(
             chat_partner_id=Case(
                 When(sender_id=user_id, then=DjF('receiver_id')),
@@ -842,7 +931,7 @@ class RecentChatsAPIView(APIView):
         ).order_by('chat_partner_id', '-timestamp').distinct('chat_partner_id')
 
         if not latest_messages:
-            return Response([])
+            return []
 
         unread_counts = {int(k): int(v) for k, v in redis_conn.hgetall(unread_key(user_id)).items()}
         cache_pipe = redis_conn.pipeline()
@@ -853,7 +942,7 @@ class RecentChatsAPIView(APIView):
             other_user = msg.sender if msg.receiver_id == user_id else msg.receiver
             
             try:
-                decrypted_preview = fernet.decrypt(bytes(msg.ciphertext)).decode('utf-8')
+                decrypted_preview = decrypt_message(msg.ciphertext)
                 if msg.sender_id == user_id:
                     decrypted_preview = f"You: {decrypted_preview}"
             except InvalidToken:
@@ -890,7 +979,7 @@ class RecentChatsAPIView(APIView):
             cache_pipe.lpush(chat_hist_key, json.dumps(message_payload))
         
         cache_pipe.execute()
-        return Response(response_data)
+        return response_data
 
 
 
@@ -918,7 +1007,9 @@ def unread_counts(request):
 @permission_classes([IsAuthenticated])
 def mark_read(request):
     other_id = int(request.data.get("other_user_id"))
-    r().hdel(unread_key(request.user.id), str(other_id))
+    redis_conn = r()
+    if redis_conn.hdel(unread_key(request.user.id), str(other_id)):
+        touch_recent_chats(redis_conn, request.user.id)
     return Response({"ok": True})
 
 
@@ -982,22 +1073,21 @@ class OldChatHistoryView(APIView):
         queryset = Message.objects.select_related('sender', 'receiver').filter(
             (Q(sender=user1) & Q(receiver=user2)) |
             (Q(sender=user2) & Q(receiver=user1))
-        ).order_by('-timestamp')
-
-        if cursor_timestamp_str:
-            cursor_timestamp = parse_datetime(cursor_timestamp_str)
-            if cursor_timestamp:
-                queryset = queryset.filter(timestamp__lt=cursor_timestamp)
+        )
 
-        messages = queryset[:CHAT_PAGE_SIZE]
+        cursor_timestamp = parse_datetime(cursor_timestamp_str) if cursor_timestamp_str else None
+        if cursor_timestamp:
+            # Only the monthly partitions at or before the cursor are scanned.
+            messages = page_before(queryset, cursor_timestamp, CHAT_PAGE_SIZE)
+        else:
+            messages = queryset.order_by('-timestamp')[:CHAT_PAGE_SIZE]
 
         # 2. Manually decrypt and build the response list, just like in RecentChatsAPIView
-        fernet = Fernet(settings.FERNET_KEY)
         response_data = []
         
         for msg in messages:
             try:
-                decrypted_text = fernet.decrypt(bytes(msg.ciphertext)).decode('utf-8')
+                decrypted_text = decrypt_message(msg.ciphertext)
             except InvalidToken:
                 decrypted_text = "[Message could not be decrypted]"
             
@@ -1036,7 +1126,7 @@ class DeleteMessageView(APIView):
         user = request.user
         
         try:
-            message = Message.objects.get(id=message_id, sender=user)
+            message = Message.objects.get(id=message_id, sender=user, group__isnull=True)
         except Message.DoesNotExist:
             return Response(
                 {"error": "Message not found or you don't have permission to delete it."},
@@ -1084,9 +1174,345 @@ class DeleteMessageView(APIView):
                 # If no messages are left, remove the conversation from each user's recent chats
                 redis_conn.zrem(user_recent_key, str(other_user_id))
                 redis_conn.zrem(other_user_recent_key, str(user.id))
+            redis_helpers.touch_recent_chats(redis_conn, user.id, other_user_id)
 
         except Exception as e:
             print(f"Could not update cache for deleted message {message_id}: {e}")
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+
+
+
+# --------------------------
+# Group Conversations
+# --------------------------
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import GroupConversation
+from .serializers import GroupConversationSerializer, GroupMemberSerializer, GroupMessageSerializer, MessageTTLSerializer
+from .expiry import get_direct_ttl, get_group_ttl, set_direct_ttl, set_group_ttl
+from .groups import is_group_member, invalidate_group_members
+from .tasks import send_group_notification
+
+GROUP_CACHE_SIZE = 100
+
+
+def _group_cache_payload(msg):
+    return {
+        "id": msg.id,
+        "sender_id": msg.sender_id,
+        "ciphertext": base64.b64encode(bytes(msg.ciphertext)).decode('utf-8'),
+        "timestamp": msg.timestamp.isoformat(),
+    }
+
+
+class GroupListCreateAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="List my group conversations",
+        description="Groups the user belongs to, with member count, unread count and last activity.",
+        responses={200: GroupConversationSerializer(many=True)},
+        tags=["Groups"],
+    )
+    def get(self, request):
+        group_messages = Message.objects.filter(group_id=OuterRef('group_id'))
+        unread = group_messages.filter(
+            timestamp__gt=Coalesce(OuterRef('last_read_at'), OuterRef('joined_at'))
+        ).exclude(sender_id=request.user.id).order_by().values('group_id').annotate(c=Count('id')).values('c')
+        member_count = GroupMembership.objects.filter(
+            group_id=OuterRef('group_id')
+        ).order_by().values('group_id').annotate(c=Count('id')).values('c')
+
+        memberships = GroupMembership.objects.filter(user=request.user).select_related('group').annotate(
+            member_count=Subquery(member_count),
+            unread_count=Coalesce(Subquery(unread), 0),
+            last_message_at=Subquery(group_messages.order_by('-timestamp').values('timestamp')[:1]),
+        ).order_by(DjF('last_message_at').desc(nulls_last=True))
+
+        response_data = [
+            {
+                "id": m.group_id,
+                "name": m.group.name,
+                "member_count": m.member_count,
+                "unread_count": m.unread_count,
+                "last_message_at": m.last_message_at.isoformat() if m.last_message_at else None,
+                "created_at": m.group.created_at.isoformat(),
+            }
+            for m in memberships
+        ]
+        return Response(response_data)
+
+    @extend_schema(
+        summary="Create a group conversation",
+        request=GroupConversationSerializer,
+        responses={201: GroupConversationSerializer, 400: OpenApiResponse(description="Validation error")},
+        tags=["Groups"],
+    )
+    def post(self, request):
+        serializer = GroupConversationSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class GroupMembersAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="List group members",
+        responses={200: GroupMemberSerializer(many=True), 403: OpenApiResponse(description="Not a member")},
+        tags=["Groups"],
+    )
+    def get(self, request, group_id):
+        if not is_group_member(group_id, request.user.id):
+            return Response({"error": "You are not a member of this group."}, status=status.HTTP_403_FORBIDDEN)
+        memberships = GroupMembership.objects.filter(group_id=group_id).select_related('user').order_by('joined_at')
+        return Response(GroupMemberSerializer(memberships, many=True).data)
+
+    @extend_schema(
+        summary="Add a member to a group",
+        description="Only group admins can add members. Body: {\"username\": \"...\"}.",
+        responses={201: GroupMemberSerializer, 403: OpenApiResponse(description="Not a group admin")},
+        tags=["Groups"],
+    )
+    def post(self, request, group_id):
+        group = get_object_or_404(GroupConversation, id=group_id)
+        if not GroupMembership.objects.filter(
+            group=group, user=request.user, role=GroupMembership.ROLE_ADMIN
+        ).exists():
+            return Response({"error": "Only group admins can add members."}, status=status.HTTP_403_FORBIDDEN)
+
+        user = get_object_or_404(User, username=request.data.get("username"))
+        membership, _ = GroupMembership.objects.get_or_create(group=group, user=user)
+        invalidate_group_members(group.id)
+        return Response(GroupMemberSerializer(membership).data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        summary="Remove a member from a group",
+        description="Admins can remove anyone; members can remove themselves. Body: {\"username\": \"...\"}.",
+        responses={204: None, 403: OpenApiResponse(description="Not allowed")},
+        tags=["Groups"],
+    )
+    def delete(self, request, group_id):
+        username = request.data.get("username") or request.user.username
+        is_admin = GroupMembership.objects.filter(
+            group_id=group_id, user=request.user, role=GroupMembership.ROLE_ADMIN
+        ).exists()
+        if username != request.user.username and not is_admin:
+            return Response({"error": "Only group admins can remove other members."}, status=status.HTTP_403_FORBIDDEN)
+
+        GroupMembership.objects.filter(group_id=group_id, user__username=username).delete()
+        invalidate_group_members(group_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class GroupMessagesAPIView(APIView):
+    """
+    Group history and sending. Messages are stored once per group; the
+    latest 100 live in Redis and older pages use the same before_timestamp
+    cursor as ChatHistoryView.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Retrieve group chat history",
+        parameters=[
+            OpenApiParameter(
+                name="before_timestamp",
+                type=OpenApiTypes.DATETIME,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                description="The ISO 8601 timestamp of the oldest message you have.",
+            ),
+        ],
+        responses={200: OpenApiTypes.OBJECT, 403: OpenApiResponse(description="Not a member")},
+        tags=["Groups"],
+    )
+    def get(self, request, group_id):
+        if not is_group_member(group_id, request.user.id):
+            return Response({"error": "You are not a member of this group."}, status=status.HTTP_403_FORBIDDEN)
+
+        before_timestamp_str = request.query_params.get('before_timestamp')
+        before_timestamp = parse_datetime(before_timestamp_str) if before_timestamp_str else None
+        redis_conn = r()
+        key = group_chat_key(group_id)
+
+        if before_timestamp:
+            messages = page_before(
+                Message.objects.select_related('sender').filter(group_id=group_id),
+                before_timestamp,
+                CHAT_PAGE_SIZE,
+            )
+            rows = [(m.id, m.sender.username, bytes(m.ciphertext), m.timestamp.isoformat()) for m in messages]
+        else:
+            # Opening the latest history moves the reader's watermark forward.
+            GroupMembership.objects.filter(group_id=group_id, user=request.user).update(last_read_at=timezone.now())
+
+            cached_messages = [json.loads(m) for m in redis_conn.lrange(key, 0, GROUP_CACHE_SIZE - 1)]
+            if cached_messages:
+                sender_ids = {m['sender_id'] for m in cached_messages}
+                user_map = dict(User.objects.filter(id__in=sender_ids).values_list('id', 'username'))
+                rows = []
+                for m in cached_messages:
+                    try:
+                        encrypted_bytes = base64.b64decode(m['ciphertext'])
+                    except base64.binascii.Error:
+                        encrypted_bytes = b''
+                    rows.append((m['id'], user_map.get(m['sender_id'], "Unknown User"), encrypted_bytes, m['timestamp']))
+            else:
+                messages = list(
+                    Message.objects.select_related('sender').filter(group_id=group_id).order_by('-timestamp')[:GROUP_CACHE_SIZE]
+                )
+                if messages:
+                    with redis_conn.pipeline() as pipe:
+                        pipe.delete(key)
+                        pipe.rpush(key, *[json.dumps(_group_cache_payload(m)) for m in messages])
+                        pipe.execute()
+                rows = [(m.id, m.sender.username, bytes(m.ciphertext), m.timestamp.isoformat()) for m in messages]
+
+        response_data = []
+        for message_id, sender, encrypted_bytes, timestamp in rows:
+            try:
+                decrypted_message = decrypt_message(encrypted_bytes)
+            except InvalidToken:
+                decrypted_message = "[Decryption Failed]"
+            response_data.append({
+                'id': message_id,
+                'sender': sender,
+                'group': group_id,
+                'timestamp': timestamp,
+                'message': decrypted_message,
+            })
+
+        response_data.reverse()  # Oldest first, newest last
+        return Response(response_data)
+
+    @extend_schema(
+        summary="Send a message to a group",
+        request=GroupMessageSerializer,
+        responses={201: OpenApiTypes.OBJECT, 403: OpenApiResponse(description="Not a member")},
+        tags=["Groups"],
+    )
+    def post(self, request, group_id):
+        serializer = GroupMessageSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not is_group_member(group_id, request.user.id):
+            return Response({"error": "You are not a member of this group."}, status=status.HTTP_403_FORBIDDEN)
+
+        msg = Message.objects.create(
+            sender=request.user,
+            group_id=group_id,
+            ciphertext=encrypt_message(serializer.validated_data['message']),
+        )
+
+        redis_conn = r()
+        key = group_chat_key(group_id)
+        with redis_conn.pipeline() as pipe:
+            pipe.lpush(key, json.dumps(_group_cache_payload(msg)))
+            pipe.ltrim(key, 0, GROUP_CACHE_SIZE - 1)
+            pipe.execute()
+
+        payload = {
+            "message_id": msg.id,
+            "ciphertext": base64.b64encode(bytes(msg.ciphertext)).decode('utf-8'),
+            "sender": request.user.username,
+            "timestamp": msg.timestamp.isoformat(),
+        }
+        send_group_notification.delay(group_id, payload)
+
+        return Response({
+            "id": msg.id,
+            "sender": request.user.username,
+            "group": group_id,
+            "timestamp": msg.timestamp.isoformat(),
+        }, status=status.HTTP_201_CREATED)
+
+
+class GroupMessageTTLAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Get a group's disappearing-message TTL",
+        responses={200: MessageTTLSerializer, 403: OpenApiResponse(description="Not a member")},
+        tags=["Groups"],
+    )
+    def get(self, request, group_id):
+        if not is_group_member(group_id, request.user.id):
+            return Response({"error": "You are not a member of this group."}, status=status.HTTP_403_FORBIDDEN)
+        return Response(MessageTTLSerializer({'message_ttl': get_group_ttl(group_id)}).data)
+
+    @extend_schema(
+        summary="Set a group's disappearing-message TTL",
+        description="Admins only. Applies to messages sent after the change; null turns it off.",
+        request=MessageTTLSerializer,
+        responses={200: MessageTTLSerializer, 403: OpenApiResponse(description="Not an admin")},
+        tags=["Groups"],
+    )
+    def put(self, request, group_id):
+        serializer = MessageTTLSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not GroupMembership.objects.filter(
+            group_id=group_id, user=request.user, role=GroupMembership.ROLE_ADMIN
+        ).exists():
+            return Response({"error": "Only group admins can change this."}, status=status.HTTP_403_FORBIDDEN)
+
+        set_group_ttl(group_id, serializer.validated_data['message_ttl'])
+        return Response(MessageTTLSerializer(serializer.validated_data).data)
+
+
+class GroupMarkReadAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Mark a group as read",
+        description="Moves the caller's read watermark for the group to now.",
+        responses={200: OpenApiTypes.OBJECT},
+        tags=["Groups"],
+    )
+    def post(self, request, group_id):
+        updated = GroupMembership.objects.filter(group_id=group_id, user=request.user).update(
+            last_read_at=timezone.now()
+        )
+        if not updated:
+            return Response({"error": "You are not a member of this group."}, status=status.HTTP_403_FORBIDDEN)
+        return Response({"ok": True})
+
+
+# --------------------------
+# Disappearing messages (direct chats)
+# --------------------------
+class DirectMessageTTLAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Get a chat's disappearing-message TTL",
+        responses={200: MessageTTLSerializer},
+        tags=["Messages"],
+    )
+    def get(self, request, username):
+        other_user = get_object_or_404(User, username=username)
+        return Response(MessageTTLSerializer({'message_ttl': get_direct_ttl(request.user.id, other_user.id)}).data)
+
+    @extend_schema(
+        summary="Set a chat's disappearing-message TTL",
+        description="Either participant may change it. Applies to messages sent after the change; null turns it off.",
+        request=MessageTTLSerializer,
+        responses={200: MessageTTLSerializer},
+        tags=["Messages"],
+    )
+    def put(self, request, username):
+        other_user = get_object_or_404(User, username=username)
+        if other_user.id == request.user.id:
+            return Response({"error": "Cannot configure a chat with yourself."}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = MessageTTLSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        set_direct_ttl(request.user.id, other_user.id, serializer.validated_data['message_ttl'])
+        return Response(MessageTTLSerializer(serializer.validated_data).data)
@@ -1,12 +1,38 @@
+import time
+import uuid
+
 from django.core.cache import cache
 from django.conf import settings
+from django_redis import get_redis_connection
+
+from p2p_comm.generations import get_generations, bump_generation
+from . import local_cache
 
 POSTS_TTL = getattr(settings, "POSTS_CACHE_TTL", 600)
 COMMENTS_TTL = getattr(settings, "COMMENTS_CACHE_TTL", 180)
+# Fragments are rewritten on every change, the TTL only evicts posts that
+# have dropped out of the feed.
+FRAGMENT_TTL = getattr(settings, "POST_FRAGMENT_CACHE_TTL", 60 * 60 * 24)
+# Stale-while-revalidate: an entry is refreshed in the background once
+# SOFT_TTL_RATIO of its timeout has passed, and served stale until then.
+SOFT_TTL_RATIO = 0.8
+# Pre-rendered JSON (p2p_comm/http_cache.py) lives until the soft expiry, so
+# the entries underneath still get their background refresh.
+RENDERED_TTL = int(POSTS_TTL * SOFT_TTL_RATIO)
+# Single-flight recompute lock. Requests that lose the race poll for the
+# winner's result for up to LOCK_WAIT seconds.
+LOCK_TTL = 10
+LOCK_WAIT = 2.0
+LOCK_POLL = 0.05
 
 # Cache keys
-def key_posts_list() -> str:
-    return "posts:list:v1"
+def key_posts_ids() -> str:
+    # Raw Redis sorted set (post id -> created_at epoch), newest first.
+    return "posts:feed_ids:v2"
+
+def key_post_fragment(post_id) -> str:
+    # One serialized post, shared by the feed and anything else listing posts.
+    return f"posts:fragment:v2:{post_id}"
 
 def key_post_detail(slug: str) -> str:
     return f"posts:detail:v1:{slug}"
@@ -14,12 +40,44 @@ def key_post_detail(slug: str) -> str:
 def key_post_comments(slug: str) -> str:
     return f"posts:comments:v1:{slug}"
 
+def key_post_comments_page(slug: str, cursor, limit: int) -> str:
+    # One page of top-level comments, stamped with the post's generation.
+    return f"{key_post_comments(slug)}:{cursor or 'first'}:{limit}"
+
 def key_post_likes_count(slug: str) -> str:
+    # Raw Redis counter kept next to the likers set (see posts/likes.py).
     return f"posts:likes_count:v1:{slug}"
 
+def key_post_likers(slug: str) -> str:
+    return f"posts:likers:v1:{slug}"
+
+def key_post_likes_pending(slug: str) -> str:
+    return f"posts:likes_pending:v1:{slug}"
+
+def key_comment_likers(slug: str) -> str:
+    return f"comments:likers:v1:{slug}"
+
+def key_comment_likes_count(slug: str) -> str:
+    return f"comments:likes_count:v1:{slug}"
+
+def key_comment_likes_pending(slug: str) -> str:
+    return f"comments:likes_pending:v1:{slug}"
+
+def key_likes_dirty() -> str:
+    return "likes:dirty"
+
+def key_posts_dirty() -> str:
+    # Raw Redis set of "<post_id>:<slug>" waiting for warm_dirty_posts.
+    return "posts:dirty:v1"
+
+def key_posts_warm_scheduled() -> str:
+    return "posts:warm_scheduled:v1"
+
 # Get/Set helpers
+# Reads go through the optional in-process tier (posts/local_cache.py);
+# writes and deletes update it and evict the keys in every other process.
 def cache_get(key: str):
-    return cache.get(key)
+    return local_cache.get_many([key], cache.get_many).get(key)
 
 # def cache_set(key: str, value, ttl: int):
 #     cache.set(key, value, ttl)
@@ -27,14 +85,202 @@ def cache_get(key: str):
 def cache_set(key: str, value, timeout):
     # The value 300 from POSTS_TTL is correctly assigned to the 'timeout' parameter
     cache.set(key, value, timeout=timeout)
+    local_cache.remember({key: value}, timeout)
 def cache_delete(*keys: str):
-    for k in keys:
-        cache.delete(k)
-
-def invalidate_post(slug: str):
-    cache_delete(
-        key_posts_list(),
-        key_post_detail(slug),
-        key_post_comments(slug),
-        key_post_likes_count(slug),
+    # One DEL for all keys.
+    if keys:
+        cache.delete_many(keys)
+        local_cache.forget(keys)
+
+def cache_delete_many(keys):
+    if keys:
+        cache.delete_many(keys)
+        local_cache.forget(keys)
+
+def cache_get_many(keys):
+    # One MGET round trip for whatever the local tier does not hold;
+    # missing keys are simply absent from the result.
+    return local_cache.get_many(keys, cache.get_many)
+
+def cache_set_many(mapping: dict, timeout):
+    cache.set_many(mapping, timeout=timeout)
+    local_cache.remember(mapping, timeout)
+
+
+# Single-flight locks and soft TTLs
+
+# Deletes the lock only if it still holds our token.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+
+def key_lock(key: str) -> str:
+    return f"lock:{key}"
+
+def key_refresh(key: str) -> str:
+    return f"refresh:{key}"
+
+def acquire_lock(key: str, ttl=LOCK_TTL):
+    """
+    SET NX with a TTL. Returns a token to release the lock with, or None
+    when someone else holds it.
+    """
+    token = uuid.uuid4().hex
+    if get_redis_connection("default").set(key_lock(key), token, nx=True, ex=ttl):
+        return token
+    return None
+
+def claim_refresh(key: str, ttl=LOCK_TTL) -> bool:
+    """
+    SET NX on refresh:<key>, so one stale read per TTL schedules a
+    refresh. Kept apart from lock:<key>, which a concurrent rebuild holds.
+    """
+    return bool(get_redis_connection("default").set(key_refresh(key), 1, nx=True, ex=ttl))
+
+def release_lock(key: str, token):
+    redis_conn = get_redis_connection("default")
+    redis_conn.register_script(RELEASE_SCRIPT)(keys=[key_lock(key)], args=[token])
+
+def single_flight(key: str, compute, recheck, wait=LOCK_WAIT):
+    """
+    Runs compute() in one request at a time per key. The others poll
+    recheck() until it returns something other than None, and compute on
+    their own only if the lock holder has not finished within ``wait``.
+    """
+    token = acquire_lock(key)
+    if token is None:
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL)
+            result = recheck()
+            if result is not None:
+                return result
+        return compute()
+    try:
+        return compute()
+    finally:
+        release_lock(key, token)
+
+# Generation counters (p2p_comm/generations.py)
+#   posts            every post fragment and detail (e.g. after a serializer change)
+#   post:<id>        one post: its detail and comment lists
+#   author:<id>      everything showing that user's name or avatar
+#   feed             the rendered feed: its id list or any fragment in it
+#   search:posts     cached post search results (which posts match)
+
+def ns_posts() -> str:
+    return "posts"
+
+def ns_post(post_id) -> str:
+    return f"post:{post_id}"
+
+def ns_author(user_id) -> str:
+    return f"author:{user_id}"
+
+def ns_feed() -> str:
+    return "feed"
+
+def ns_post_search() -> str:
+    # Cached post search id lists (p2p_comm/search_cache.py).
+    return "search:posts"
+
+def post_namespaces(post_id, author_id):
+    return [ns_posts(), ns_post(post_id), ns_author(author_id)]
+
+
+# Entries
+#
+# Values stored through make_entry carry their generation stamps and an
+# optional soft expiry (stale-while-revalidate): past SOFT_TTL_RATIO of the
+# timeout they are still served, but refreshed in the background.
+
+def make_entry(value, soft_ttl=None, gens=None):
+    return {
+        "swr": 1,
+        "value": value,
+        "fresh_until": None if soft_ttl is None else time.time() + soft_ttl,
+        "gens": gens or {},
+    }
+
+def _is_entry(entry):
+    return isinstance(entry, dict) and entry.get("swr") == 1
+
+def cache_set_swr(key: str, value, timeout, soft_ttl=None, gens=None):
+    soft_ttl = int(timeout * SOFT_TTL_RATIO) if soft_ttl is None else soft_ttl
+    cache_set(key, make_entry(value, soft_ttl, gens), timeout)
+
+def unwrap_many(entries: dict) -> dict:
+    """
+    {key: stored entry} -> {key: (value, fresh, gens)}, leaving out entries built
+    under an older generation. All stamps are checked with one MGET.
+    Values stored before entries existed count as fresh.
+    """
+    current = get_generations(
+        ns for entry in entries.values() if _is_entry(entry) for ns in entry["gens"]
     )
+    now = time.time()
+    result = {}
+    for key, entry in entries.items():
+        if not _is_entry(entry):
+            result[key] = (entry, True, {})
+        elif all(current.get(ns, 0) == gen for ns, gen in entry["gens"].items()):
+            fresh_until = entry["fresh_until"]
+            result[key] = (entry["value"], fresh_until is None or now < fresh_until, entry["gens"])
+    return result
+
+def _unwrap(key, entry):
+    return unwrap_many({key: entry}).get(key) if entry is not None else None
+
+def cache_get_swr(key: str, compute, timeout, refresh=None, with_gens=False, known=None):
+    """
+    Cached value of ``key``, computed at most once at a time.
+
+    compute() returns (value, namespaces); the value is stored stamped
+    with those namespaces' generations. known() returns the namespaces
+    that can be found cheaply before computing: their generations are read
+    first, so a change landing during compute() leaves the value stamped
+    old, and it is then returned but not stored. Namespaces that depend on
+    the computed rows are read afterwards. A fresh hit is returned as is. A
+    hit past its soft TTL is returned stale and ``refresh`` (which should
+    queue a background recompute that writes with cache_set_swr) is called
+    by the one request that wins the lock; the lock is left to expire so
+    the refresh is not queued twice. A miss, or an entry from an older
+    generation, is recomputed by one request while the others wait for it.
+    Exceptions from compute() propagate and nothing is stored. With
+    with_gens, returns (value, generation stamps).
+    """
+    hit = _unwrap(key, cache_get(key))
+    if hit is not None:
+        value, fresh, gens = hit
+        if not fresh and refresh is not None and claim_refresh(key):
+            refresh()
+        return (value, gens) if with_gens else value
+
+    def recheck():
+        hit = _unwrap(key, cache_get(key))
+        return None if hit is None else (hit[0], hit[2])
+
+    def compute_and_store():
+        before = get_generations(known()) if known is not None else {}
+        value, namespaces = compute()
+        gens = get_generations(namespaces)
+        moved = any(gens.get(ns, gen) != gen for ns, gen in before.items())
+        gens.update({ns: gen for ns, gen in before.items() if ns in gens})
+        if not moved:
+            cache_set_swr(key, value, timeout, gens=gens)
+        return value, gens
+
+    value, gens = single_flight(key, compute_and_store, recheck)
+    return (value, gens) if with_gens else value
+
+def invalidate_post(post_id):
+    # Detail and comment entries of the post all become misses.
+    bump_generation(ns_post(post_id))
+
+def invalidate_author(user_id):
+    bump_generation(ns_author(user_id), ns_feed())
+
+def invalidate_post_search():
+    bump_generation(ns_post_search())
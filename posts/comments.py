@@ -0,0 +1,116 @@
+"""
+Keyset-paginated, cached comment threads.
+
+Top-level comments of a post are listed newest first in pages of
+``limit``, ordered by (created_at, id) so a page boundary never skips or
+repeats a comment when new ones arrive. The cursor is the position of the
+last comment on the previous page.
+
+Each page is cached under key_post_comments_page and stamped with the
+generations of the post and of every author on it, so a comment being
+created, edited or deleted (posts/signals.py), or an author changing their
+name or avatar, turns the cached pages into misses.
+
+Whole threads come from the materialized Comment.path: a subtree is every
+comment whose path starts with the root's, and ordering by path lists it
+parents first, replies in the order they were written (comment_subtree).
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+from .cache import (
+    COMMENTS_TTL, key_post_comments_page, cache_get_swr, ns_post, ns_posts, ns_author,
+)
+from .models import Post, Comment
+from .serializers import CommentListSerializer, CommentThreadSerializer
+
+COMMENTS_PAGE_SIZE = 20
+MAX_COMMENTS_PAGE_SIZE = 50
+THREAD_DEPTH = 5
+MAX_THREAD_DEPTH = 20
+THREAD_LIMIT = 200
+MAX_THREAD_LIMIT = 500
+
+
+def encode_cursor(comment):
+    raw = f"{comment.created_at.isoformat()}|{comment.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    (created_at, id) from a cursor. Raises ValueError if it is malformed.
+    """
+    try:
+        created_at, comment_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(comment_id)
+    except (TypeError, UnicodeError, base64.binascii.Error) as exc:
+        raise ValueError("Invalid cursor.") from exc
+
+
+def comment_page_queryset(post_id):
+    return Comment.objects.filter(post_id=post_id, parent__isnull=True) \
+        .select_related("author__profile") \
+        .prefetch_related("mentions") \
+        .order_by("-created_at", "-id")
+
+
+def build_comment_page(slug, cursor, limit):
+    """
+    One page straight from the database: ({"results", "next_cursor"},
+    namespaces it depends on). Raises Post.DoesNotExist.
+    """
+    post_id = Post.objects.values_list("id", flat=True).get(slug=slug)
+    queryset = comment_page_queryset(post_id)
+    if cursor:
+        created_at, comment_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=comment_id)
+        )
+
+    # One extra row tells whether there is a next page.
+    comments = list(queryset[:limit + 1])
+    has_more = len(comments) > limit
+    comments = comments[:limit]
+
+    page = {
+        "results": CommentListSerializer(comments, many=True).data,
+        "next_cursor": encode_cursor(comments[-1]) if has_more else None,
+    }
+    namespaces = [ns_posts(), ns_post(post_id)] + [ns_author(c.author_id) for c in comments]
+    return page, namespaces
+
+
+def get_comment_page(slug, cursor=None, limit=COMMENTS_PAGE_SIZE):
+    """
+    A cached page of top-level comments and its generation stamps.
+    Raises Post.DoesNotExist and ValueError (bad cursor).
+    """
+    if cursor:
+        decode_cursor(cursor)  # reject garbage before it becomes a cache key
+    return cache_get_swr(
+        key_post_comments_page(slug, cursor, limit),
+        lambda: build_comment_page(slug, cursor, limit),
+        COMMENTS_TTL,
+        with_gens=True,
+        # Comment authors are only known from the page itself.
+        known=lambda: [ns_posts(), ns_post(Post.objects.values_list("id", flat=True).get(slug=slug))],
+    )
+
+
+def comment_subtree(root, max_depth=THREAD_DEPTH, limit=THREAD_LIMIT):
+    """
+    The root comment and its replies down to ``max_depth`` levels, at most
+    ``limit`` comments, in display order, with one query on the path
+    index. Returns (serialized nodes, truncated).
+    """
+    nodes = list(
+        Comment.objects.filter(path__startswith=root.path, depth__lte=root.depth + max_depth)
+        .select_related("author__profile")
+        .order_by("path")[:limit + 1]
+    )
+    truncated = len(nodes) > limit
+    data = CommentThreadSerializer(nodes[:limit], many=True, context={"root_depth": root.depth}).data
+    return data, truncated
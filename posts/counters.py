@@ -0,0 +1,63 @@
+"""
+Stored like/comment counters on Post and Comment.
+
+Post.like_count, Post.comment_count, Comment.like_count and
+Comment.reply_count are read directly by list endpoints instead of running
+COUNT(DISTINCT) over the likes and comments joins. comment_count and
+reply_count are updated with F() expressions in the same transaction as
+the comment. Likes are written behind through
+Redis (posts/likes.py); each flush recounts the rows it touched.
+recount_* rebuilds the columns from scratch (see the recount_post_counters
+command).
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Post, Comment
+
+PostLike = Post.likes.through
+CommentLike = Comment.likes.through
+
+
+def _bump(model, pk, field, delta):
+    expression = F(field) + delta if delta > 0 else Greatest(F(field) + delta, Value(0))
+    model.objects.filter(pk=pk).update(**{field: expression})
+
+
+def comment_added(post_id):
+    _bump(Post, post_id, "comment_count", 1)
+
+
+def comment_removed(post_id):
+    _bump(Post, post_id, "comment_count", -1)
+
+
+def reply_added(parent_id):
+    _bump(Comment, parent_id, "reply_count", 1)
+
+
+def reply_removed(parent_id):
+    _bump(Comment, parent_id, "reply_count", -1)
+
+
+def _count_subquery(model, fk):
+    return Coalesce(Subquery(
+        model.objects.filter(**{fk: OuterRef("pk")}).order_by()
+        .values(fk).annotate(c=Count("*")).values("c")
+    ), 0)
+
+
+def recount_posts(queryset=None):
+    queryset = Post.objects.all() if queryset is None else queryset
+    return queryset.update(
+        like_count=_count_subquery(PostLike, "post_id"),
+        comment_count=_count_subquery(Comment, "post_id"),
+    )
+
+
+def recount_comments(queryset=None):
+    queryset = Comment.objects.all() if queryset is None else queryset
+    return queryset.update(
+        like_count=_count_subquery(CommentLike, "comment_id"),
+        reply_count=_count_subquery(Comment, "parent_id"),
+    )
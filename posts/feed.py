@@ -0,0 +1,164 @@
+"""
+The posts feed, cached as fragments.
+
+The feed is an ordered id list (a Redis sorted set scored by created_at)
+plus one serialized fragment per post. A change to a post rewrites only that
+post's fragment; only creating or deleting a post touches the id list. The
+list endpoint reads the ids and fetches every fragment with a single MGET,
+rendering just the fragments that are missing. Rebuilding the id list and
+rendering missing fragments are single-flight (posts.cache.single_flight),
+so a cold cache is filled by one request while the others wait for it.
+Fragments are stamped with their post and author generations, so bumping
+either (posts.cache.invalidate_post / invalidate_author) turns them into
+misses. The rendered feed (see PostListCreateView) is stamped with the
+feed generation, which is bumped after every change to the id list or to a
+fragment in it.
+"""
+from django.test import RequestFactory
+from django_redis import get_redis_connection
+
+from .cache import (
+    FRAGMENT_TTL, key_posts_ids, key_post_fragment, cache_delete, cache_get_many, cache_set_many,
+    single_flight, make_entry, unwrap_many, get_generations, bump_generation, post_namespaces, ns_feed,
+)
+from .models import Post
+from .serializers import PostSerializer
+
+FEED_SIZE = 200
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def feed_queryset():
+    return Post.objects.select_related("author") \
+        .prefetch_related("tags", "mentions", "media_items")
+
+
+def owner_generations(owners):
+    """
+    {post_id: generation stamps} for {post_id: author_id}, one MGET.
+    """
+    namespaces = {pid: post_namespaces(pid, author_id) for pid, author_id in owners.items()}
+    current = get_generations(ns for names in namespaces.values() for ns in names)
+    return {pid: {ns: current[ns] for ns in names} for pid, names in namespaces.items()}
+
+
+def snapshot_post_generations(post_ids):
+    """
+    ({post_id: author_id}, stamps) read before the posts are loaded, so a
+    change made while they are being serialized leaves the data stamped
+    with the older generation (a miss), never the newer one.
+    """
+    owners = dict(Post.objects.filter(id__in=post_ids).values_list("id", "author_id"))
+    return owners, owner_generations(owners)
+
+
+def render_post_fragments(post_ids, with_gens=False):
+    """
+    Serializes the given posts in one query and stores their fragments.
+    Returns {post_id: data}; ids that no longer exist are left out. With
+    with_gens, returns ({post_id: data}, {post_id: generation stamps}).
+    """
+    if not post_ids:
+        return ({}, {}) if with_gens else {}
+    request = RequestFactory().get('/')
+    owners, gens = snapshot_post_generations(post_ids)
+    # A post whose author changed since the snapshot is left out: its
+    # stamps would name the wrong author namespace.
+    posts = [
+        post for post in feed_queryset().filter(id__in=list(owners))
+        if owners[post.id] == post.author_id
+    ]
+    fragments = {post.id: PostSerializer(post, context={'request': request}).data for post in posts}
+    if fragments:
+        cache_set_many(
+            {key_post_fragment(pid): make_entry(data, gens=gens[pid]) for pid, data in fragments.items()},
+            FRAGMENT_TTL,
+        )
+    return (fragments, gens) if with_gens else fragments
+
+
+def rebuild_feed_ids():
+    rows = list(Post.objects.order_by("-created_at").values_list("id", "created_at")[:FEED_SIZE])
+    key = key_posts_ids()
+    with _redis().pipeline() as pipe:
+        pipe.delete(key)
+        if rows:
+            pipe.zadd(key, {str(pid): created_at.timestamp() for pid, created_at in rows})
+        pipe.execute()
+    bump_generation(ns_feed())
+    return [pid for pid, _ in rows]
+
+
+def _cached_feed_ids():
+    ids = _redis().zrevrange(key_posts_ids(), 0, FEED_SIZE - 1)
+    return [int(pid) for pid in ids] or None
+
+
+def feed_post_ids():
+    ids = _cached_feed_ids()
+    if ids is None:
+        return single_flight(key_posts_ids(), rebuild_feed_ids, _cached_feed_ids)
+    return ids
+
+
+# KEYS: feed ids; ARGV: post id, created_at, FEED_SIZE. Adds the post and
+# trims to the newest FEED_SIZE ids, but only to a list that exists: a
+# missing list is left to rebuild_feed_ids, since a partial one would be
+# taken for the whole feed.
+ADD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -(tonumber(ARGV[3]) + 1))
+return 1
+"""
+
+
+def add_to_feed(post_id, created_at):
+    _redis().eval(ADD_SCRIPT, 1, key_posts_ids(), str(post_id), created_at.timestamp(), FEED_SIZE)
+    bump_generation(ns_feed())
+
+
+def remove_from_feed(post_id):
+    cache_delete(key_post_fragment(post_id))
+    removed = _redis().zrem(key_posts_ids(), str(post_id))
+    if removed:
+        # The list was trimmed to FEED_SIZE, so pull the next older post in.
+        rebuild_feed_ids()
+    else:
+        bump_generation(ns_feed())
+
+
+def _cached_fragments(post_ids):
+    # Fragments from an older generation come back as missing.
+    current = unwrap_many(cache_get_many([key_post_fragment(pid) for pid in post_ids]))
+    return {pid: current[key_post_fragment(pid)][0] for pid in post_ids if key_post_fragment(pid) in current}
+
+
+def get_post_fragments(post_ids, lock="posts:feed_render"):
+    """
+    The fragments of ``post_ids`` in order, rendering the missing ones
+    (single-flight under ``lock``). Posts that no longer exist are left out.
+    """
+    fragments = _cached_fragments(post_ids)
+
+    missing = [pid for pid in post_ids if pid not in fragments]
+    if missing:
+        def recheck():
+            found = _cached_fragments(missing)
+            return found if len(found) == len(missing) else None
+
+        fragments.update(single_flight(lock, lambda: render_post_fragments(missing), recheck))
+
+    return [fragments[pid] for pid in post_ids if pid in fragments]
+
+
+def get_feed():
+    """
+    The newest FEED_SIZE posts, assembled from cached fragments.
+    """
+    return get_post_fragments(feed_post_ids())
@@ -0,0 +1,233 @@
+"""
+Write-behind likes for posts and comments.
+
+A like toggle is recorded in Redis first, atomically in one Lua script:
+
+    posts:likers:v1:<slug>        set of user ids who like the post ("_" marks it loaded)
+    posts:likes_count:v1:<slug>   like counter (key_post_likes_count)
+    posts:likes_pending:v1:<slug> hash user_id -> "1" (like) / "0" (unlike), not yet in the DB
+    likes:dirty                   set of "post:<slug>" / "comment:<slug>" with pending changes
+
+Comments use the same layout under comments:*. Counts and is_like are read
+from Redis. flush_pending_likes (a beat task) moves the net changes into the
+M2M tables in bulk, recounts the touched rows and refreshes their caches.
+A cold likers set is loaded from the DB with the pending changes replayed
+on top, so nothing recorded in Redis is lost if the set expires first.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django_redis import get_redis_connection
+
+from users.models import CustomUser
+from .cache import (
+    key_post_likers, key_post_likes_count, key_post_likes_pending,
+    key_comment_likers, key_comment_likes_count, key_comment_likes_pending,
+    key_likes_dirty,
+)
+from .counters import recount_posts, recount_comments
+from .models import Post, Comment
+
+LIKERS_TTL = 60 * 60 * 24
+
+KINDS = {
+    "post": (Post, key_post_likers, key_post_likes_count, key_post_likes_pending),
+    "comment": (Comment, key_comment_likers, key_comment_likes_count, key_comment_likes_pending),
+}
+RECOUNT = {"post": recount_posts, "comment": recount_comments}
+
+# KEYS: likers, count, pending. ARGV: ttl, liker ids...
+LOAD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+redis.call('SADD', KEYS[1], '_')
+for i = 2, #ARGV do redis.call('SADD', KEYS[1], ARGV[i]) end
+local pending = redis.call('HGETALL', KEYS[3])
+for i = 1, #pending, 2 do
+    if pending[i + 1] == '1' then
+        redis.call('SADD', KEYS[1], pending[i])
+    else
+        redis.call('SREM', KEYS[1], pending[i])
+    end
+end
+redis.call('SET', KEYS[2], redis.call('SCARD', KEYS[1]) - 1, 'EX', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# KEYS: likers, count, pending, dirty. ARGV: user id, like|unlike|toggle, dirty member, ttl.
+# Returns -1 when the set is not loaded, else {liked, changed}.
+TOGGLE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return -1 end
+local liked = redis.call('SISMEMBER', KEYS[1], ARGV[1]) == 1
+local want = not liked
+if ARGV[2] == 'like' then want = true elseif ARGV[2] == 'unlike' then want = false end
+if want == liked then return {liked and 1 or 0, 0} end
+if want then
+    redis.call('SADD', KEYS[1], ARGV[1])
+else
+    redis.call('SREM', KEYS[1], ARGV[1])
+end
+redis.call('SET', KEYS[2], redis.call('SCARD', KEYS[1]) - 1, 'EX', ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('HSET', KEYS[3], ARGV[1], want and '1' or '0')
+redis.call('SADD', KEYS[4], ARGV[3])
+return {want and 1 or 0, 1}
+"""
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def _keys(kind, slug):
+    _, likers, count, pending = KINDS[kind]
+    return likers(slug), count(slug), pending(slug)
+
+
+def _load(redis_conn, kind, slug):
+    model = KINDS[kind][0]
+    liker_ids = model.likes.through.objects.filter(
+        **{f"{kind}__slug": slug}
+    ).values_list("customuser_id", flat=True)
+    redis_conn.register_script(LOAD_SCRIPT)(keys=list(_keys(kind, slug)), args=[LIKERS_TTL, *liker_ids])
+
+
+def set_like(kind, slug, user_id, mode="toggle"):
+    """
+    Likes, unlikes or toggles. Returns (liked, changed).
+    """
+    redis_conn = _redis()
+    toggle = redis_conn.register_script(TOGGLE_SCRIPT)
+    keys = [*_keys(kind, slug), key_likes_dirty()]
+    args = [user_id, mode, f"{kind}:{slug}", LIKERS_TTL]
+
+    result = toggle(keys=keys, args=args)
+    if result == -1:
+        _load(redis_conn, kind, slug)
+        result = toggle(keys=keys, args=args)
+    liked, changed = result
+    return bool(liked), bool(changed)
+
+
+def like_state(kind, slug, user_id):
+    """
+    (like count, whether user_id likes it), straight from Redis.
+    """
+    redis_conn = _redis()
+    likers, count, _ = _keys(kind, slug)
+    for _attempt in range(2):
+        with redis_conn.pipeline() as pipe:
+            pipe.exists(likers)
+            pipe.get(count)
+            pipe.scard(likers)
+            pipe.sismember(likers, user_id)
+            exists, cached_count, size, is_like = pipe.execute()
+        if exists:
+            # The counter is written with the set; SCARD covers an evicted counter.
+            count_value = int(cached_count) if cached_count is not None else size - 1
+            return count_value, bool(is_like)
+        _load(redis_conn, kind, slug)
+    return 0, False
+
+
+def liked_slugs(kind, slugs, user_id):
+    """
+    The subset of ``slugs`` the user likes. Warm sets and pending changes
+    answer from Redis; everything else is resolved with one DB query.
+    """
+    redis_conn = _redis()
+    with redis_conn.pipeline() as pipe:
+        for slug in slugs:
+            likers, _, pending = _keys(kind, slug)
+            pipe.exists(likers)
+            pipe.sismember(likers, user_id)
+            pipe.hget(pending, user_id)
+        results = pipe.execute()
+
+    liked, cold = set(), []
+    for index, slug in enumerate(slugs):
+        exists, is_member, pending = results[index * 3:index * 3 + 3]
+        if exists:
+            if is_member:
+                liked.add(slug)
+        elif pending is not None:
+            if pending in (b"1", "1"):
+                liked.add(slug)
+        else:
+            cold.append(slug)
+
+    if cold:
+        model = KINDS[kind][0]
+        liked.update(
+            model.objects.filter(slug__in=cold, likes__id=user_id).values_list("slug", flat=True)
+        )
+    return liked
+
+
+def forget(kind, slug):
+    """
+    Drops the Redis state of a deleted post/comment.
+    """
+    _redis().delete(*_keys(kind, slug))
+
+
+def take_pending(redis_conn, kind, slug):
+    """
+    Atomically reads and clears one object's pending changes.
+    Returns {user_id: liked}.
+    """
+    pending = KINDS[kind][3](slug)
+    with redis_conn.pipeline() as pipe:
+        pipe.hgetall(pending)
+        pipe.delete(pending)
+        changes, _ = pipe.execute()
+    return {int(user_id): value in (b"1", "1") for user_id, value in changes.items()}
+
+
+def restore_pending(redis_conn, kind, changes_by_slug):
+    """
+    Puts changes back after a failed flush; newer toggles (already in the
+    hash) win over the restored ones.
+    """
+    with redis_conn.pipeline() as pipe:
+        for slug, changes in changes_by_slug.items():
+            for user_id, liked in changes.items():
+                pipe.hsetnx(KINDS[kind][3](slug), user_id, "1" if liked else "0")
+            pipe.sadd(key_likes_dirty(), f"{kind}:{slug}")
+        pipe.execute()
+
+
+def apply_pending(kind, changes_by_slug):
+    """
+    Writes the net like changes into the M2M table in bulk and recounts the
+    touched rows. Returns {slug: id} of the rows that still exist.
+    """
+    model = KINDS[kind][0]
+    through = model.likes.through
+    fk = f"{kind}_id"
+
+    ids = dict(model.objects.filter(slug__in=list(changes_by_slug)).values_list("slug", "id"))
+    all_user_ids = {user_id for changes in changes_by_slug.values() for user_id in changes}
+    live_user_ids = set(CustomUser.objects.filter(id__in=all_user_ids).values_list("id", flat=True))
+
+    to_add = []
+    removals = Q()
+    for slug, changes in changes_by_slug.items():
+        if slug not in ids:
+            continue
+        unliked = []
+        for user_id, liked in changes.items():
+            if liked and user_id in live_user_ids:
+                to_add.append(through(**{fk: ids[slug], "customuser_id": user_id}))
+            elif not liked:
+                unliked.append(user_id)
+        if unliked:
+            removals |= Q(**{fk: ids[slug], "customuser_id__in": unliked})
+
+    with transaction.atomic():
+        if to_add:
+            through.objects.bulk_create(to_add, ignore_conflicts=True)
+        if removals:
+            through.objects.filter(removals).delete()
+        if ids:
+            RECOUNT[kind](model.objects.filter(id__in=list(ids.values())))
+    return ids
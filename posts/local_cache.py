@@ -0,0 +1,217 @@
+"""
+Optional in-process tier in front of the Redis post caches.
+
+With POSTS_LOCAL_CACHE_ENABLED, posts.cache keeps the values it reads from
+Redis (already unpickled) in a per-process LRU, bounded by item count and
+by approximate pickled bytes. Entries also expire after
+POSTS_LOCAL_CACHE_TTL seconds even if no eviction ever arrives.
+
+Every write or delete through posts.cache publishes the keys on
+EVICT_CHANNEL. Each process (Daphne, Celery workers) runs a listener thread
+that drops those keys from its own LRU. If the listener loses its
+connection, the whole LRU is cleared, since evictions may have been missed.
+Generation stamps are still checked against Redis on every read (see
+posts.cache.unwrap_many), so INCR-based invalidation needs no message.
+
+Hits and misses are counted per tier in each process and added to the
+Redis hash STATS_KEY every STATS_FLUSH_SECONDS (see the posts_cache_stats
+command).
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+log = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, "POSTS_LOCAL_CACHE_ENABLED", False)
+MAX_ITEMS = getattr(settings, "POSTS_LOCAL_CACHE_MAX_ITEMS", 512)
+MAX_BYTES = getattr(settings, "POSTS_LOCAL_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+LOCAL_TTL = getattr(settings, "POSTS_LOCAL_CACHE_TTL", 30)
+
+EVICT_CHANNEL = "posts:cache:evict"
+STATS_KEY = "posts:cache:stats"
+STATS_FLUSH_SECONDS = 30
+
+# Identifies this process's own messages, which need no second eviction.
+_ORIGIN = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class LocalLRU:
+    """
+    Thread-safe LRU of key -> (value, size, expires_at).
+    """
+
+    def __init__(self, max_items, max_bytes, ttl):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[2] <= time.monotonic():
+                self._drop(key)
+                return None
+            self._data.move_to_end(key)
+            return item[0]
+
+    def set(self, key, value, timeout=None):
+        try:
+            size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            return
+        if size > self.max_bytes:
+            self.delete(key)
+            return
+        ttl = self.ttl if timeout is None else min(self.ttl, timeout)
+        with self._lock:
+            self._drop(key)
+            self._data[key] = (value, size, time.monotonic() + ttl)
+            self._bytes += size
+            while len(self._data) > self.max_items or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _drop(self, key):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._bytes -= item[1]
+
+
+_lru = LocalLRU(MAX_ITEMS, MAX_BYTES, LOCAL_TTL)
+_listener = None
+_listener_lock = threading.Lock()
+
+_stats = {"local_hit": 0, "local_miss": 0, "redis_hit": 0, "redis_miss": 0}
+_stats_lock = threading.Lock()
+_stats_flushed_at = time.monotonic()
+
+
+def _listen():
+    while True:
+        try:
+            pubsub = get_redis_connection("default").pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(EVICT_CHANNEL)
+            for message in pubsub.listen():
+                data = message["data"]
+                data = data.decode() if isinstance(data, bytes) else data
+                origin, _, keys = data.partition("|")
+                if origin != _ORIGIN:
+                    _lru.delete(*keys.split("\n"))
+        except Exception:
+            log.exception("posts local cache listener lost its connection")
+        # Evictions may have been missed while disconnected.
+        _lru.clear()
+        time.sleep(1)
+
+
+def _ensure_listener():
+    global _listener
+    if _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = threading.Thread(target=_listen, name="posts-cache-evict", daemon=True)
+            _listener.start()
+
+
+def record(tier, hits, misses):
+    global _stats_flushed_at
+    with _stats_lock:
+        _stats[f"{tier}_hit"] += hits
+        _stats[f"{tier}_miss"] += misses
+        if time.monotonic() - _stats_flushed_at < STATS_FLUSH_SECONDS:
+            return
+        pending = dict(_stats)
+        for name in _stats:
+            _stats[name] = 0
+        _stats_flushed_at = time.monotonic()
+    try:
+        with get_redis_connection("default").pipeline(transaction=False) as pipe:
+            for name, count in pending.items():
+                if count:
+                    pipe.hincrby(STATS_KEY, name, count)
+            pipe.execute()
+    except Exception:
+        log.exception("could not flush posts cache stats")
+
+
+def stats():
+    """
+    This process's counters since the last flush.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def get_many(keys, fetch):
+    """
+    Looks keys up locally and fetches the rest with fetch(keys) -> dict,
+    remembering what Redis returned.
+    """
+    if not ENABLED:
+        found = fetch(keys)
+        record("redis", len(found), len(keys) - len(found))
+        return found
+
+    _ensure_listener()
+    found, missing = {}, []
+    for key in keys:
+        value = _lru.get(key)
+        if value is None:
+            missing.append(key)
+        else:
+            found[key] = value
+    record("local", len(found), len(missing))
+
+    if missing:
+        fetched = fetch(missing)
+        record("redis", len(fetched), len(missing) - len(fetched))
+        for key, value in fetched.items():
+            _lru.set(key, value)
+        found.update(fetched)
+    return found
+
+
+def remember(mapping, timeout=None):
+    """
+    Stores values this process just wrote and evicts them everywhere else.
+    """
+    if not ENABLED:
+        return
+    for key, value in mapping.items():
+        _lru.set(key, value, timeout)
+    publish_evict(list(mapping))
+
+
+def forget(keys):
+    if not ENABLED:
+        return
+    _lru.delete(*keys)
+    publish_evict(keys)
+
+
+def publish_evict(keys):
+    if keys:
+        get_redis_connection("default").publish(EVICT_CHANNEL, f"{_ORIGIN}|" + "\n".join(keys))
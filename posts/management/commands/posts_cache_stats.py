@@ -0,0 +1,35 @@
+# posts/management/commands/posts_cache_stats.py
+from django.core.management.base import BaseCommand
+from django_redis import get_redis_connection
+
+from posts.local_cache import STATS_KEY, STATS_FLUSH_SECONDS
+
+TIERS = ("local", "redis")
+
+class Command(BaseCommand):
+    help = 'Shows hit/miss counters of the post caches, per tier, summed over all processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Clear the counters after printing them.')
+
+    def handle(self, *args, **options):
+        redis_conn = get_redis_connection("default")
+        raw = redis_conn.hgetall(STATS_KEY)
+        counters = {
+            (k.decode() if isinstance(k, bytes) else k): int(v) for k, v in raw.items()
+        }
+
+        self.stdout.write(f"{'tier':>8} {'hits':>12} {'misses':>12} {'hit rate':>9}")
+        for tier in TIERS:
+            hits = counters.get(f"{tier}_hit", 0)
+            misses = counters.get(f"{tier}_miss", 0)
+            total = hits + misses
+            rate = f"{100 * hits / total:.1f}%" if total else "-"
+            self.stdout.write(f"{tier:>8} {hits:>12} {misses:>12} {rate:>9}")
+        self.stdout.write(f"(processes report every {STATS_FLUSH_SECONDS}s)")
+
+        if options['reset']:
+            redis_conn.delete(STATS_KEY)
+
+
+# run python manage.py posts_cache_stats to see how much the local tier saves.
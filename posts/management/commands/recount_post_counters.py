@@ -0,0 +1,31 @@
+# posts/management/commands/recount_post_counters.py
+from django.core.management.base import BaseCommand
+
+from posts.cache import bump_generation, ns_posts
+from posts.counters import recount_posts, recount_comments
+from posts.models import Post, Comment
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored like_count/comment_count columns on posts and comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows updated per statement, keeps each transaction short.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, recount in ((Post, recount_posts), (Comment, recount_comments)):
+            updated = 0
+            last_id = 0
+            while True:
+                ids = list(model.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size])
+                if not ids:
+                    break
+                updated += recount(model.objects.filter(pk__in=ids))
+                last_id = ids[-1]
+            self.stdout.write(self.style.SUCCESS(f"Recounted {updated} {model._meta.verbose_name_plural}."))
+        # Cached posts carry the old counts; retire all of them at once.
+        bump_generation(ns_posts())
+
+
+# run python manage.py recount_post_counters to repair counters after manual edits or restores.
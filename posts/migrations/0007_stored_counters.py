@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:42
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(model, fk):
+    return Coalesce(Subquery(
+        model.objects.filter(**{fk: OuterRef("pk")}).order_by()
+        .values(fk).annotate(c=Count("*")).values("c")
+    ), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model("posts", "Post")
+    Comment = apps.get_model("posts", "Comment")
+    Post.objects.update(
+        like_count=_count(Post.likes.through, "post_id"),
+        comment_count=_count(Comment, "post_id"),
+    )
+    Comment.objects.update(like_count=_count(Comment.likes.through, "comment_id"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_comment_posts_comme_post_id_7929fe_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
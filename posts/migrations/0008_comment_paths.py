@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:56
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import CharField, Count, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Concat, LPad
+
+
+def backfill_paths(apps, schema_editor):
+    Comment = apps.get_model("posts", "Comment")
+    segment = Concat(LPad(Cast("id", CharField()), 10, Value("0")), Value("/"))
+
+    Comment.objects.filter(parent__isnull=True).update(path=segment, depth=0)
+    # One level per pass: comments whose parent already has a path.
+    parents = Comment.objects.filter(pk=OuterRef("parent_id"))
+    while Comment.objects.filter(path="", parent__isnull=False).exclude(parent__path="").update(
+        path=Concat(Subquery(parents.values("path")[:1]), segment, output_field=models.TextField()),
+        depth=Subquery(parents.values("depth")[:1]) + 1,
+    ):
+        pass
+
+    Comment.objects.update(reply_count=Coalesce(Subquery(
+        Comment.objects.filter(parent_id=OuterRef("pk")).order_by()
+        .values("parent_id").annotate(c=Count("*")).values("c")
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_stored_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.TextField(blank=True, db_collation='C', default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['path'], name='comment_path_idx'),
+        ),
+    ]
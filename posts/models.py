@@ -1,26 +1,80 @@
-import re
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
+from django.contrib.postgres.search import SearchVectorField
 from users.models import CustomUser
 from django.utils.text import slugify
+from .slugs import save_with_unique_slug
+from .writes import sync_mentions
+
+
+class DirtyFieldsMixin:
+    """
+    Remembers the TRACKED_FIELDS (attnames) as loaded from the database.
+    save() leaves the ones that actually changed in ``changed_fields`` for
+    the signal receivers; a new row counts every field as changed.
+
+    COUNTER_FIELDS are only written by posts/counters.py (F() updates and
+    recounts). Updating an existing row without update_fields writes every
+    other column, so the counts loaded with the instance never overwrite
+    a bump that landed since.
+    """
+    TRACKED_FIELDS = ()
+    COUNTER_FIELDS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded = instance._tracked_values()
+        return instance
+
+    def _tracked_values(self):
+        # Deferred fields are skipped rather than fetched.
+        return {f: self.__dict__[f] for f in self.TRACKED_FIELDS if f in self.__dict__}
+
+    def get_dirty_fields(self):
+        loaded = getattr(self, '_loaded', None)
+        if loaded is None or self._state.adding:
+            return set(self.TRACKED_FIELDS)
+        return {f for f, value in self._tracked_values().items() if f not in loaded or loaded[f] != value}
+
+    def save(self, *args, **kwargs):
+        self.changed_fields = self.get_dirty_fields()
+        if (self.COUNTER_FIELDS and not self._state.adding and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            # Deferred fields stay out, as in a plain save().
+            skipped = set(self.COUNTER_FIELDS) | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in skipped and f.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
+        self._loaded = self._tracked_values()
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._loaded = self._tracked_values()
+
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
     slug = models.SlugField(unique=True)
 
+    class Meta:
+        indexes = [
+            # Serves name__istartswith / icontains (UPPER(name) LIKE ...) in posts/tag_index.py
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='tag_name_trgm_idx'),
+        ]
+
     def __str__(self):
         return self.name
     
     def save(self, *args, **kwargs):
         if not self.slug or self.slug == '':
-            base_slug = slugify(self.name)
-            unique_slug = base_slug
-            counter = 1
-            while Tag.objects.filter(slug=unique_slug).exclude(pk=self.pk).exists():
-                unique_slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = unique_slug
-        super().save(*args, **kwargs)
+            save_with_unique_slug(self, slugify(self.name), lambda: super(Tag, self).save(*args, **kwargs))
+        else:
+            super().save(*args, **kwargs)
 
-class Post(models.Model):
+class Post(DirtyFieldsMixin, models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True,blank=True)
     content = models.TextField()
@@ -31,6 +85,17 @@ class Post(models.Model):
     tags = models.ManyToManyField(Tag, blank=True)
     likes = models.ManyToManyField(CustomUser, related_name='liked_posts', blank=True)
     mentions = models.ManyToManyField(CustomUser, related_name='mentioned_posts', blank=True)
+    # Stored counters, kept in step by posts/counters.py
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    # Weighted title (A) + content (B) tsvector, kept up to date by a
+    # database trigger (migration 0009) and searched by posts/search.py.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # What PostSerializer shows; saves touching only other fields (updated_at)
+    # leave the caches alone.
+    TRACKED_FIELDS = ('title', 'slug', 'content', 'published', 'author_id', 'like_count', 'comment_count')
+    COUNTER_FIELDS = ('like_count', 'comment_count')
 
     class Meta:
         ordering = ['-created_at']
@@ -38,30 +103,25 @@ class Post(models.Model):
         indexes = [
             models.Index(fields=['-created_at']),  # The '-' matches your ordering direction
             models.Index(fields=['published']),
+            GinIndex(fields=['search_vector'], name='post_search_vector_idx'),
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='post_title_trgm_idx'),
         ]
 
     def __str__(self):
         return f"{self.title} by {self.author}"
     
     def save(self, *args, **kwargs):
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
         if not self.slug or self.slug == '':
-            base_slug = slugify(self.title)
-            unique_slug = base_slug
-            counter = 1
-            while Post.objects.filter(slug=unique_slug).exclude(pk=self.pk).exists():
-                unique_slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = unique_slug
-        super().save(*args, **kwargs)
-
-        mentioned_usersnames = re.findall(r'@(\w+)', self.content)
-        if mentioned_usersnames:
-            mentioned_user = CustomUser.objects.filter(username__in=mentioned_usersnames)
-            self.mentions.set(mentioned_user)
+            save_with_unique_slug(self, slugify(self.title), lambda: super(Post, self).save(*args, **kwargs))
         else:
-            self.mentions.clear()
+            super().save(*args, **kwargs)
+
+        if 'content' in self.changed_fields and (update_fields is None or 'content' in update_fields):
+            sync_mentions(self, created=adding)
 
-class Comment(models.Model):
+class Comment(DirtyFieldsMixin, models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     content = models.TextField()
@@ -72,36 +132,61 @@ class Comment(models.Model):
     likes = models.ManyToManyField(CustomUser, related_name='liked_comments', blank=True)
     slug = models.SlugField(blank=True,unique=True)
     mentions = models.ManyToManyField(CustomUser, related_name='mentioned_comments', blank=True)
+    # Stored counters, kept in step by posts/counters.py
+    like_count = models.PositiveIntegerField(default=0)
+    reply_count = models.PositiveIntegerField(default=0)
+    # Materialized path: the zero padded ids of the ancestors and of the
+    # comment itself, each followed by "/", set on insert. Ordering by path
+    # lists a thread in display order and a subtree is a prefix match. The
+    # "C" collation keeps the btree index usable for both.
+    path = models.TextField(blank=True, default='', editable=False, db_collation='C')
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    TRACKED_FIELDS = ('content', 'slug', 'is_active', 'post_id', 'parent_id', 'like_count', 'reply_count')
+    COUNTER_FIELDS = ('like_count', 'reply_count')
     
     class Meta:
         # This tells the database to index comments primarily by the post they belong to,
         # and secondarily by their creation date.
         indexes = [
             models.Index(fields=['post', '-created_at']),
+            models.Index(fields=['path'], name='comment_path_idx'),
         ]
         
     def __str__(self):
         return f"Comment by {self.author} on {self.post}"
     
+    @staticmethod
+    def path_segment(comment_id):
+        return f"{comment_id:010d}/"
+
+    def set_path(self):
+        """
+        Fills path and depth once the id is known (one extra UPDATE).
+        """
+        if self.parent_id:
+            parent_path, parent_depth = Comment.objects.values_list("path", "depth").get(pk=self.parent_id)
+            self.path = parent_path + self.path_segment(self.pk)
+            self.depth = parent_depth + 1
+        else:
+            self.path = self.path_segment(self.pk)
+            self.depth = 0
+        Comment.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+
     def save(self, *args, **kwargs):
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
         if not self.slug or self.slug == '':
             # Use a shortened, slugified part of content as base slug
             base_slug = slugify(self.content[:50])  # first 50 chars of content
-            unique_slug = base_slug
-            counter = 1
-            # Check for uniqueness among Comments, exclude self when updating
-            while Comment.objects.filter(slug=unique_slug).exclude(pk=self.pk).exists():
-                unique_slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = unique_slug
-        super().save(*args, **kwargs)
-
-        mentioned_usersnames = re.findall(r'@(\w+)', self.content)
-        if mentioned_usersnames:
-            mentioned_user = CustomUser.objects.filter(username__in=mentioned_usersnames)
-            self.mentions.set(mentioned_user)
+            save_with_unique_slug(self, base_slug, lambda: super(Comment, self).save(*args, **kwargs))
         else:
-            self.mentions.clear()
+            super().save(*args, **kwargs)
+        if adding and not self.path:
+            self.set_path()
+
+        if 'content' in self.changed_fields and (update_fields is None or 'content' in update_fields):
+            sync_mentions(self, created=adding)
 
 
 class Media(models.Model):
@@ -0,0 +1,117 @@
+"""
+Ranked full-text search over published posts.
+
+Post.search_vector is a stored tsvector (title weighted A, content B)
+maintained by a database trigger and covered by a GIN index, so a query
+reads the index instead of building vectors for every row. Matches are
+ranked with SearchRank. Titles that merely look like the query (typos,
+partial words) are picked up by a trigram match on the title, which has
+its own GIN index; they rank after the full-text hits.
+
+Results are capped at SEARCH_MAX_RESULTS and served in pages of
+SearchPagination. The id lists of post and people searches are cached
+by normalized query (p2p_comm/search_cache.py); tag searches are set
+operations on Redis posting lists (posts/tag_index.py). Each page is
+hydrated from fragments: feed fragments for tag search, search fragments
+for the rest.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db.models import F, Q
+from rest_framework.pagination import PageNumberPagination
+
+from p2p_comm.search_cache import cached_ids, hydrate
+from users.cache import ns_people_search, ns_profile
+from users.models import CustomUser
+from users.search import search_people
+
+from .cache import ns_post_search, post_namespaces
+from .feed import get_post_fragments
+from . import tag_index
+from .models import Post
+from .serializers import PostSearchSerializer, UserSearchSerializer
+
+# Must match the config used by the trigger in migration 0009.
+SEARCH_CONFIG = "english"
+SEARCH_MAX_RESULTS = 200
+
+
+class SearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 50
+
+
+def search_posts(query):
+    """
+    Published posts matching ``query``, best first, at most
+    SEARCH_MAX_RESULTS of them.
+    """
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+    return Post.objects.filter(published=True) \
+        .filter(Q(search_vector=search_query) | Q(title__trigram_similar=query)) \
+        .annotate(
+            rank=SearchRank(F("search_vector"), search_query),
+            similarity=TrigramSimilarity("title", query),
+        ) \
+        .select_related("author__profile") \
+        .defer("search_vector", "content") \
+        .order_by("-rank", "-similarity", "-id")[:SEARCH_MAX_RESULTS]
+
+
+def search_post_ids(query):
+    return cached_ids(
+        "posts", query, lambda: search_posts(query).values_list("id", flat=True), [ns_post_search()]
+    )
+
+
+def tag_post_ids(query, mode="and"):
+    """
+    Ids of posts tagged as ``query`` asks (comma separated terms, combined
+    with ``mode`` "and"/"or"), newest first, from the tag posting lists.
+    """
+    return tag_index.tag_post_ids(query, mode, limit=SEARCH_MAX_RESULTS)
+
+
+def people_ids(query):
+    return cached_ids(
+        "people", query,
+        lambda: search_people(CustomUser.objects.all(), query).values_list("id", flat=True),
+        [ns_people_search()],
+    )
+
+
+def render_post_results(post_ids):
+    posts = Post.objects.filter(id__in=post_ids).select_related("author__profile") \
+        .defer("search_vector", "content")
+    return {
+        post.id: (PostSearchSerializer(post).data, post_namespaces(post.id, post.author_id))
+        for post in posts
+    }
+
+
+def render_people(user_ids):
+    users = CustomUser.objects.filter(id__in=user_ids).select_related("profile")
+    return {user.id: (UserSearchSerializer(user).data, [ns_profile(user.id)]) for user in users}
+
+
+def post_result_namespaces(post_ids):
+    owners = Post.objects.filter(id__in=post_ids).values_list("id", "author_id")
+    return {post_id: post_namespaces(post_id, author_id) for post_id, author_id in owners}
+
+
+def people_namespaces(user_ids):
+    return {user_id: [ns_profile(user_id)] for user_id in user_ids}
+
+
+def hydrate_posts(post_ids):
+    return hydrate("post", post_ids, render_post_results, post_result_namespaces)
+
+
+def hydrate_people(user_ids):
+    return hydrate("person", user_ids, render_people, people_namespaces)
+
+
+def hydrate_tag_posts(post_ids):
+    # Same fragments as the feed, so tag results share its cache. Int
+    # tuples hash the same in every process.
+    return get_post_fragments(post_ids, lock=f"posts:tag_render:{hash(tuple(post_ids))}")
@@ -1,9 +1,10 @@
 # posts/serializers.py
 from rest_framework import serializers
+from .slugs import allocate_slug
+from .writes import set_tags, sync_media
 from .models import Post, Comment, Tag, Media
 from users.models import CustomUser
 from django.utils.text import slugify
-import re
 
 class UserMentionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,13 +17,7 @@ class TagSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         if not data.get("slug"):
-            base_slug = slugify(data.get("name", ""))
-            unique_slug = base_slug
-            counter = 1
-            while Tag.objects.filter(slug=unique_slug).exists():
-                unique_slug = f"{base_slug}-{counter}"
-                counter += 1
-            data["slug"] = unique_slug
+            data["slug"] = allocate_slug(Tag, slugify(data.get("name", "")))
         return data
 
 class MediaSerializer(serializers.ModelSerializer):
@@ -44,8 +39,8 @@ class PostSerializer(serializers.ModelSerializer):
     )
     # The 'source' argument has been removed from this line.
     media_items = MediaSerializer(many=True, read_only=True)
-    comment_count = serializers.IntegerField(read_only=True) # Added from previous step
-    likes_count = serializers.IntegerField(read_only=True)
+    comment_count = serializers.IntegerField(read_only=True) # stored counter on Post
+    likes_count = serializers.IntegerField(source='like_count', read_only=True)
     # --- For WRITING data (input) ---
     tags = serializers.ListField(
         child=serializers.CharField(), required=False, write_only=True
@@ -165,7 +160,6 @@ class PostSerializer(serializers.ModelSerializer):
         user = self.context['request'].user
         tags_data = validated_data.pop('tags', [])
         media_data = validated_data.pop('media_data', [])
-        content = validated_data.get('content', '')
 
         # 1. Create the main Post object instance
         post = Post(author=user, **validated_data)
@@ -173,46 +167,17 @@ class PostSerializer(serializers.ModelSerializer):
         # 2. Explicitly call the save() method to trigger custom slug logic
         post.save() 
 
-        # 3. Handle Tags
+        # 3. Handle Tags (bulk upsert, see posts/writes.py)
         if tags_data:
-            # Find which tags already exist in a single query
-            existing_tags = Tag.objects.filter(name__in=tags_data)
-            existing_tag_names = {t.name for t in existing_tags}
-            
-            # Determine which tags are new
-            new_tag_names = [name for name in tags_data if name not in existing_tag_names]
-            
-            # ✅ FIX: Create new tags individually to trigger the .save() method for each one
-            if new_tag_names:
-                for name in new_tag_names:
-                    # This will correctly run the unique slug logic from your Tag model
-                    Tag.objects.create(name=name)
-            
-            # Set all tags for the post (existing + newly created)
-            all_tags = Tag.objects.filter(name__in=tags_data)
-            post.tags.set(all_tags)
+            set_tags(post, tags_data, created=True)
 
         # 4. Handle Media in Bulk (This is fine as Media has no custom .save() logic)
         if media_data:
-            media_objects_to_create = [
-                Media(
-                    post=post,
-                    url=item.get('url'),
-                    media_type=item.get('media_type'),
-                    display_order=index
-                ) for index, item in enumerate(media_data)
-            ]
-            Media.objects.bulk_create(media_objects_to_create)
-
-        # 5. Handle Mentions
-        mentioned_usernames = re.findall(r'@(\w+)', content)
-        if mentioned_usernames:
-            mentioned_users = CustomUser.objects.filter(username__in=mentioned_usernames)
-            post.mentions.set(mentioned_users)
-        
-        # 6. Prepare the object for the response
-        post.comment_count = 0
-        post.likes_count = 0
+            sync_media(post, media_data, created=True)
+
+        # 5. Mentions are synced by Post.save()
+
+        # 6. Prepare the object for the response (counters start at 0)
         post.refresh_from_db()
         
         return post
@@ -321,49 +286,15 @@ class PostSerializer(serializers.ModelSerializer):
 
         # 2. Handle Tags update
         if tags_data is not None:
-            # Find existing tags from the provided list in one query
-            existing_tags = Tag.objects.filter(name__in=tags_data)
-            existing_tag_names = {t.name for t in existing_tags}
+            set_tags(instance, tags_data)
+
+        # 3. Handle Media update: only the items that changed are written
+        if media_data is not None and sync_media(instance, media_data):
+            from .tasks import refresh_post_caches  # tasks imports this module
+            refresh_post_caches(instance.pk, instance.slug)
+
+        # 4. Mentions are synced by Post.save() in super().update()
 
-            # Determine which tags are new and need to be created
-            new_tag_names = [name for name in tags_data if name not in existing_tag_names]
-            
-            # ✅ FIX: Create new tags individually to trigger the .save() method for each one
-            if new_tag_names:
-                for name in new_tag_names:
-                    # This ensures the unique slug logic in your Tag model is executed
-                    Tag.objects.create(name=name)
-            
-            # Get a queryset of all tags (existing + newly created) for the post
-            all_tags = Tag.objects.filter(name__in=tags_data)
-            # Use .set() to efficiently update the relation in one go
-            instance.tags.set(all_tags)
-
-        # 3. Handle Media update (This part was already correct)
-        if media_data is not None:
-            instance.media_items.all().delete()
-            media_objects_to_create = [
-                Media(
-                    post=instance,
-                    url=item.get('url'),
-                    media_type=item.get('media_type'),
-                    display_order=index
-                ) for index, item in enumerate(media_data)
-            ]
-            if media_objects_to_create:
-                Media.objects.bulk_create(media_objects_to_create)
-
-        # 4. Handle Mentions update (This part was already correct)
-        if 'content' in validated_data:
-            content = validated_data.get('content', '')
-            mentioned_usernames = re.findall(r'@(\w+)', content)
-            
-            if mentioned_usernames:
-                mentioned_users = CustomUser.objects.filter(username__in=mentioned_usernames)
-                instance.mentions.set(mentioned_users)
-            else:
-                instance.mentions.clear()
-        
         # ✅ GOOD PRACTICE: Refresh the instance to ensure it's not stale
         instance.refresh_from_db()
         
@@ -394,9 +325,11 @@ class CommentSerializer(serializers.ModelSerializer):
             "slug",
             "parent",
             "likes",
+            "like_count",
         ]
         read_only_fields = [
             "slug",
+            "like_count",
             "avatar_url",
             "author_full_name",
             "author_username",
@@ -418,14 +351,39 @@ class CommentSerializer(serializers.ModelSerializer):
         return None
 
     def create(self, validated_data):
-        comment = Comment.objects.create(**validated_data)
-        mentioned_usernames = re.findall(r'@(\w+)', validated_data['content'])
-        if mentioned_usernames:
-            mentioned_users = CustomUser.objects.filter(username__in=mentioned_usernames)
-            comment.mentions.set(mentioned_users)
-        else:
-            comment.mentions.clear()
-        return comment
+        # Comment.save() syncs the mentions
+        return Comment.objects.create(**validated_data)
+
+    def update(self, instance, validated_data):
+        # post and parent are fixed once created: the path, depth and the
+        # reply/comment counters are only set on insert.
+        validated_data.pop("post", None)
+        validated_data.pop("parent", None)
+        return super().update(instance, validated_data)
+
+
+class CommentListSerializer(CommentSerializer):
+    """
+    Read-only shape for comment lists: like_count and reply_count instead
+    of the full likes id list.
+    """
+    reply_count = serializers.IntegerField(read_only=True)
+
+    class Meta(CommentSerializer.Meta):
+        fields = [f for f in CommentSerializer.Meta.fields if f != "likes"] + ["reply_count"]
+
+
+class CommentThreadSerializer(CommentListSerializer):
+    """
+    One node of a comment subtree; depth is relative to the requested root.
+    """
+    depth = serializers.SerializerMethodField()
+
+    class Meta(CommentListSerializer.Meta):
+        fields = [f for f in CommentListSerializer.Meta.fields if f != "mentions"] + ["depth"]
+
+    def get_depth(self, obj) -> int:
+        return obj.depth - self.context.get("root_depth", 0)
 
 
 class CommentUpdateSerializer(serializers.ModelSerializer):
@@ -437,16 +395,7 @@ class CommentUpdateSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         # update content
         instance.content = validated_data.get("content", instance.content)
-        instance.save()
-
-        # handle mentions
-        mentioned_usernames = re.findall(r'@(\w+)', instance.content)
-        if mentioned_usernames:
-            mentioned_users = CustomUser.objects.filter(username__in=mentioned_usernames)
-            instance.mentions.set(mentioned_users)
-        else:
-            instance.mentions.clear()
-
+        instance.save()  # also syncs the mentions
         return instance
 
 # import re
@@ -510,15 +459,7 @@ class ReplySerializer(serializers.ModelSerializer):
             author=self.context["request"].user,
             content=validated_data["content"],
         )
-
-        # 🔎 mention detection
-        mentioned_usernames = re.findall(r'@(\w+)', validated_data["content"])
-        if mentioned_usernames:
-            mentioned_users = CustomUser.objects.filter(username__in=mentioned_usernames)
-            reply.mentions.set(mentioned_users)
-        else:
-            reply.mentions.clear()
-
+        # mentions are detected by Comment.save()
         return reply
 
 
@@ -1,30 +1,44 @@
-from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from .models import Post, Comment
+from .models import Post, Comment, Tag
 
 from .tasks import (
     invalidate_post_cache,
-    warm_posts_list_cache,
-    warm_post_detail_cache,
+    add_post_to_feed,
+    remove_post_from_feed,
+    refresh_post_caches,
     # on_comment_created,
     # invalidate_post_detail_cache,
 )
+from .counters import (
+    comment_added, comment_removed, reply_added, reply_removed, recount_posts, recount_comments,
+)
+from .likes import forget as forget_likes
+from . import tag_index
+from .cache import invalidate_author, invalidate_post, invalidate_post_search
+from users.models import CustomUser, Profile
 from celery import chain
+from django.db import transaction
+import threading
 
 
 # Run sequentially
 @receiver(post_save, sender=Post)
 def post_saved(sender, instance: Post, created, **kwargs):
     """
-    When a post is created or updated:
-    - Invalidate its cache
-    - Warm up list & detail caches
+    When a post is created: add it to the feed id list and cache its fragment.
+    When a post is updated: rewrite its fragment and detail cache only,
+    and only if a visible field changed.
     """
-    chain(
-        invalidate_post_cache.s(instance.slug),
-        warm_posts_list_cache.s(),
-        warm_post_detail_cache.s(instance.slug)
-    )()
+    if created or getattr(instance, "changed_fields", set()) & {"title", "content", "published"}:
+        # Which posts a search matches may have changed.
+        transaction.on_commit(invalidate_post_search)
+    if created:
+        post_id = instance.pk
+        transaction.on_commit(lambda: add_post_to_feed.delay(post_id))
+    elif getattr(instance, "changed_fields", True):
+        # Nothing PostSerializer shows changed (e.g. only updated_at): skip.
+        refresh_post_caches(instance.pk, instance.slug)
 
 
 # @receiver(post_save, sender=Post)
@@ -53,13 +67,22 @@ def post_saved(sender, instance: Post, created, **kwargs):
 def post_deleted(sender, instance: Post, **kwargs):
     """
     When a post is deleted:
-    - Invalidate its cache
-    - Warm up the posts list cache
+    - Invalidate its cache, and everything stamped with its generation
+      (rendered responses are keyed by slug, which may be reused)
+    - Drop it from the feed id list
+    - Drop it from its tags' posting lists
     """
-    chain(
-        invalidate_post_cache.s(instance.slug),
-        warm_posts_list_cache.s(),
-    )()
+    post_id, slug = instance.pk, instance.slug
+    _posts_being_deleted().discard(post_id)
+    transaction.on_commit(lambda: invalidate_post(post_id))
+    transaction.on_commit(lambda: chain(
+        invalidate_post_cache.si(slug),
+        remove_post_from_feed.si(post_id),
+    )())
+    transaction.on_commit(lambda: forget_likes("post", slug))
+    transaction.on_commit(invalidate_post_search)
+    tag_ids = getattr(instance, "_deleted_tag_ids", [])
+    transaction.on_commit(lambda: tag_index.remove_post(post_id, tag_ids))
 
 @receiver(m2m_changed, sender=Post.tags.through)
 def post_tags_changed(sender, instance: Post, action, **kwargs):
@@ -67,11 +90,50 @@ def post_tags_changed(sender, instance: Post, action, **kwargs):
     When tags are added/removed from a post:
     - Invalidate post cache
     - Warm up detail cache
+    - Update the tags' posting lists (posts/tag_index.py)
     """
+    if kwargs.get("reverse"):  # tag.post_set...: instance is the tag
+        if action in {"post_add", "post_remove", "post_clear"}:
+            tag_id = instance.pk
+            transaction.on_commit(lambda: tag_index.forget_tag(tag_id))
+        return
+    if action == "pre_clear":
+        instance._cleared_tag_ids = list(instance.tags.values_list("id", flat=True))
     if action in {"post_add", "post_remove", "post_clear"}:
-        invalidate_post_cache.delay(instance.slug)
-        warm_posts_list_cache.delay()
-        warm_post_detail_cache.delay(instance.slug)
+        refresh_post_caches(instance.pk, instance.slug)
+
+        post_id, created_at = instance.pk, instance.created_at
+        if action == "post_add":
+            tag_ids = list(kwargs["pk_set"] or ())
+            transaction.on_commit(lambda: tag_index.add_post(post_id, created_at, tag_ids))
+        else:
+            tag_ids = list(kwargs["pk_set"] or ()) if action == "post_remove" \
+                else getattr(instance, "_cleared_tag_ids", [])
+            transaction.on_commit(lambda: tag_index.remove_post(post_id, tag_ids))
+
+
+# Ids of posts being deleted in this thread. Their comments are deleted
+# (and signalled) first, while the Post row still exists.
+_deleting_posts = threading.local()
+
+
+def _posts_being_deleted():
+    if not hasattr(_deleting_posts, "ids"):
+        _deleting_posts.ids = set()
+    return _deleting_posts.ids
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance: Post, **kwargs):
+    # The tag rows are gone by post_delete.
+    instance._deleted_tag_ids = list(instance.tags.values_list("id", flat=True))
+    _posts_being_deleted().add(instance.pk)
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    tag_id = instance.pk
+    transaction.on_commit(lambda: tag_index.forget_tag(tag_id))
 
 # @receiver(post_save, sender=Comment)
 # def comment_saved(sender, instance: Comment, created, **kwargs):
@@ -116,29 +178,31 @@ def post_tags_changed(sender, instance: Post, action, **kwargs):
 #         warm_posts_list_cache.delay()
 #         warm_post_detail_cache.delay(slug)
 
-from django.db import transaction
 @receiver(m2m_changed, sender=Post.likes.through)
 def post_likes_changed(sender, instance, action, **kwargs):
     """
-    When a user likes or unlikes a post:
-    - Invalidate the cache for the main list and the post detail.
-    - Trigger tasks to re-warm both caches with the new like_count.
+    Likes changed through the relation manager (admin, shell; the like
+    views go through posts/likes.py, whose flush_pending_likes task writes
+    them behind in bulk and refreshes the caches itself):
+    - Recount that post's like_count
+    - Rewrite its fragment and detail cache
     """
-    if action in {"post_add", "post_remove"}:
-        slug = instance.slug
-
-        def on_commit_tasks():
-            """Tasks to run after the DB transaction is successful."""
-            # Invalidate first to remove stale data immediately
-            invalidate_post_cache.delay(slug)
-            
-            # Then, re-warm the caches with fresh data in the background
-            warm_posts_list_cache.delay()
-            warm_post_detail_cache.delay(slug)
-
-        # This is the key! The function above will only be called
-        # after the like/unlike is successfully committed to the database.
-        transaction.on_commit(on_commit_tasks)
+    if kwargs.get("reverse"):  # user.liked_posts.add(...): instance is the user
+        return
+    if action in {"post_add", "post_remove", "post_clear"}:
+        recount_posts(Post.objects.filter(pk=instance.pk))
+        # Runs only after the like/unlike is committed to the database.
+        refresh_post_caches(instance.pk, instance.slug)
+
+
+@receiver(m2m_changed, sender=Comment.likes.through)
+def comment_likes_changed(sender, instance, action, **kwargs):
+    if kwargs.get("reverse"):
+        return
+    if action in {"post_add", "post_remove", "post_clear"}:
+        recount_comments(Comment.objects.filter(pk=instance.pk))
+        post_id = instance.post_id
+        transaction.on_commit(lambda: invalidate_post(post_id))
 
 # In your signals.py file
 
@@ -178,17 +242,20 @@ def post_likes_changed(sender, instance, action, **kwargs):
 @receiver(post_save, sender=Comment)
 def comment_saved(sender, instance, created, **kwargs):
     """
-    On new comment creation, update the post's cache after the
-    transaction has been committed.
+    On comment creation or edit, drop the cached comment pages; on
+    creation also update the post's cache. Both after the transaction
+    has been committed.
     """
+    if not created and not getattr(instance, "changed_fields", True):
+        return
+    post_id = instance.post_id
+    # Cached comment pages go with the post's generation.
+    transaction.on_commit(lambda: invalidate_post(post_id))
     if created:
-        def on_commit_tasks():
-            slug = instance.post.slug
-            invalidate_post_cache.delay(slug)
-            warm_posts_list_cache.delay()
-            warm_post_detail_cache.delay(slug)
-
-        transaction.on_commit(on_commit_tasks)
+        comment_added(instance.post_id)
+        if instance.parent_id:
+            reply_added(instance.parent_id)
+        refresh_post_caches(instance.post_id, instance.post.slug)
 
 @receiver(post_delete, sender=Comment)
 def comment_deleted(sender, instance, **kwargs):
@@ -196,10 +263,32 @@ def comment_deleted(sender, instance, **kwargs):
     On comment deletion, update the post's cache after the
     transaction has been committed.
     """
-    def on_commit_tasks():
-        slug = instance.post.slug
-        invalidate_post_cache.delay(slug)
-        warm_posts_list_cache.delay()
-        warm_post_detail_cache.delay(slug)
+    post_id, slug = instance.post_id, instance.slug
+    # Like state in Redis, so a comment reusing the slug starts clean.
+    transaction.on_commit(lambda: forget_likes("comment", slug))
+    if post_id in _posts_being_deleted():
+        # Goes with its post: no counters or caches to keep for it.
+        return
+    comment_removed(post_id)
+    if instance.parent_id:
+        reply_removed(instance.parent_id)  # a no-op when the parent went first
+    transaction.on_commit(lambda: invalidate_post(post_id))
+    post = Post.objects.filter(id=post_id).only("id", "slug").first()
+    if post is not None:
+        refresh_post_caches(post.id, post.slug)
+
+
+# Author changes: every cached post showing the author's name or avatar is
+# dropped with one generation bump, no key lookups.
+@receiver(post_save, sender=CustomUser)
+def author_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields and set(update_fields) <= {"last_login"}):
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_author(user_id))
+
 
-    transaction.on_commit(on_commit_tasks)
\ No newline at end of file
+@receiver(post_save, sender=Profile)
+def author_profile_saved(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_author(user_id))
@@ -0,0 +1,81 @@
+"""
+Unique slug allocation for posts, comments and tags.
+
+allocate_slug finds the next free "<base>-<n>" with one query: the highest
+existing suffix for the base, found through the slug column's LIKE index,
+instead of probing base-1, base-2, ... one query at a time.
+
+Two requests can still pick the same slug. save_with_unique_slug relies on
+the unique constraint for that: the insert runs in a savepoint and a slug
+conflict is retried with a fresh allocation. The last attempt uses a short
+random suffix so it cannot lose the same race again.
+"""
+import re
+import secrets
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Length
+
+SLUG_ATTEMPTS = 3
+RANDOM_SUFFIX_BYTES = 3  # 6 hex chars
+# Room kept for "-<suffix>" when the base is trimmed to the column length.
+SUFFIX_ROOM = 8
+
+
+def _max_length(model, field):
+    return model._meta.get_field(field).max_length
+
+
+def _trim(base, max_length):
+    if max_length and len(base) > max_length - SUFFIX_ROOM:
+        base = base[:max_length - SUFFIX_ROOM].rstrip("-")
+    return base
+
+
+def allocate_slug(model, base, field="slug", exclude_pk=None):
+    """
+    ``base`` if it is free, else base-<highest suffix + 1>. One query.
+    """
+    base = _trim(base or model._meta.model_name, _max_length(model, field))
+    queryset = model.objects.filter(
+        Q(**{field: base})
+        | Q(**{f"{field}__startswith": f"{base}-", f"{field}__regex": rf"^{re.escape(base)}-[0-9]+$"})
+    )
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    # Longest first, then highest: base-10 sorts after base-9.
+    last = queryset.order_by(Length(field).desc(), f"-{field}").values_list(field, flat=True).first()
+
+    if last is None:
+        return base
+    if last == base:
+        return f"{base}-1"
+    return f"{base}-{int(last.rsplit('-', 1)[1]) + 1}"
+
+
+def random_slug(model, base, field="slug"):
+    base = _trim(base or model._meta.model_name, _max_length(model, field))
+    return f"{base}-{secrets.token_hex(RANDOM_SUFFIX_BYTES)}"
+
+
+def save_with_unique_slug(instance, base, save, field="slug", attempts=SLUG_ATTEMPTS):
+    """
+    Sets a unique slug on ``instance`` and calls ``save()``, retrying when
+    a concurrent insert took the same slug first.
+    """
+    model = type(instance)
+    for attempt in range(attempts):
+        if attempt < attempts - 1:
+            slug = allocate_slug(model, base, field, exclude_pk=instance.pk)
+        else:
+            slug = random_slug(model, base, field)
+        setattr(instance, field, slug)
+        try:
+            with transaction.atomic():
+                save()
+            return
+        except IntegrityError:
+            taken = model.objects.filter(**{field: slug}).exclude(pk=instance.pk).exists()
+            if not taken or attempt == attempts - 1:
+                raise
@@ -0,0 +1,165 @@
+"""
+Tag search through per-tag posting lists in Redis.
+
+A query is one or more comma separated terms. Each term is resolved
+against the tag table in one query (resolve_tags): an exact name or slug
+match wins, otherwise the tags whose name starts with the term, otherwise
+those containing it, all served by the trigram index on UPPER(name).
+
+Every tag has a posting list, a sorted set of its post ids scored by
+created_at:
+
+    tag_posts:v1:<tag id>
+
+Lists are built from the database the first time a tag is queried and
+kept current by posts/signals.py (tags added to or removed from a post, a
+post deleted); updates only touch lists that exist, so a partial list is
+never created. A list expires POSTING_TTL seconds after it was built and
+reads do not extend that, so an update that raced with a build is lost
+for at most that long.
+
+The posts of a term are the union of its tags' lists; several terms are
+combined with an intersection (mode "and") or a union ("or"). The set
+operations and the read of the newest ids run in one pipeline, into
+temporary keys that are dropped straight away.
+"""
+import uuid
+
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Length
+from django.utils.text import slugify
+from django_redis import get_redis_connection
+
+from .models import Post, Tag
+
+POSTING_TTL = 60 * 60
+TAG_MATCH_LIMIT = 20
+MAX_TERMS = 5
+
+EXACT, PREFIX, CONTAINS = 0, 1, 2
+
+# KEYS: posting lists; ARGV: member, score. Adds the member to each list
+# that exists, leaving its TTL alone.
+ADD_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('ZADD', key, ARGV[2], ARGV[1])
+    end
+end
+return 1
+"""
+
+
+def key_tag_posts(tag_id) -> str:
+    return f"tag_posts:v1:{tag_id}"
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def parse_terms(query):
+    terms = [t.strip() for t in (query or "").split(",") if t.strip()]
+    return list(dict.fromkeys(terms))[:MAX_TERMS]
+
+
+def resolve_tags(term):
+    """
+    Ids of the tags ``term`` refers to: exact matches if any, else name
+    prefix matches, else name substring matches. One query.
+    """
+    exact = Q(name__iexact=term)
+    slug = slugify(term)
+    if slug:
+        exact |= Q(slug=slug)
+    rows = Tag.objects.filter(exact | Q(name__icontains=term)).annotate(
+        match=Case(
+            When(exact, then=Value(EXACT)),
+            When(name__istartswith=term, then=Value(PREFIX)),
+            default=Value(CONTAINS),
+            output_field=IntegerField(),
+        ),
+    ).order_by("match", Length("name"), "name").values_list("id", "match")[:TAG_MATCH_LIMIT]
+    rows = list(rows)
+    if not rows:
+        return []
+    best = rows[0][1]
+    return [tag_id for tag_id, match in rows if match == best]
+
+
+def build_posting_lists(tag_ids):
+    """
+    Writes the posting lists of ``tag_ids`` from the database, one query.
+    """
+    lists = {tag_id: {} for tag_id in tag_ids}
+    rows = Post.tags.through.objects.filter(tag_id__in=tag_ids) \
+        .values_list("tag_id", "post_id", "post__created_at")
+    for tag_id, post_id, created_at in rows:
+        lists[tag_id][str(post_id)] = created_at.timestamp()
+    with _redis().pipeline() as pipe:
+        for tag_id, members in lists.items():
+            if members:
+                pipe.zadd(key_tag_posts(tag_id), members)
+                pipe.expire(key_tag_posts(tag_id), POSTING_TTL)
+        pipe.execute()
+
+
+def ensure_posting_lists(tag_ids):
+    if not tag_ids:
+        return
+    with _redis().pipeline(transaction=False) as pipe:
+        for tag_id in tag_ids:
+            pipe.exists(key_tag_posts(tag_id))
+        present = pipe.execute()
+    missing = [tag_id for tag_id, found in zip(tag_ids, present) if not found]
+    if missing:
+        build_posting_lists(missing)
+
+
+def tag_post_ids(query, mode="and", limit=None):
+    """
+    Ids of posts tagged as ``query`` asks, newest first, at most ``limit``.
+    """
+    term_tags = [resolve_tags(term) for term in parse_terms(query)]
+    if mode == "and":
+        if not term_tags or not all(term_tags):
+            return []
+    else:
+        term_tags = [tags for tags in term_tags if tags]
+        if not term_tags:
+            return []
+    ensure_posting_lists(sorted({tag_id for tags in term_tags for tag_id in tags}))
+
+    token = uuid.uuid4().hex
+    term_keys = [f"tag_posts:tmp:{token}:{i}" for i in range(len(term_tags))]
+    result_key = f"tag_posts:tmp:{token}"
+    with _redis().pipeline() as pipe:
+        for key, tags in zip(term_keys, term_tags):
+            pipe.zunionstore(key, [key_tag_posts(t) for t in tags], aggregate="MAX")
+        if mode == "and":
+            pipe.zinterstore(result_key, term_keys, aggregate="MAX")
+        else:
+            pipe.zunionstore(result_key, term_keys, aggregate="MAX")
+        pipe.zrevrange(result_key, 0, -1 if limit is None else limit - 1)
+        pipe.delete(result_key, *term_keys)
+        ids = pipe.execute()[-2]
+    return [int(post_id) for post_id in ids]
+
+
+def add_post(post_id, created_at, tag_ids):
+    keys = [key_tag_posts(t) for t in tag_ids]
+    if keys:
+        _redis().eval(ADD_SCRIPT, len(keys), *keys, str(post_id), created_at.timestamp())
+
+
+def remove_post(post_id, tag_ids):
+    if not tag_ids:
+        return
+    with _redis().pipeline(transaction=False) as pipe:
+        for tag_id in tag_ids:
+            pipe.zrem(key_tag_posts(tag_id), str(post_id))
+        pipe.execute()
+
+
+def forget_tag(tag_id):
+    _redis().delete(key_tag_posts(tag_id))
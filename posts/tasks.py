@@ -99,13 +99,17 @@
 import logging
 from celery import shared_task, chain
 from django.core.cache import cache
+from django.db import transaction
 from django.conf import settings
 from .models import Post, Comment
 from .cache import (
-    key_posts_list, key_post_detail, key_post_comments, key_post_likes_count,
-    cache_delete, cache_set, POSTS_TTL, COMMENTS_TTL, invalidate_post
+    key_post_detail, key_post_comments, key_post_likes_count, key_posts_dirty, key_posts_warm_scheduled,
+    cache_delete, cache_delete_many, cache_set_many, cache_set_swr, make_entry,
+    bump_generation, ns_post, ns_feed, POSTS_TTL, COMMENTS_TTL, SOFT_TTL_RATIO, invalidate_post
 )
+from django_redis import get_redis_connection
 from .serializers import PostSerializer
+from .feed import rebuild_feed_ids, render_post_fragments, snapshot_post_generations, add_to_feed, remove_from_feed
 log = logging.getLogger(__name__)
 
 # @shared_task(bind=True, max_retries=3, default_retry_delay=5)
@@ -170,23 +174,25 @@ log = logging.getLogger(__name__)
 #         log.exception("warm_posts_list_cache failed")
 #         raise self.retry(exc=exc)
 from django.test import RequestFactory
-from django.db.models import Count
 @shared_task(bind=True, max_retries=3, default_retry_delay=5)
 def warm_post_detail_cache(self, slug: str, *args, **kwargs):
     try:
+        # Stamps are read before the load (see snapshot_post_generations).
+        post_id = Post.objects.values_list("id", flat=True).get(slug=slug)
+        owners, gens = snapshot_post_generations([post_id])
         post = Post.objects.select_related("author").prefetch_related(
-                    "tags", "likes", "mentions", "media_items"
-                ).annotate(
-                    comment_count=Count('comments', distinct=True),
-                    likes_count=Count('likes', distinct=True)
+                    "tags", "mentions", "media_items"
                 ).get(slug=slug)
+        if owners.get(post.id) != post.author_id:
+            # Changed hands meanwhile; the next read rebuilds it.
+            return False
 
         # FIX: Create and provide the request context
         factory = RequestFactory()
         request = factory.get('/')
         serializer = PostSerializer(post, context={'request': request})
 
-        cache_set(key_post_detail(slug), serializer.data, POSTS_TTL)
+        cache_set_swr(key_post_detail(slug), serializer.data, POSTS_TTL, gens=gens[post.id])
         
         log.info(f"Warmed cache for post detail: {slug}")
         return True
@@ -201,44 +207,158 @@ def warm_post_detail_cache(self, slug: str, *args, **kwargs):
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=5)
 def warm_posts_list_cache(self, *args, **kwargs):
+    """
+    Full rebuild of the feed: the id list and every fragment in it.
+    Normal changes only touch the dirty fragments (see warm_dirty_posts).
+    """
     try:
-        # qs = Post.objects.select_related("author").prefetch_related(
-        #     "tags", "mentions", "media_items"
-        # ).order_by("-created_at")[:200]
+        post_ids = rebuild_feed_ids()
+        fragments = render_post_fragments(post_ids)
+        bump_generation(ns_feed())
 
-        # qs = Post.objects.select_related("author").prefetch_related(
-        #     "tags", "mentions", "media_items"
-        # ).annotate(
-        #     comment_count=Count('comments', distinct=True),likes_count=Count('likes', distinct=True)
-        # ).order_by("-created_at")[:200]
+        log.info(f"Feed is cached. {len(fragments)} post fragments were updated.")
+        return len(fragments)
+    except Exception as exc:
+        log.exception("warm_posts_list_cache failed")
+        raise self.retry(exc=exc)
 
-        qs = Post.objects.select_related("author") \
-        .prefetch_related("tags", "mentions", "media_items") \
-        .annotate(comment_count=Count('comments', distinct=True),
-        likes_count=Count('likes', distinct=True)).order_by("-created_at")[:200]
 
-        # FIX: Create and provide the request context
-        factory = RequestFactory()
-        request = factory.get('/')
-        serializer = PostSerializer(qs, many=True, context={'request': request})
-        
-        # cache_set(key_posts_list(), serializer.data, POSTS_TTL)
-        cache_set(key_posts_list(), serializer.data, timeout=None)
+@shared_task
+def add_post_to_feed(post_id: int):
+    try:
+        post = Post.objects.only("id", "created_at").get(id=post_id)
+    except Post.DoesNotExist:
+        return False
+    add_to_feed(post.id, post.created_at)
+    render_post_fragments([post.id])
+    return True
+
 
-        log.info(f"List is cached. {len(serializer.data)} posts were updated.")
-        return len(serializer.data)
+@shared_task
+def remove_post_from_feed(post_id: int):
+    remove_from_feed(post_id)
+    return True
+
+
+FLUSH_BATCH_SIZE = 500
+
+@shared_task
+def flush_pending_likes(batch_size=FLUSH_BATCH_SIZE):
+    """
+    Moves like toggles recorded in Redis (posts/likes.py) into the M2M
+    tables: one bulk insert and one bulk delete per kind, then a recount
+    and a cache refresh for each touched post.
+    """
+    from .cache import key_likes_dirty
+    from .likes import take_pending, restore_pending, apply_pending
+
+    redis_conn = get_redis_connection("default")
+    members = redis_conn.spop(key_likes_dirty(), batch_size) or []
+
+    changes = {"post": {}, "comment": {}}
+    for member in members:
+        kind, slug = (member.decode() if isinstance(member, bytes) else member).split(":", 1)
+        pending = take_pending(redis_conn, kind, slug)
+        if pending:
+            changes[kind][slug] = pending
+
+    flushed = 0
+    for kind, changes_by_slug in changes.items():
+        if not changes_by_slug:
+            continue
+        try:
+            ids = apply_pending(kind, changes_by_slug)
+        except Exception:
+            log.exception(f"flush_pending_likes failed for {kind} likes")
+            restore_pending(redis_conn, kind, changes_by_slug)
+            continue
+        flushed += sum(len(c) for c in changes_by_slug.values())
+        if kind == "post":
+            for slug, post_id in ids.items():
+                refresh_post_caches(post_id, slug)
+        elif ids:
+            # Comment pages show like_count.
+            post_ids = set(Comment.objects.filter(id__in=list(ids.values())).values_list("post_id", flat=True))
+            if post_ids:
+                bump_generation(*(ns_post(pid) for pid in post_ids))
+    return flushed
+
+
+WARM_DEBOUNCE_SECONDS = getattr(settings, "POSTS_WARM_DEBOUNCE_SECONDS", 2)
+
+
+def refresh_post_caches(post_id, slug):
+    """
+    Marks one post dirty after the current transaction commits. Bursts of
+    changes (likes, comments, tag edits) are coalesced: at most one
+    warm_dirty_posts run is queued per debounce window, and it rewrites
+    each dirty post's fragment and detail entry once. The feed id list is
+    left alone.
+    """
+    transaction.on_commit(lambda: schedule_post_warm(post_id, slug))
+
+
+def schedule_post_warm(post_id, slug):
+    redis_conn = get_redis_connection("default")
+    with redis_conn.pipeline() as pipe:
+        pipe.sadd(key_posts_dirty(), f"{post_id}:{slug}")
+        # The flag outlives the window so a lost task cannot block warming for good.
+        pipe.set(key_posts_warm_scheduled(), 1, nx=True, ex=WARM_DEBOUNCE_SECONDS * 10)
+        _, scheduled = pipe.execute()
+    if scheduled:
+        warm_dirty_posts.apply_async(countdown=WARM_DEBOUNCE_SECONDS)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=5)
+def warm_dirty_posts(self, *args, **kwargs):
+    """
+    One run per debounce window: renders every dirty post in one query and
+    writes its feed fragment and detail entry from the same data.
+    """
+    redis_conn = get_redis_connection("default")
+    # Clear the flag first, so changes made while this runs queue another run.
+    redis_conn.delete(key_posts_warm_scheduled())
+    with redis_conn.pipeline() as pipe:
+        pipe.smembers(key_posts_dirty())
+        pipe.delete(key_posts_dirty())
+        members, _ = pipe.execute()
+    if not members:
+        return 0
+
+    dirty = {}
+    for member in members:
+        post_id, slug = (member.decode() if isinstance(member, bytes) else member).split(":", 1)
+        dirty[int(post_id)] = slug
+
+    try:
+        # Comment lists are dropped by moving the posts to a new generation.
+        bump_generation(*(ns_post(pid) for pid in dirty))
+        fragments, gens = render_post_fragments(list(dirty), with_gens=True)
+        soft_ttl = int(POSTS_TTL * SOFT_TTL_RATIO)
+        cache_set_many(
+            {key_post_detail(dirty[pid]): make_entry(data, soft_ttl, gens[pid]) for pid, data in fragments.items()},
+            POSTS_TTL,
+        )
+        gone = [key_post_detail(slug) for pid, slug in dirty.items() if pid not in fragments]
+        if gone:
+            cache_delete_many(gone)
+        # Last, so a feed rendered from the old fragments is never stamped new.
+        bump_generation(ns_feed())
     except Exception as exc:
-        log.exception("warm_posts_list_cache failed")
-        # FIX: Corrected typo from self.Retry to self.retry
+        log.exception("warm_dirty_posts failed")
+        redis_conn.sadd(key_posts_dirty(), *members)
         raise self.retry(exc=exc)
 
+    log.info(f"Warmed {len(fragments)} dirty posts.")
+    return len(fragments)
+
 @shared_task
 def invalidate_post_cache(slug: str):
+    # The likers set and key_post_likes_count belong to posts/likes.py and
+    # are not dropped here: pending likes live next to them until flushed.
     cache_delete(
-        key_posts_list(),
         key_post_detail(slug),
         key_post_comments(slug),
-        key_post_likes_count(slug),
     )
     return True
 
@@ -12,6 +12,7 @@ from .views import (
     LikePost,
     UnlikePost,
     ListCreateCommentReplies,
+    CommentThreadView,
     LikeComment,
     SearchView,
     LikeCountComment,
@@ -74,6 +75,9 @@ urlpatterns = [
     #create and list Reply to a comment
     path("comments/<slug:slug>/replies/", ListCreateCommentReplies.as_view(), name="comment-replies"),
 
+    # A whole comment subtree in one request
+    path("comments/<slug:slug>/thread/", CommentThreadView.as_view(), name="comment-thread"),
+
     #Like and unlike a comment
     path("comments/<slug:slug>/like-unlike/", LikeComment.as_view(), name="like-comment"),
 
@@ -7,6 +7,8 @@ from .serializers import (
     PostSerializer,
     TagSerializer,
     CommentSerializer,
+    CommentListSerializer,
+    CommentThreadSerializer,
     ReplySerializer,
     UserSearchSerializer,
     PostSearchSerializer,
@@ -15,19 +17,23 @@ from .serializers import (
 )
 from django.db import models
 from users.models import CustomUser as User
-from django.db.models import Q, Value
-from django.db.models.functions import Concat
-from django.contrib.postgres.search import SearchVector, TrigramSimilarity
 from django.shortcuts import get_object_or_404
 from .models import Post, Comment, Tag
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiExample, OpenApiParameter, OpenApiTypes,extend_schema_view
 from rest_framework import serializers
-from rest_framework.pagination import PageNumberPagination
 from django.core.cache import cache
 from .cache import *
+from .feed import get_feed
+from p2p_comm.http_cache import (
+    cached_json_response, get_rendered, set_rendered, rendered_not_modified, not_modified, make_etag,
+)
+from .comments import (
+    get_comment_page, comment_subtree, COMMENTS_PAGE_SIZE, MAX_COMMENTS_PAGE_SIZE,
+    THREAD_DEPTH, MAX_THREAD_DEPTH, THREAD_LIMIT, MAX_THREAD_LIMIT,
+)
+from .likes import set_like, like_state, liked_slugs
 import logging
 import time
-from django.db.models import Count
 from django.utils.dateparse import parse_datetime
 log = logging.getLogger(__name__)
 from django.db import transaction, IntegrityError
@@ -77,31 +83,14 @@ class PostListCreateView(APIView):
 
    
     def get(self, request):
-        cache_key = key_posts_list()
-        print("cache_key", cache_key)
-        cached_data = cache_get(cache_key)
+        # The feed is an id list plus per-post fragments fetched with one
+        # MGET; only fragments missing from the cache hit the database.
+        # Its JSON is cached as bytes until the feed generation moves on.
+        def build():
+            gens = get_generations([ns_posts(), ns_feed()])
+            return get_feed(), gens
 
-        if cached_data is not None:
-            print("Serving posts list from CACHE!") 
-            return Response(cached_data)
-
-        print("Serving posts list from DATABASE.")
-        
-        # --- THIS IS THE FIX ---
-        # Optimize the queryset BEFORE it goes to the serializer
-        # posts = Post.objects.select_related("author").prefetch_related("tags", "mentions", "media_items").all()
-        posts = Post.objects.select_related("author") \
-        .prefetch_related("tags", "mentions", "media_items") \
-        .annotate(comment_count=Count('comments', distinct=True),
-        likes_count=Count('likes', distinct=True)).order_by("-created_at")[:200]
-        # ----------------------
-        
-        serializer = PostSerializer(posts, many=True)
-        
-        # cache_set(cache_key, serializer.data, POSTS_TTL)
-        cache_set(cache_key, serializer.data, timeout=None)
-
-        return Response(serializer.data)
+        return cached_json_response(request, "posts:feed", build, RENDERED_TTL)
 
     @extend_schema(
         summary="Create a new post",
@@ -194,28 +183,32 @@ class PostDetailView(APIView):
     #     return Response(serializer.data)
 
     def get(self, request, slug):
-        cache_key = key_post_detail(slug)
-
-        caches_data = cache_get(cache_key)
-
-        if caches_data is not None:
-            print("Serving post detail from CACHE!") # For debugging
-            return Response(caches_data)
-
-        print("Serving post detail from DATABASE.") # For debugging
-        try:
+        def load():
+            # like_count/comment_count are stored columns, no aggregation needed.
             post = Post.objects.select_related("author").prefetch_related(
-                "tags", "likes", "mentions", "media_items"
-            ).annotate(
-                comment_count=Count('comments', distinct=True),
-                likes_count=Count('likes', distinct=True)
+                "tags", "mentions", "media_items"
             ).get(slug=slug)
-            
+            return PostSerializer(post).data, post_namespaces(post.id, post.author_id)
+
+        # Single-flight with stale-while-revalidate: only one request rebuilds
+        # a missing entry, and a stale one is refreshed by a background task.
+        from .tasks import warm_post_detail_cache
+        unchanged = rendered_not_modified(request, f"posts:detail:{slug}")
+        if unchanged is not None:
+            return unchanged
+        rendered = get_rendered(f"posts:detail:{slug}")
+        if rendered is not None:
+            return rendered.response(request)
+        try:
+            data, gens = cache_get_swr(
+                key_post_detail(slug), load, POSTS_TTL,
+                refresh=lambda: warm_post_detail_cache.delay(slug), with_gens=True,
+                known=lambda: post_namespaces(*Post.objects.values_list("id", "author_id").get(slug=slug)),
+            )
         except Post.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        serializer = PostSerializer(post)
-        cache_set(cache_key, serializer.data, POSTS_TTL) # timeout in seconds
-        return Response(serializer.data)
+        # Stamped like the entry it came from, so it goes stale with it.
+        return set_rendered(f"posts:detail:{slug}", data, RENDERED_TTL, gens).response(request)
 
     @extend_schema(
         summary="Update a post",
@@ -459,45 +452,69 @@ class CommentCountView(APIView):
                 {"detail": "Post not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        count = Comment.objects.filter(post=post).count()
-        return Response({"count": count})
+        return Response({"count": post.comment_count})
 
 
 class ListCommentsPost(APIView):
     permission_classes = [IsAuthenticated]
-    serializer_class = CommentSerializer
+    serializer_class = CommentListSerializer
 
     @extend_schema(
-        summary="List all parent comments for a post",
-        description="Return all top-level comments (parent is null) for a post identified by slug.",
+        summary="List parent comments for a post",
+        description="Return top-level comments (parent is null) for a post identified by slug, "
+                    "newest first. Pass `next_cursor` from the previous page as `cursor` to get "
+                    "the next page.",
+        parameters=[
+            OpenApiParameter(name="cursor", type=OpenApiTypes.STR, required=False),
+            OpenApiParameter(name="limit", type=OpenApiTypes.INT, required=False,
+                             description=f"Page size (default {COMMENTS_PAGE_SIZE}, max {MAX_COMMENTS_PAGE_SIZE})."),
+        ],
         responses={
-            200: CommentSerializer(many=True),
+            200: CommentListSerializer(many=True),
+            304: OpenApiResponse(description="Not modified"),
+            400: OpenApiResponse(description="Invalid cursor"),
             404: OpenApiResponse(description="Post not found"),
         },
         tags=["Comments"],
         examples=[
             OpenApiExample(
                 "Example response",
-                value=[
-                    {
-                        "content": "This is a top-level comment.",
-                        "post": 1,
-                        "parent": None,
-                        "slug": "comment-slug",
-                    }
-                ],
+                value={
+                    "results": [
+                        {
+                            "content": "This is a top-level comment.",
+                            "post": 1,
+                            "parent": None,
+                            "slug": "comment-slug",
+                            "like_count": 3,
+                            "reply_count": 1,
+                        }
+                    ],
+                    "next_cursor": "MjAyNS0wOS0xNVQxMDozMDowMCswMDowMHw0Mg==",
+                },
                 response_only=True,
             )
         ],
     )
     def get(self, request, slug):
+        cursor = request.query_params.get("cursor") or None
         try:
-            post = Post.objects.get(slug=slug)
+            limit = min(max(int(request.query_params.get("limit", COMMENTS_PAGE_SIZE)), 1), MAX_COMMENTS_PAGE_SIZE)
+        except ValueError:
+            limit = COMMENTS_PAGE_SIZE
+        try:
+            page, gens = get_comment_page(slug, cursor, limit)
         except Post.DoesNotExist:
             return Response({"detail": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
-        comments = Comment.objects.filter(post=post, parent__isnull=True)
-        serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data)
+        except ValueError:
+            return Response({"detail": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The page only changes when one of its generations does.
+        etag = make_etag(f"{slug}:{cursor}:{limit}".encode(), gens)
+        unchanged = not_modified(request, etag)
+        if unchanged is not None:
+            return unchanged
+        return Response(page, headers={"ETag": etag})
 
 
 class ListCreateCommentReplies(APIView):
@@ -552,6 +569,42 @@ class ListCreateCommentReplies(APIView):
         return Response({"detail": "Comment deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
 
+class CommentThreadView(APIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = CommentThreadSerializer
+
+    @extend_schema(
+        summary="Get a comment thread",
+        description="Return a comment and its replies, nested replies included, in display order "
+                    "(each reply follows its parent). `depth` on each node is relative to the "
+                    "requested comment; `truncated` is true when `limit` cut the thread short.",
+        parameters=[
+            OpenApiParameter(name="max_depth", type=OpenApiTypes.INT, required=False,
+                             description=f"Levels below the comment (default {THREAD_DEPTH}, max {MAX_THREAD_DEPTH})."),
+            OpenApiParameter(name="limit", type=OpenApiTypes.INT, required=False,
+                             description=f"Max comments returned (default {THREAD_LIMIT}, max {MAX_THREAD_LIMIT})."),
+        ],
+        responses={200: CommentThreadSerializer(many=True), 404: OpenApiResponse(description="Comment not found")},
+        tags=["Comments"],
+    )
+    def get(self, request, slug):
+        try:
+            root = Comment.objects.only("id", "parent_id", "path", "depth").get(slug=slug)
+        except Comment.DoesNotExist:
+            return Response({"detail": "Comment not found"}, status=status.HTTP_404_NOT_FOUND)
+        if not root.path:
+            root.set_path()
+
+        try:
+            max_depth = min(max(int(request.query_params.get("max_depth", THREAD_DEPTH)), 0), MAX_THREAD_DEPTH)
+            limit = min(max(int(request.query_params.get("limit", THREAD_LIMIT)), 1), MAX_THREAD_LIMIT)
+        except ValueError:
+            return Response({"detail": "max_depth and limit must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        nodes, truncated = comment_subtree(root, max_depth, limit)
+        return Response({"results": nodes, "truncated": truncated})
+
+
 class LikesCountPost(APIView):
     permission_classes = [IsAuthenticated]
     serializer_class = LikeCountPostSerializer
@@ -562,14 +615,16 @@ class LikesCountPost(APIView):
         tags=["Likes"],
     )
     def get(self, request, slug):
-        try:
-            post = Post.objects.get(slug=slug)
-        except Post.DoesNotExist:
+        if not Post.objects.filter(slug=slug).exists():
             return Response({"detail": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        count = post.likes.count()
-        is_like = post.likes.filter(id=request.user.id).exists()
-        return Response({"count": count, "is_like": is_like})
+        count, is_like = like_state("post", slug, request.user.id)
+        # Polled a lot; the validator is just the two values themselves.
+        etag = f'W/"likes-{count}-{int(is_like)}"'
+        unchanged = not_modified(request, etag)
+        if unchanged is not None:
+            return unchanged
+        return Response({"count": count, "is_like": is_like}, headers={"ETag": etag})
 
 
 class LikeCountComment(APIView):
@@ -582,13 +637,10 @@ class LikeCountComment(APIView):
         tags=["Likes"],
     )
     def get(self, request, slug):
-        try:
-            comment = Comment.objects.get(slug=slug)
-        except Comment.DoesNotExist:
+        if not Comment.objects.filter(slug=slug).exists():
             return Response({"detail": "Comment not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        count = comment.likes.count()
-        is_like = comment.likes.filter(id=request.user.id).exists()
+        count, is_like = like_state("comment", slug, request.user.id)
         return Response({"count": count, "is_like": is_like})
     
 # ---- Quick inline serializers for responses ----
@@ -612,11 +664,10 @@ class LikePost(APIView):
         tags=["Likes"],
     )
     def put(self, request, slug):
-        try:
-            post = Post.objects.get(slug=slug)
-        except Post.DoesNotExist:
+        if not Post.objects.filter(slug=slug).exists():
             return Response({"detail": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
-        post.likes.add(request.user)
+        # Recorded in Redis; flush_pending_likes writes it to the DB.
+        set_like("post", slug, request.user.id, mode="like")
         return Response({"detail": "Post liked successfully"}, status=status.HTTP_200_OK)
     
 class UnlikePost(APIView):
@@ -633,15 +684,13 @@ class UnlikePost(APIView):
         tags=["Likes"],
     )
     def put(self, request, slug):
-        try:
-            post = Post.objects.get(slug=slug)
-        except Post.DoesNotExist:
+        if not Post.objects.filter(slug=slug).exists():
             return Response({"detail": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        if not post.likes.filter(id=request.user.id).exists():
+        _, changed = set_like("post", slug, request.user.id, mode="unlike")
+        if not changed:
             return Response({"detail": "You have not liked this post."}, status=status.HTTP_400_BAD_REQUEST)
 
-        post.likes.remove(request.user)
         return Response({"detail": "Post unliked successfully"}, status=status.HTTP_200_OK)
     
 class UnlikeComment(APIView):
@@ -660,15 +709,13 @@ class UnlikeComment(APIView):
     )
 
     def put(self, request, slug):
-        try:
-            comment = Comment.objects.get(slug=slug)
-        except Comment.DoesNotExist:
+        if not Comment.objects.filter(slug=slug).exists():
             return Response({"detail": "Comment not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        if not comment.likes.filter(id=request.user.id).exists():
+        _, changed = set_like("comment", slug, request.user.id, mode="unlike")
+        if not changed:
             return Response({"detail": "You have not liked this comment."}, status=status.HTTP_400_BAD_REQUEST)
 
-        comment.likes.remove(request.user)
         return Response({"detail": "Comment unliked successfully"}, status=status.HTTP_200_OK)
 
 class LikeComment(APIView):
@@ -681,32 +728,30 @@ class LikeComment(APIView):
         tags=["Likes"],
     )
     def put(self, request, slug):
-        try:
-            comment = Comment.objects.get(slug=slug)
-        except Comment.DoesNotExist:
+        if not Comment.objects.filter(slug=slug).exists():
             return Response({"detail": "Comment not found"}, status=status.HTTP_404_NOT_FOUND)
-        if(comment.likes.filter(id=request.user.id).exists()):
-            comment.likes.remove(request.user)
+        # Toggle: a second like removes it.
+        liked, _ = set_like("comment", slug, request.user.id, mode="toggle")
+        if not liked:
             return Response({"detail": "Comment unliked successfully"}, status=status.HTTP_200_OK)
-        comment.likes.add(request.user)
         return Response({"detail": "Comment liked successfully"}, status=status.HTTP_200_OK)
 
 
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 from rest_framework import status
-from django.db.models import Q, Count, Value, TextField
-from django.db.models.functions import Concat
-from django.contrib.postgres.search import SearchVector, TrigramSimilarity
+from .search import (
+    SearchPagination, search_post_ids, people_ids, tag_post_ids, hydrate_posts, hydrate_people, hydrate_tag_posts,
+)
+from users.search import search_people
 # Assuming User, Post, Serializers, and Schema imports are available
 
 class SearchView(APIView):
     permission_classes = [IsAuthenticated]
 
     # Set pagination_class as a class attribute for better convention (optional, but good practice)
-    pagination_class = PageNumberPagination
+    pagination_class = SearchPagination
 
     @extend_schema(
         summary="Unified search for users or posts",
@@ -724,6 +769,11 @@ class SearchView(APIView):
                 enum=["people", "posts"],
                 description="Type of search: 'people' or 'posts' (default: posts)"
             ),
+            OpenApiParameter(name="page", type=OpenApiTypes.INT, required=False),
+            OpenApiParameter(
+                name="page_size", type=OpenApiTypes.INT, required=False,
+                description=f"Results per page (max {SearchPagination.max_page_size})"
+            ),
         ],
         responses={
             # Using 200 for both is generally better for GET requests returning data
@@ -742,22 +792,14 @@ class SearchView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Cached id lists, pages hydrated from fragments (posts/search.py)
         if search_type == 'people':
-            queryset = User.objects.annotate(
-                similarity=TrigramSimilarity('username', query),
-            ).filter(similarity__gt=0.3).order_by('-similarity')
-            serializer_class = UserSearchSerializer
+            # Ranked, index-served username/full_name search (users/search.py)
+            ids, hydrate_page = people_ids(query), hydrate_people
 
         elif search_type == 'posts':
-            queryset = Post.objects.filter(published=True).annotate(
-                similarity=TrigramSimilarity(
-                    Concat('title', Value(' '), 'content', output_field=TextField()), query
-                ),
-                search=SearchVector('title', 'content'),
-            ).filter(
-                Q(search=query) | Q(similarity__gt=0.3)
-            ).order_by('-similarity')
-            serializer_class = PostSearchSerializer
+            # Stored tsvector + title trigram, both indexed
+            ids, hydrate_page = search_post_ids(query), hydrate_posts
 
         else:
             return Response(
@@ -765,16 +807,9 @@ class SearchView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # paginator = self.pagination_class()
-        # paginated_queryset = paginator.paginate_queryset(queryset, request, view=self)
-
-        # if paginated_queryset is not None:
-        #     serializer = serializer_class(paginated_queryset, many=True)
-        #     return paginator.get_paginated_response(serializer.data)
-        # else:
-
-        serializer = serializer_class(queryset, many=True)
-        return Response(serializer.data)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(ids, request, view=self)
+        return paginator.get_paginated_response(hydrate_page(page))
 
     
 
@@ -948,6 +983,7 @@ class UserSearchAPIView(ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = UserSearchSerializer
     # pagination_class = None  # use default from settings
+    pagination_class = SearchPagination  # bounded pages
 
     @extend_schema(
         summary="Search all users",
@@ -971,11 +1007,19 @@ class UserSearchAPIView(ListAPIView):
         tags=["Search"],
     )
     def get_queryset(self):
-        query = self.request.query_params.get('search', None)
-        queryset = User.objects.all()
+        query = (self.request.query_params.get('search') or '').strip()
+        queryset = User.objects.select_related('profile')
         if query:
-            queryset = queryset.filter(Q(username__icontains=query) | Q(full_name__icontains=query))
-        return queryset
+            return search_people(queryset, query)
+        return queryset.order_by('username')
+
+    def list(self, request, *args, **kwargs):
+        query = (request.query_params.get('search') or '').strip()
+        if not query:
+            return super().list(request, *args, **kwargs)
+        # Cached id list, page hydrated from fragments (posts/search.py)
+        page = self.paginate_queryset(people_ids(query))
+        return self.get_paginated_response(hydrate_people(page))
 
 @extend_schema_view(
     get=extend_schema(
@@ -987,8 +1031,17 @@ class UserSearchAPIView(ListAPIView):
                 location=OpenApiParameter.QUERY,
                 required=True,
                 type=OpenApiTypes.STR,
-                description="Search query string",
-            )
+                description="Tag name(s), comma separated: exact, prefix or substring match",
+            ),
+            OpenApiParameter(
+                name="mode",
+                location=OpenApiParameter.QUERY,
+                required=False,
+                type=OpenApiTypes.STR,
+                enum=["and", "or"],
+                description="How several tags combine (default: and)",
+            ),
+            OpenApiParameter(name="page", type=OpenApiTypes.INT, required=False),
         ],
         responses={
             200: OpenApiResponse(response=PostSerializer(many=True)),
@@ -1008,34 +1061,17 @@ class TagSearchAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Base queryset
-        queryset = Post.objects.filter(tags__name__icontains=tag_name)
-
-        # Optimize query
-        optimized_queryset = queryset.select_related(
-            'author__profile'
-        ).prefetch_related(
-            'tags',
-            'mentions',
-            'media_items'
-        ).annotate(
-            comment_count=Count('comments', distinct=True),
-            likes_count=Count('likes', distinct=True)
-        ).order_by('-created_at')
-
-        # Pagination
-        # paginator = PageNumberPagination()
-        # paginated_queryset = paginator.paginate_queryset(optimized_queryset, request, view=self)
-
-        serializer = PostSerializer(
-            optimized_queryset,
-            many=True,
-            context={'request': request}
-        )
-
-        # if paginated_queryset is not None:
-        #     return paginator.get_paginated_response(serializer.data)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Tag posting lists in Redis (newest first, capped), page hydrated
+        # from the feed's post fragments (posts/search.py)
+        mode = request.query_params.get("mode", "and")
+        if mode not in ("and", "or"):
+            return Response(
+                {"detail": "mode must be 'and' or 'or'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(tag_post_ids(tag_name, mode), request, view=self)
+        return paginator.get_paginated_response(hydrate_tag_posts(page))
 
 class PostLikeStatusView(APIView):
     """
@@ -1108,10 +1144,8 @@ class PostLikeStatusView(APIView):
         if not post_slugs:
             return Response({})
 
-        # 2. Filter by 'slug__in' and get back a set of slugs the user has liked
-        liked_post_slugs = set(
-            request.user.liked_posts.filter(slug__in=post_slugs).values_list('slug', flat=True)
-        )
+        # 2. Get back the set of slugs the user has liked (Redis first, DB for cold posts)
+        liked_post_slugs = liked_slugs("post", post_slugs, request.user.id)
 
         # 3. Build the response dictionary with slugs as keys
         response_data = {
@@ -1309,9 +1343,6 @@ class ListMyPosts(APIView):
             'tags',
             'mentions',
             'media_items'
-        ).annotate(
-            comment_count=Count('comments', distinct=True),
-            likes_count=Count('likes', distinct=True)
         ).order_by('-created_at')
 
         # paginator = PageNumberPagination()
@@ -1368,9 +1399,6 @@ class ListUserPostsView(APIView):
             'tags',
             'mentions',
             'media_items'
-        ).annotate(
-            comment_count=Count('comments', distinct=True),
-            likes_count=Count('likes', distinct=True)
         ).order_by('-created_at')
 
         # paginator = PageNumberPagination()
@@ -1463,10 +1491,7 @@ class PostHistoryView(APIView):
         # 1. Base queryset
         queryset = Post.objects.select_related("author") \
             .prefetch_related("tags", "mentions", "media_items") \
-            .annotate(
-                comment_count=Count('comments', distinct=True),
-                likes_count=Count('likes', distinct=True)
-            ).order_by("-created_at")
+            .order_by("-created_at")
 
         # 2. Apply cursor filter if timestamp is provided
         if cursor_timestamp_str:
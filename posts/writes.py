@@ -0,0 +1,150 @@
+"""
+Shared write helpers for posts and comments: tags and mentions in a fixed
+number of queries, however many there are.
+
+upsert_tags creates the missing tags with one bulk INSERT ... ON CONFLICT
+DO NOTHING and returns the ids of all of them. Slugs are filled in up
+front, since bulk_create skips Tag.save(); a name whose slug is already
+taken (or taken by another name in the same batch) is saved on its own
+so Tag.save() can allocate a suffix, which is rare.
+
+sync_mentions resolves the @usernames of the content with one lookup and
+writes the M2M rows once. A freshly inserted row has no mentions yet, so
+its rows are inserted directly instead of letting .set() read them first.
+
+sync_media diffs the submitted media list against the stored one by URL
+instead of deleting and recreating every item on each edit.
+"""
+import re
+
+from django.db.models.signals import m2m_changed
+from django.utils.text import slugify
+
+from users.models import CustomUser
+
+MENTION_RE = re.compile(r'@(\w+)')
+
+
+def mentioned_usernames(content):
+    return set(MENTION_RE.findall(content or ""))
+
+
+def _add_new(relation, instance, ids):
+    """
+    Inserts M2M rows for an instance that has none yet (one query). Sends
+    post_add like .add() would, so the cache receivers still run.
+    """
+    if not ids:
+        return
+    through = relation.through
+    source = relation.source_field_name + "_id"
+    target = relation.target_field_name + "_id"
+    through.objects.bulk_create(
+        [through(**{source: instance.pk, target: pk}) for pk in ids], ignore_conflicts=True
+    )
+    m2m_changed.send(
+        sender=through, instance=instance, action="post_add", reverse=False,
+        model=relation.model, pk_set=set(ids), using=through.objects.db,
+    )
+
+
+def set_related(instance, name, ids, created=False):
+    relation = getattr(instance, name)
+    if created:
+        _add_new(relation, instance, ids)
+    else:
+        relation.set(ids)
+
+
+def sync_mentions(instance, created=False):
+    """
+    Points instance.mentions at the users @mentioned in instance.content.
+    """
+    usernames = mentioned_usernames(instance.content)
+    ids = []
+    if usernames:
+        ids = list(CustomUser.objects.filter(username__in=usernames).values_list("id", flat=True))
+    if created or ids:
+        set_related(instance, "mentions", ids, created)
+    else:
+        instance.mentions.clear()
+
+
+def upsert_tags(names):
+    """
+    Ids of the tags called ``names``, creating the missing ones in bulk.
+    """
+    from .models import Tag
+
+    names = list(dict.fromkeys(n.strip() for n in names if n and n.strip()))
+    if not names:
+        return []
+
+    ids = dict(Tag.objects.filter(name__in=names).values_list("name", "id"))
+    missing = [n for n in names if n not in ids]
+    if not missing:
+        return [ids[n] for n in names]
+
+    slugs = {n: slugify(n) or "tag" for n in missing}
+    taken = set(Tag.objects.filter(slug__in=set(slugs.values())).values_list("slug", flat=True))
+    fresh, clashing, seen = [], [], set()
+    for name in missing:
+        slug = slugs[name]
+        if slug in taken or slug in seen:
+            clashing.append(name)
+        else:
+            seen.add(slug)
+            fresh.append(Tag(name=name, slug=slug))
+
+    # A concurrent writer may insert the same names; those rows are skipped
+    # here and picked up by the lookup below.
+    Tag.objects.bulk_create(fresh, ignore_conflicts=True)
+    ids.update(Tag.objects.filter(name__in=[t.name for t in fresh]).values_list("name", "id"))
+
+    for name in clashing + [t.name for t in fresh if t.name not in ids]:
+        tag, _ = Tag.objects.get_or_create(name=name)  # Tag.save() allocates the slug
+        ids[name] = tag.id
+    return [ids[n] for n in names]
+
+
+def set_tags(post, names, created=False):
+    set_related(post, "tags", upsert_tags(names), created)
+
+
+def sync_media(post, media_data, created=False):
+    """
+    Makes post.media_items match ``media_data`` (in display order),
+    reconciled by URL: new items are inserted, missing ones deleted and
+    moved or retyped ones updated, one query per kind of change and none
+    when nothing changed. Returns whether anything was written.
+    """
+    from .models import Media
+
+    wanted = [
+        (item.get('url'), item.get('media_type'), index)
+        for index, item in enumerate(media_data)
+    ]
+    existing = {}
+    if not created:
+        for media in post.media_items.all():
+            existing.setdefault(media.url, []).append(media)
+
+    to_create, to_update = [], []
+    for url, media_type, order in wanted:
+        matches = existing.get(url)
+        if not matches:
+            to_create.append(Media(post=post, url=url, media_type=media_type, display_order=order))
+            continue
+        media = matches.pop(0)
+        if media.display_order != order or media.media_type != media_type:
+            media.display_order, media.media_type = order, media_type
+            to_update.append(media)
+    to_delete = [media.pk for matches in existing.values() for media in matches]
+
+    if to_delete:
+        Media.objects.filter(pk__in=to_delete).delete()
+    if to_update:
+        Media.objects.bulk_update(to_update, ["display_order", "media_type"])
+    if to_create:
+        Media.objects.bulk_create(to_create)
+    return bool(to_create or to_update or to_delete)
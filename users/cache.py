@@ -0,0 +1,28 @@
+# users/cache.py
+from django.conf import settings
+
+from p2p_comm.generations import bump_generation
+
+PROFILE_TTL = getattr(settings, "PROFILE_CACHE_TTL", 600)
+
+
+def ns_profile(user_id) -> str:
+    # Generation of everything rendered from one user's public profile.
+    return f"profile:{user_id}"
+
+
+def ns_people_search() -> str:
+    # Cached people/profile search id lists (p2p_comm/search_cache.py).
+    return "search:people"
+
+
+def rendered_profile_name(username: str) -> str:
+    return f"profile:{username}"
+
+
+def invalidate_profile(user_id):
+    bump_generation(ns_profile(user_id))
+
+
+def invalidate_people_search():
+    bump_generation(ns_people_search())
@@ -0,0 +1,28 @@
+# users/management/commands/rebuild_typeahead.py
+from django.core.management.base import BaseCommand
+from django_redis import get_redis_connection
+
+from users.models import CustomUser
+from users.typeahead import index_user, key_people, key_terms
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the @mention typeahead index in Redis from the users table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        redis_conn = get_redis_connection("default")
+        redis_conn.delete(key_terms(), key_people())
+
+        count = 0
+        users = CustomUser.objects.select_related('profile').order_by('pk')
+        for user in users.iterator(chunk_size=options['batch_size']):
+            profile = getattr(user, 'profile', None)
+            index_user(user, profile.avatar_url if profile else None, conn=redis_conn)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} users."))
+
+
+# run python manage.py rebuild_typeahead once after deploying, or if Redis was flushed.
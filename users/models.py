@@ -4,6 +4,8 @@ from django.contrib.auth.models import AbstractUser
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
 
 class CustomUser(AbstractUser):
     # keep first_name, last_name, username fields from AbstractUser
@@ -16,6 +18,14 @@ class CustomUser(AbstractUser):
     USERNAME_FIELD = "username"
     REQUIRED_FIELDS = ["email"]
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # icontains compiles to UPPER(col) LIKE '%q%': these trigram
+            # indexes serve it, and the fuzzy matches in users/search.py.
+            GinIndex(OpClass(Upper('username'), name='gin_trgm_ops'), name='user_username_trgm_idx'),
+            GinIndex(OpClass(Upper('full_name'), name='gin_trgm_ops'), name='user_full_name_trgm_idx'),
+        ]
+
     def __str__(self):
         return self.username
     
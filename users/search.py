@@ -0,0 +1,86 @@
+# users/search.py
+"""
+Ranked people search over username and full_name.
+
+Substring matches (icontains, i.e. UPPER(col) LIKE '%q%') and, for terms
+of three characters or more, fuzzy trigram matches are both served by the
+GIN trigram indexes on UPPER(username) and UPPER(full_name). Results are
+ordered by trigram similarity, with a boost for names that start with the
+term, and capped at PEOPLE_MAX_RESULTS.
+
+search_people works on any queryset that reaches the user, through
+``prefix`` ("user__" for Profile). ProfileSearchView caches the matching
+ids per normalized query and hydrates profiles from fragments
+(p2p_comm/search_cache.py).
+"""
+from django.contrib.postgres.lookups import TrigramSimilar
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Greatest, Upper
+
+from p2p_comm.search_cache import cached_ids, hydrate
+
+from .cache import ns_people_search, ns_profile
+from .models import Profile
+from .serializers import PublicProfileSerializer
+
+PEOPLE_MAX_RESULTS = 200
+# Shorter terms have too few trigrams for a useful fuzzy match.
+FUZZY_MIN_LENGTH = 3
+
+USERNAME_PREFIX_BOOST = 1.0
+FULL_NAME_PREFIX_BOOST = 0.8
+WORD_PREFIX_BOOST = 0.4
+
+
+def search_people(queryset, query, prefix=""):
+    """
+    ``queryset`` filtered to people matching ``query``, best match first.
+    """
+    term = query.strip()
+    username, full_name = f"{prefix}username", f"{prefix}full_name"
+    upper_term = Value(term.upper())
+
+    match = Q(**{f"{username}__icontains": term}) | Q(**{f"{full_name}__icontains": term})
+    if len(term) >= FUZZY_MIN_LENGTH:
+        match |= Q(TrigramSimilar(Upper(username), upper_term)) | Q(TrigramSimilar(Upper(full_name), upper_term))
+
+    boost = Case(
+        When(**{f"{username}__istartswith": term}, then=Value(USERNAME_PREFIX_BOOST)),
+        When(**{f"{full_name}__istartswith": term}, then=Value(FULL_NAME_PREFIX_BOOST)),
+        When(**{f"{full_name}__icontains": f" {term}"}, then=Value(WORD_PREFIX_BOOST)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    return queryset.filter(match).annotate(
+        people_rank=Greatest(
+            TrigramSimilarity(Upper(username), upper_term),
+            TrigramSimilarity(Upper(full_name), upper_term),
+        ) + boost,
+    ).order_by("-people_rank", F(username).asc())[:PEOPLE_MAX_RESULTS]
+
+
+def profile_user_ids(query, limit):
+    ids = cached_ids(
+        "profiles", query,
+        lambda: search_people(Profile.objects.all(), query, prefix="user__").values_list("user_id", flat=True),
+        [ns_people_search()],
+    )
+    return ids[:limit]
+
+
+def render_profiles(user_ids):
+    profiles = Profile.objects.filter(user_id__in=user_ids).select_related("user").prefetch_related(
+        "experiences", "skills", "educations", "links", "social_links", "projects", "certificates",
+    )
+    return {
+        profile.user_id: (PublicProfileSerializer(profile).data, [ns_profile(profile.user_id)])
+        for profile in profiles
+    }
+
+
+def hydrate_profiles(user_ids):
+    return hydrate(
+        "profile", user_ids, render_profiles,
+        lambda missing: {user_id: [ns_profile(user_id)] for user_id in missing},
+    )
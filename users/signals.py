@@ -0,0 +1,77 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import invalidate_profile, invalidate_people_search
+from .typeahead import index_user, remove_user
+from .models import (
+    CustomUser, Profile, SocialLink, Project, Certificate, Links, Experience, Skill, Education,
+)
+
+PROFILE_PARTS = (SocialLink, Project, Certificate, Links, Experience, Skill, Education)
+
+
+def _invalidate_on_commit(user_id):
+    transaction.on_commit(lambda: invalidate_profile(user_id))
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields and set(update_fields) <= {"last_login"}):
+        return
+    _invalidate_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, created, **kwargs):
+    _invalidate_on_commit(instance.user_id)
+    _reindex_on_commit(instance.user_id)
+    if created:
+        transaction.on_commit(invalidate_people_search)
+
+
+def _reindex_on_commit(user_id):
+    transaction.on_commit(lambda: reindex_typeahead(user_id))
+
+
+def reindex_typeahead(user_id):
+    user = CustomUser.objects.filter(pk=user_id).select_related("profile").first()
+    if user is None:
+        return
+    profile = getattr(user, "profile", None)
+    index_user(user, profile.avatar_url if profile else None)
+
+
+@receiver(post_save, sender=CustomUser)
+def user_typeahead_saved(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keeps the @mention typeahead index (users/typeahead.py) current.
+    """
+    if update_fields and not set(update_fields) & {"username", "full_name"}:
+        return
+    _reindex_on_commit(instance.pk)
+    # People search results may have changed too.
+    transaction.on_commit(invalidate_people_search)
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    user_id = instance.pk
+    # Rendered profiles are keyed by username, which may be taken again.
+    _invalidate_on_commit(user_id)
+    transaction.on_commit(lambda: remove_user(user_id))
+    transaction.on_commit(invalidate_people_search)
+
+
+def profile_part_changed(sender, instance, **kwargs):
+    """
+    An experience, skill, link, ... was added, edited or removed.
+    """
+    user_id = Profile.objects.filter(pk=instance.profile_id).values_list("user_id", flat=True).first()
+    if user_id is not None:
+        _invalidate_on_commit(user_id)
+
+
+for part in PROFILE_PARTS:
+    post_save.connect(profile_part_changed, sender=part, dispatch_uid=f"profile_part_saved_{part.__name__}")
+    post_delete.connect(profile_part_changed, sender=part, dispatch_uid=f"profile_part_deleted_{part.__name__}")
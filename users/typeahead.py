@@ -0,0 +1,165 @@
+# users/typeahead.py
+"""
+Prefix index over usernames and full names for @mention autocomplete.
+
+Every user is indexed under a few lowercased terms (the username, the
+full name and each word of it) as members of one sorted set, all with
+score 0, so ZRANGEBYLEX returns them in lexicographic order:
+
+    typeahead:v1:terms     zset  "<term>|<user id>"
+    typeahead:v1:people    hash  user id -> JSON (id, username, full_name,
+                                 avatar_url, and the terms, for reindexing)
+
+A lookup is one script call. When a user id is given, that user's most
+recent chat partners (p2p_messages recent_chats:<id>, scored by last
+message time, the newest RECENT_SCAN of them) are matched against the
+prefix first, through the terms stored with each person; then the lex
+range for the prefix fills in the rest. People the user has chatted with
+come first, most recent first; the rest keep lexicographic order.
+
+The index is kept current by users/signals.py; rebuild_typeahead fills
+it from the database.
+"""
+import json
+
+from django_redis import get_redis_connection
+
+from p2p_messages.redis_helpers import recent_chats_key
+
+TYPEAHEAD_LIMIT = 8
+MAX_TYPEAHEAD_LIMIT = 20
+# Terms scanned per result: one person can own several terms with the
+# same prefix ("sam", "sam smith", "samuel").
+SCAN_FACTOR = 4
+MAX_PREFIX_LENGTH = 64
+# Recent chat partners checked against the prefix before the lex range,
+# so a short prefix still finds them.
+RECENT_SCAN = 50
+
+
+def key_terms() -> str:
+    return "typeahead:v1:terms"
+
+
+def key_people() -> str:
+    return "typeahead:v1:people"
+
+
+# KEYS: terms, people, recent chats (may not exist)
+# ARGV: prefix, how many terms to scan, how many recent chats to check
+# -> flat list of payload, recent chat score ("" if none)
+LOOKUP_SCRIPT = """
+local prefix = ARGV[1]
+local out, seen = {}, {}
+local recent = {}
+if tonumber(ARGV[3]) > 0 then
+    recent = redis.call('ZREVRANGE', KEYS[3], 0, tonumber(ARGV[3]) - 1, 'WITHSCORES')
+end
+for i = 1, #recent, 2 do
+    local id = recent[i]
+    local payload = redis.call('HGET', KEYS[2], id)
+    if payload and not seen[id] then
+        for _, term in ipairs(cjson.decode(payload)['terms']) do
+            if string.sub(term, 1, #prefix) == prefix then
+                seen[id] = true
+                out[#out + 1] = payload
+                out[#out + 1] = recent[i + 1]
+                break
+            end
+        end
+    end
+end
+local members = redis.call('ZRANGEBYLEX', KEYS[1], '[' .. prefix, '[' .. prefix .. '\\255',
+                           'LIMIT', 0, tonumber(ARGV[2]))
+for _, member in ipairs(members) do
+    local id = string.match(member, '|(%d+)$')
+    if id and not seen[id] then
+        seen[id] = true
+        local payload = redis.call('HGET', KEYS[2], id)
+        if payload then
+            out[#out + 1] = payload
+            out[#out + 1] = redis.call('ZSCORE', KEYS[3], id) or ''
+        end
+    end
+end
+return out
+"""
+
+
+def normalize(text) -> str:
+    return " ".join((text or "").casefold().split())
+
+
+def terms_for(username, full_name):
+    name = normalize(full_name)
+    terms = {normalize(username), name, *name.split()}
+    terms.discard("")
+    return sorted(terms)
+
+
+def _member(term, user_id) -> str:
+    return f"{term}|{user_id}"
+
+
+def index_user(user, avatar_url=None, conn=None):
+    """
+    (Re)indexes one user, dropping the terms of their previous entry.
+    """
+    conn = conn or get_redis_connection("default")
+    terms = terms_for(user.username, user.full_name)
+    payload = {
+        "id": user.pk, "username": user.username, "full_name": user.full_name,
+        "avatar_url": avatar_url, "terms": terms,
+    }
+    old = conn.hget(key_people(), user.pk)
+    old_terms = json.loads(old)["terms"] if old else []
+
+    with conn.pipeline() as pipe:
+        stale = [_member(t, user.pk) for t in old_terms if t not in terms]
+        if stale:
+            pipe.zrem(key_terms(), *stale)
+        if terms:
+            pipe.zadd(key_terms(), {_member(t, user.pk): 0 for t in terms})
+        pipe.hset(key_people(), user.pk, json.dumps(payload))
+        pipe.execute()
+
+
+def remove_user(user_id, conn=None):
+    conn = conn or get_redis_connection("default")
+    old = conn.hget(key_people(), user_id)
+    if not old:
+        return
+    with conn.pipeline() as pipe:
+        members = [_member(t, user_id) for t in json.loads(old)["terms"]]
+        if members:
+            pipe.zrem(key_terms(), *members)
+        pipe.hdel(key_people(), user_id)
+        pipe.execute()
+
+
+def lookup(prefix, limit=TYPEAHEAD_LIMIT, user_id=None):
+    """
+    Up to ``limit`` people with a term starting with ``prefix``, people
+    ``user_id`` has chatted with first. The user themself is left out.
+    """
+    prefix = normalize(prefix).lstrip("@")[:MAX_PREFIX_LENGTH]
+    if not prefix:
+        return []
+    conn = get_redis_connection("default")
+    recent = recent_chats_key(user_id) if user_id is not None else "typeahead:v1:none"
+    raw = conn.eval(
+        LOOKUP_SCRIPT, 3, key_terms(), key_people(), recent, prefix, limit * SCAN_FACTOR,
+        RECENT_SCAN if user_id is not None else 0,
+    )
+
+    people = []
+    for position in range(0, len(raw), 2):
+        person = json.loads(raw[position])
+        if person["id"] == user_id:
+            continue
+        person.pop("terms", None)
+        chatted = raw[position + 1]
+        people.append((-float(chatted) if chatted else 0.0, len(people), person))
+    # Stable: chat partners by recency, then the index order.
+    people.sort(key=lambda item: (item[0], item[1]))
+    return [person for _, _, person in people[:limit]]
@@ -12,6 +12,7 @@ from .views import (
     MeProfileView,
     PublicProfileView,
     ProfileSearchView,
+    MentionTypeaheadView,
 
     # Profile sub-sections
     ExperienceViewSet,
@@ -54,5 +55,6 @@ urlpatterns = [
 
     # Search & Public Profiles
     path("profile/search/", ProfileSearchView.as_view(), name="profile-search"),
+    path("mentions/typeahead/", MentionTypeaheadView.as_view(), name="mention-typeahead"),
     path("profile/<str:username>/", PublicProfileView.as_view(), name="profile-public"),
 ]
@@ -22,8 +22,12 @@ from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework.generics import RetrieveAPIView, ListAPIView
 from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import extend_schema, OpenApiResponse
-from django.db.models import Q
 from users.tasks import send_registration_email, log_user_activity
+from p2p_comm.generations import get_generations
+from p2p_comm.http_cache import cached_json_response
+from .cache import PROFILE_TTL, ns_profile, rendered_profile_name
+from .search import profile_user_ids, hydrate_profiles
+from .typeahead import lookup as typeahead_lookup, TYPEAHEAD_LIMIT, MAX_TYPEAHEAD_LIMIT
 from rest_framework import serializers
 User = get_user_model()
 
@@ -190,6 +194,17 @@ class PublicProfileView(RetrieveAPIView):
         ctx["request"] = self.request
         return ctx
 
+    def retrieve(self, request, *args, **kwargs):
+        # Served as cached JSON bytes until the profile generation moves on
+        # (users/signals.py bumps it on any profile change).
+        def build():
+            profile = self.get_object()
+            gens = get_generations([ns_profile(profile.user_id)])
+            return self.get_serializer(profile).data, gens
+
+        name = rendered_profile_name(self.kwargs.get("username"))
+        return cached_json_response(request, name, build, PROFILE_TTL)
+
 
 @extend_schema(tags=["Profile"])
 class ProfileSearchView(ListAPIView):
@@ -203,13 +218,16 @@ class ProfileSearchView(ListAPIView):
         responses=PublicProfileSerializer(many=True),
     )
     def get_queryset(self):
-        q = self.request.query_params.get("q", "").strip()
-        limit = min(max(int(self.request.query_params.get("limit", 20)), 1), 50)
+        # Only reached without a query; list() serves searches from the cache.
+        return Profile.objects.none()
+
+    def list(self, request, *args, **kwargs):
+        q = request.query_params.get("q", "").strip()
         if not q:
-            return Profile.objects.none()
-        return Profile.objects.select_related("user").filter(
-            Q(user__full_name__icontains=q) | Q(user__username__icontains=q)
-        ).order_by("user__full_name", "user__username")[:limit]
+            return super().list(request, *args, **kwargs)
+        limit = min(max(int(request.query_params.get("limit", 20)), 1), 50)
+        # Cached id list, profiles hydrated from fragments (users/search.py)
+        return Response(hydrate_profiles(profile_user_ids(q, limit)))
 
     def get_serializer_context(self):
         ctx = super().get_serializer_context()
@@ -217,6 +235,26 @@ class ProfileSearchView(ListAPIView):
         return ctx
 
 
+@extend_schema(tags=["Profile"])
+class MentionTypeaheadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="@mention autocomplete",
+        description="People whose username or name starts with `q`, from the Redis "
+                    f"prefix index, people you have chatted with first. `limit` (max {MAX_TYPEAHEAD_LIMIT}).",
+        responses={200: OpenApiResponse(description="List of {id, username, full_name, avatar_url}")},
+    )
+    def get(self, request):
+        q = request.query_params.get("q", "")
+        try:
+            limit = int(request.query_params.get("limit", TYPEAHEAD_LIMIT))
+        except ValueError:
+            return Response({"detail": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), MAX_TYPEAHEAD_LIMIT)
+        return Response(typeahead_lookup(q, limit, user_id=request.user.id))
+
+
 # -------------------------------
 # Profile Sub-Models CRUD
 # -------------------------------